@@ -2,13 +2,33 @@
 """
 Initialization file for the backend module.
 Ensures that all dependencies and configurations are properly loaded.
+The public classes are imported on first access, so that entry points which only need part
+of the package (the CLI, the warm worker) do not pay for trimesh, scipy and Flask up front.
 """
 
+import importlib
 import logging
 
 logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
 
-from .config import OptimizationConfig
-from .optimizer import TopologyOptimizer
-from .fem import FEMSolver
-from .mesh_utils import MeshHandler
+# Public name -> submodule that defines it
+_EXPORTS = {
+    "OptimizationConfig": ".config",
+    "TopologyOptimizer": ".optimizer",
+    "FEMSolver": ".fem",
+    "MeshHandler": ".mesh_utils",
+}
+
+__all__ = list(_EXPORTS)
+
+
+def __getattr__(name):
+    if name not in _EXPORTS:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(_EXPORTS[name], __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
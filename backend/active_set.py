@@ -0,0 +1,118 @@
+"""
+Active-set pruning of void elements.
+Elements whose physical density has stayed at the density floor for `patience` iterations
+drop out of the FEM analysis: they are left out of the assembly, and the DOFs that only they
+touch are condensed away, so late iterations, when most of the part has gone void, assemble
+and solve a much smaller system. At the floor an element's stiffness is rho^penal ~ 1e-9 of
+a solid one, so the active system gives the same displacements on the structure.
+
+Pruned elements get no sensitivity of their own, but the filters still spread their
+neighbours' sensitivities onto them; one that rises off the floor is reinstated at once.
+Every `recheck_interval` iterations all pruned elements take part in one full analysis, so
+regions whose exact sensitivities would bring them back can do so.
+"""
+
+import numpy as np
+import scipy.sparse as sp
+from scipy.sparse.csgraph import connected_components
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class ActiveSet:
+    """
+    Active elements of a mesh (elements: (n, 8) node indices, element_voxels: their voxels).
+    Elements with a node in `loaded` (a node mask) are never pruned. `supports` holds one node
+    mask per load case group of the nodes whose DOFs are all fixed; active elements that lose
+    their connection to the supports of any group are pruned with the void ones, unless they
+    carry load, in which case the pruning is put off until the next re-check.
+    """
+
+    # Prune once the candidates make up this share of the active elements, so that the
+    # system is not rebuilt for every few elements reaching the floor
+    MIN_PRUNE_FRACTION = 0.02
+
+    def __init__(self, elements, element_voxels, supports, loaded, min_density=0.001,
+                 patience=5, recheck_interval=20):
+        self.elements = elements
+        self.element_voxels = element_voxels
+        self.patience = patience
+        self.recheck_interval = recheck_interval
+        self.n_nodes = len(loaded)
+        self.threshold = min_density * (1.0 + 1e-3)
+        self.active = np.ones(len(elements), dtype=bool)
+        # Elements of the current active set (`elements` itself while none is pruned)
+        self.active_elements = elements
+        self.rebuilds = 0
+        self._protected = np.any(loaded[elements], axis=1)
+        self._supports = supports
+        self._void_iterations = np.zeros(len(elements), dtype=np.int32)
+        self._iterations = 0
+        self._blocked = False
+        self._rechecking = False
+
+    @property
+    def n_active(self):
+        return int(np.count_nonzero(self.active))
+
+    def update(self, densities):
+        """
+        Record the physical densities after an update and return whether the active set changed
+        (active_elements is then a new array).
+        """
+        self._iterations += 1
+        void = np.asarray(densities).ravel()[self.element_voxels] <= self.threshold
+        self._void_iterations = np.where(void, self._void_iterations + 1, 0).astype(np.int32)
+        active = self.active.copy()
+
+        rechecked, self._rechecking = self._rechecking, False
+        if self.recheck_interval and self._iterations % self.recheck_interval == 0 and not active.all():
+            # Full analysis in the next iteration; elements still void after it are pruned again
+            self._void_iterations[~active] = np.minimum(self._void_iterations[~active], self.patience - 1)
+            self._blocked = False
+            self._rechecking = True
+            logger.info(f"Active set re-check: reinstating {np.count_nonzero(~active)} pruned elements")
+            return self._set(np.ones_like(active))
+
+        # Pruned elements pulled off the floor by their neighbours come back
+        active |= ~void
+        candidates = active & (self._void_iterations >= self.patience) & ~self._protected
+        n_candidates = int(np.count_nonzero(candidates))
+        if n_candidates and not self._blocked and (
+                rechecked or n_candidates >= self.MIN_PRUNE_FRACTION * np.count_nonzero(active)):
+            pruned = self._prune(active & ~candidates)
+            if pruned is None:
+                self._blocked = True
+            else:
+                active = pruned
+        return self._set(active)
+
+    def _prune(self, active):
+        """Active set without the elements cut off from the supports, or None if any of them carry load."""
+        elements = self.elements[active]
+        # Node graph linking the nodes of each active element
+        graph = sp.coo_matrix((np.ones(elements.shape[0] * 7), (np.repeat(elements[:, 0], 7), elements[:, 1:].ravel())),
+                              shape=(self.n_nodes, self.n_nodes))
+        _, labels = connected_components(graph, directed=False)
+        components = labels[elements[:, 0]]
+        supported = np.ones(len(elements), dtype=bool)
+        for support in self._supports:
+            supported &= np.isin(components, np.unique(labels[support]))
+        if supported.all():
+            return active
+        if np.any(self._protected[active][~supported]):
+            logger.info("Active set pruning put off: it would cut loaded elements off the supports")
+            return None
+        active = active.copy()
+        active[np.flatnonzero(active)[~supported]] = False
+        return active
+
+    def _set(self, active):
+        if np.array_equal(active, self.active):
+            return False
+        self.active = active
+        self.active_elements = self.elements if active.all() else self.elements[active]
+        self.rebuilds += 1
+        logger.info(f"Active set: {self.n_active} of {len(self.elements)} elements")
+        return True
@@ -3,18 +3,19 @@ import io
 import pstats
 import os
 from flask import Flask, request, jsonify
-from backend.optimizer import TopologyOptimizer
 from backend.config import OptimizationConfig
+from backend.jobs import register_job_api, submit_request
 import logging
 
 app = Flask(__name__)
 logger = logging.getLogger(__name__)
-
-optimizer = TopologyOptimizer()
+job_manager = register_job_api(app)
 
 def profile_function(func):
-    """Decorator to profile an endpoint."""
+    """Decorator to profile an endpoint with cProfile when the request asks for it (?profile=1)."""
     def wrapper(*args, **kwargs):
+        if request.args.get('profile', '').lower() not in ('1', 'true', 'yes'):
+            return func(*args, **kwargs)
         pr = cProfile.Profile()
         try:
             pr.enable()
@@ -35,17 +36,9 @@ def profile_function(func):
 @app.route('/optimize', methods=['POST'])
 @profile_function
 def optimize():
-    try:
-        data = request.get_json()
-        stl_path = data.get('stl_path')
-        if not stl_path or not os.path.isfile(stl_path):
-            return jsonify({'error': 'Invalid or missing STL file path'}), 400
-
-        result = optimizer.optimize(stl_path)
-        return jsonify({'success': True, 'result': result}), 200
-    except Exception as e:
-        logger.error(f"Optimization error: {e}", exc_info=True)
-        return jsonify({'error': str(e)}), 500
+    # Runs as a job (see backend.jobs): 202 with the job id, or 200 when the result is stored
+    body, status = submit_request(job_manager, request.get_json(silent=True) or {})
+    return jsonify(body), status
 
 @app.route('/api/health', methods=['GET'])
 def health():
@@ -0,0 +1,4 @@
+"""
+Performance benchmarks for the optimization pipeline.
+Run with: python -m backend.benchmarks.bench --help
+"""
@@ -0,0 +1,225 @@
+"""
+Stage benchmarks: voxelize, assemble, solve, sensitivities and update.
+Times each stage separately on synthetic parts at several resolutions, measures its peak
+memory in a separate untimed pass, and compares against a stored baseline JSON to flag regressions.
+
+    python -m backend.benchmarks.bench --parts box bracket --resolutions 16 32 --save baseline.json
+    python -m backend.benchmarks.bench --baseline baseline.json --threshold 0.2
+"""
+
+import argparse
+import json
+import platform
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+
+import numpy as np
+
+from ..config import OptimizationConfig
+from ..instrumentation import current_rss_mb
+from ..mesh_utils import MeshHandler
+from ..optimizer import TopologyOptimizer
+from ..solvers import create_solver
+from .parts import PARTS, generate
+
+STAGES = ("voxelize", "assemble", "solve", "sensitivities", "update")
+
+
+class _RssPeak:
+    """Samples the resident set size in a thread to find its peak growth over a block."""
+
+    def __init__(self, interval=0.001):
+        self.interval = interval
+        self.peak = None
+        self._stop = threading.Event()
+
+    def _sample(self):
+        while not self._stop.wait(self.interval):
+            self.peak = max(self.peak, current_rss_mb())
+
+    def __enter__(self):
+        self.start = current_rss_mb()
+        if self.start is not None:
+            self.peak = self.start
+            self._thread = threading.Thread(target=self._sample, daemon=True)
+            self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        if self.start is not None:
+            self._stop.set()
+            self._thread.join()
+            self.peak = max(self.peak, current_rss_mb())
+
+    @property
+    def growth_mb(self):
+        return None if self.start is None else self.peak - self.start
+
+
+def measure(func, repeats=1, setup=None):
+    """
+    Best wall time over the repeats, then the memory of one more call in a separate pass:
+    peak traced Python/NumPy allocations ("peak_mb", MB) and resident set growth ("rss_mb",
+    which also sees native allocations such as SuperLU/CHOLMOD factors; None off Linux).
+    setup() runs untimed before every call, so that each call starts from the same state.
+    """
+    best = float("inf")
+    result = None
+    for _ in range(repeats):
+        if setup is not None:
+            setup()
+        start = time.perf_counter()
+        result = func()
+        best = min(best, time.perf_counter() - start)
+
+    if setup is not None:
+        setup()
+    with _RssPeak() as rss:
+        tracemalloc.start()
+        try:
+            func()
+            peak = tracemalloc.get_traced_memory()[1] / 1024 ** 2
+        finally:
+            tracemalloc.stop()
+    return result, {"time": best, "peak_mb": peak, "rss_mb": rss.growth_mb}
+
+
+def benchmark_part(stl_path, config, repeats=1):
+    """Time every pipeline stage for one part. Returns {stage: {"time", "peak_mb"}} plus sizes."""
+    optimizer = TopologyOptimizer(config)
+    results = {}
+
+    (voxels, nodes, elements), results["voxelize"] = measure(
+        lambda: MeshHandler.load_and_voxelize(stl_path, voxel_size=config.voxel_size), repeats)
+    if voxels is None:
+        raise RuntimeError(f"Failed to voxelize {stl_path}")
+    densities = np.where(np.asarray(voxels), config.volfrac, 0.0).astype(optimizer._dtype)
+    optimizer._design_mask = densities > 0
+    KE = optimizer.fem_solver.compute_stiffness_matrix(config.E1, config.nu)
+
+    # The assembly pattern (with its index arrays) is built once per mesh; time it separately from assembly
+    def build_pattern():
+        optimizer._pattern_key = None
+        pattern = optimizer._get_assembly_pattern(densities, nodes, elements, KE)
+        return pattern.iK, pattern.jK
+
+    _, results["assemble_pattern"] = measure(build_pattern)
+    K, results["assemble"] = measure(
+        lambda: optimizer.assemble_global_matrix(densities, nodes, elements, KE, config.penal), repeats)
+    F, free_dofs = optimizer._get_load_case(nodes)
+
+    # Solves and updates keep state between calls (warm start, preconditioner, CHOLMOD symbolic
+    # factorization, OC multiplier): every call gets a fresh solver and updater, like a first iteration
+    def fresh_solver():
+        optimizer._solver = create_solver(config, nodes, free_dofs)
+
+    def fresh_updater():
+        optimizer._updater = None
+        optimizer._get_updater(densities.shape)
+
+    U, results["solve"] = measure(
+        lambda: optimizer.fem_solver.solve_system(K, F, free_dofs, solver=optimizer._solver), repeats, fresh_solver)
+    if U is None:
+        raise RuntimeError(f"FEM solve failed for {stl_path}")
+    dc, results["sensitivities"] = measure(
+        lambda: optimizer._compute_sensitivities(densities, U, KE), repeats)
+    dc = optimizer._filter_sensitivities(densities, dc)
+    _, results["update"] = measure(lambda: optimizer._update_densities(dc, densities), repeats, fresh_updater)
+
+    optimizer._close_element_pool()
+
+    results["size"] = {"voxels": int(np.asarray(voxels).size), "elements": len(elements), "dofs": len(nodes) * 3,
+                       "solver": optimizer._solver.name}
+    return results
+
+
+def run(parts, resolutions, repeats=1, config_overrides=None, workdir=None):
+    """Benchmark all parts at all resolutions; results are keyed 'part-resolution'."""
+    config = OptimizationConfig(**(config_overrides or {}))
+    results = {}
+    with tempfile.TemporaryDirectory(dir=workdir) as directory:
+        for name in parts:
+            for resolution in resolutions:
+                key = f"{name}-{resolution}"
+                stl_path = generate(name, resolution, directory)
+                results[key] = benchmark_part(stl_path, config, repeats)
+                print(format_case(key, results[key]), flush=True)
+    return {
+        "meta": {
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "machine": platform.machine(),
+            "timestamp": time.time(),
+            "repeats": repeats,
+        },
+        "results": results,
+    }
+
+
+def compare(current, baseline, threshold=0.2):
+    """List stage timings slower than the baseline by more than the threshold fraction."""
+    regressions = []
+    for key, stages in current["results"].items():
+        base = baseline.get("results", {}).get(key)
+        if base is None:
+            continue
+        for stage, stats in stages.items():
+            if stage == "size" or stage not in base:
+                continue
+            ratio = stats["time"] / max(base[stage]["time"], 1e-9)
+            if ratio > 1 + threshold:
+                regressions.append({"case": key, "stage": stage, "time": stats["time"],
+                                    "baseline": base[stage]["time"], "ratio": ratio})
+    return regressions
+
+
+def format_case(key, stages):
+    size = stages["size"]
+    timings = "  ".join(f"{stage} {stages[stage]['time'] * 1e3:8.1f}ms/{stages[stage]['peak_mb']:.0f}MB"
+                        for stage in STAGES)
+    return f"{key:16s} {size['elements']:>8d} el {size['dofs']:>9d} dof  {timings}"
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--parts", nargs="+", default=list(PARTS), choices=list(PARTS))
+    parser.add_argument("--resolutions", nargs="+", type=int, default=[16, 32, 48])
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--solver", default=None, help="Override OptimizationConfig.solver")
+    parser.add_argument("--precision", default=None, choices=["float64", "float32"],
+                        help="Override OptimizationConfig.precision")
+    parser.add_argument("--fem-workers", type=int, default=None, help="Override OptimizationConfig.fem_workers")
+    parser.add_argument("--matrix-free", action="store_true", help="Apply K element by element (matrix_free)")
+    parser.add_argument("--save", help="Write results to this JSON file")
+    parser.add_argument("--baseline", help="Compare against this baseline JSON file")
+    parser.add_argument("--threshold", type=float, default=0.2, help="Allowed slowdown fraction before flagging")
+    args = parser.parse_args(argv)
+
+    overrides = {"solver": args.solver} if args.solver else {}
+    if args.precision:
+        overrides["precision"] = args.precision
+    if args.fem_workers:
+        overrides["fem_workers"] = args.fem_workers
+    if args.matrix_free:
+        overrides["matrix_free"] = True
+    current = run(args.parts, args.resolutions, args.repeats, overrides)
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump(current, f, indent=2)
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(current, json.load(f), args.threshold)
+        for r in regressions:
+            print(f"REGRESSION {r['case']} {r['stage']}: {r['time'] * 1e3:.1f}ms vs "
+                  f"{r['baseline'] * 1e3:.1f}ms ({r['ratio']:.2f}x)")
+        if regressions:
+            return 1
+        print("No regressions")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
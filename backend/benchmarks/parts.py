@@ -0,0 +1,58 @@
+"""
+Parametric test parts built from trimesh primitives.
+Every part is scaled so that its longest side spans `resolution` voxels of size 1.
+"""
+
+import numpy as np
+import trimesh
+
+
+def box(resolution):
+    """Solid rectangular block, 2:1:1."""
+    return trimesh.creation.box(extents=(resolution, resolution / 2, resolution / 2))
+
+
+def bracket(resolution):
+    """L-shaped bracket: a base plate and an upright web with a gusset."""
+    r = float(resolution)
+    base = trimesh.creation.box(extents=(r, r / 2, r / 8))
+    base.apply_translation((0, 0, r / 16))
+    web = trimesh.creation.box(extents=(r / 8, r / 2, r / 2))
+    web.apply_translation((-r / 2 + r / 16, 0, r / 4))
+    gusset = trimesh.creation.box(extents=(r / 3, r / 16, r / 3))
+    gusset.apply_translation((-r / 3, 0, r / 6))
+    return trimesh.util.concatenate([base, web, gusset])
+
+
+def lattice(resolution, cells=3):
+    """Cubic lattice of cylindrical struts along x, y and z."""
+    r = float(resolution)
+    pitch = r / cells
+    radius = pitch / 8
+    struts = []
+    ticks = np.linspace(-r / 2, r / 2, cells + 1)
+    for a in ticks:
+        for b in ticks:
+            for axis, position in (((1, 0, 0), (0, a, b)), ((0, 1, 0), (a, 0, b)), ((0, 0, 1), (a, b, 0))):
+                strut = trimesh.creation.cylinder(radius=radius, height=r, sections=12)
+                if axis != (0, 0, 1):
+                    strut.apply_transform(trimesh.geometry.align_vectors((0, 0, 1), axis))
+                strut.apply_translation(position)
+                struts.append(strut)
+    return trimesh.util.concatenate(struts)
+
+
+PARTS = {
+    "box": box,
+    "bracket": bracket,
+    "lattice": lattice,
+}
+
+
+def generate(name, resolution, directory):
+    """Write the part as an STL file and return its path."""
+    import os
+
+    path = os.path.join(directory, f"{name}-{resolution}.stl")
+    PARTS[name](resolution).export(path)
+    return path
@@ -0,0 +1,132 @@
+"""
+Content-addressed cache for voxelized meshes.
+Entries are keyed by the SHA-256 of the STL file plus the voxel size and stored as .npy
+files that are memory-mapped on load, with LRU limits on disk usage and in-memory entries.
+"""
+
+import hashlib
+import os
+import shutil
+import tempfile
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import logging
+
+logger = logging.getLogger(__name__)
+
+CACHE_ARRAYS = ("voxels", "nodes", "elements")
+
+
+def file_digest(path, chunk_size=1 << 20):
+    """SHA-256 hex digest of a file's content."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class VoxelCache:
+    def __init__(self, cache_dir, max_disk_bytes=2 * 1024 ** 3, max_memory_entries=8):
+        self.cache_dir = cache_dir
+        self.max_disk_bytes = max_disk_bytes
+        self.max_memory_entries = max_memory_entries
+        self.hits = 0
+        self.memory_hits = 0
+        self.misses = 0
+        self._memory = OrderedDict()
+        self._digests = {}
+        self._lock = threading.Lock()
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def key(self, stl_path, voxel_size):
+        """Cache key from the file content hash and the voxel size."""
+        stat = os.stat(stl_path)
+        signature = (os.path.abspath(stl_path), stat.st_size, stat.st_mtime_ns)
+        digest = self._digests.get(signature)
+        if digest is None:
+            digest = file_digest(stl_path)
+            self._digests[signature] = digest
+        return f"{digest}-{float(voxel_size)!r}"
+
+    def stats(self):
+        return {
+            "hits": self.hits,
+            "memory_hits": self.memory_hits,
+            "misses": self.misses,
+            "memory_entries": len(self._memory),
+            "disk_bytes": self._disk_usage(),
+        }
+
+    def get(self, key):
+        """Return (voxel_matrix, nodes, elements) for the key, or None on a miss."""
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                self._memory.move_to_end(key)
+                self.hits += 1
+                self.memory_hits += 1
+                return entry
+
+            entry_dir = os.path.join(self.cache_dir, key)
+            try:
+                entry = tuple(np.load(os.path.join(entry_dir, f"{name}.npy"), mmap_mode="r") for name in CACHE_ARRAYS)
+            except (OSError, ValueError):
+                self.misses += 1
+                return None
+            os.utime(entry_dir)
+            self.hits += 1
+            self._remember(key, entry)
+            return entry
+
+    def put(self, key, voxel_matrix, nodes, elements):
+        """Store an entry on disk, then evict least recently used entries over the size cap."""
+        with self._lock:
+            tmp_dir = tempfile.mkdtemp(dir=self.cache_dir, prefix=".tmp-")
+            try:
+                for name, array in zip(CACHE_ARRAYS, (voxel_matrix, nodes, elements)):
+                    np.save(os.path.join(tmp_dir, f"{name}.npy"), np.asarray(array))
+                entry_dir = os.path.join(self.cache_dir, key)
+                if os.path.isdir(entry_dir):
+                    shutil.rmtree(tmp_dir)
+                else:
+                    os.rename(tmp_dir, entry_dir)
+            except Exception:
+                shutil.rmtree(tmp_dir, ignore_errors=True)
+                raise
+            self._remember(key, (voxel_matrix, nodes, elements))
+            self._evict_disk(keep=key)
+
+    def _remember(self, key, entry):
+        self._memory[key] = entry
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_memory_entries:
+            self._memory.popitem(last=False)
+
+    def _entries(self):
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            path = os.path.join(self.cache_dir, name)
+            if name.startswith(".") or not os.path.isdir(path):
+                continue
+            size = sum(os.path.getsize(os.path.join(path, f)) for f in os.listdir(path))
+            entries.append((os.path.getmtime(path), size, name))
+        return entries
+
+    def _disk_usage(self):
+        return sum(size for _, size, _ in self._entries())
+
+    def _evict_disk(self, keep=None):
+        entries = sorted(self._entries())
+        total = sum(size for _, size, _ in entries)
+        for _, size, name in entries:
+            if total <= self.max_disk_bytes:
+                break
+            if name == keep:
+                continue
+            shutil.rmtree(os.path.join(self.cache_dir, name), ignore_errors=True)
+            self._memory.pop(name, None)
+            total -= size
+            logger.info(f"Evicted voxel cache entry {name}")
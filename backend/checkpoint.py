@@ -0,0 +1,93 @@
+"""
+Iteration checkpoints for resumable optimization runs.
+Arrays are written in place to memory-mapped .npy files in two alternating slots and a small
+JSON state file, replaced atomically, points at the slot of the latest complete checkpoint.
+Readers can therefore load the latest density field while the run keeps writing.
+"""
+
+import json
+import os
+import tempfile
+import time
+
+import numpy as np
+import logging
+
+logger = logging.getLogger(__name__)
+
+STATE_FILE = "state.json"
+CHECKPOINT_VERSION = 1
+
+
+class CheckpointError(RuntimeError):
+    pass
+
+
+def read_state(directory):
+    """State of the latest checkpoint in directory, or None when there is none."""
+    try:
+        with open(os.path.join(directory, STATE_FILE)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def load_checkpoint(directory, names=None, retries=5):
+    """
+    Load the latest checkpoint: returns (state, {name: array}) with the arrays copied out of
+    the memory maps. Safe to call while a run is writing checkpoints to the directory.
+    """
+    for _ in range(retries):
+        state = read_state(directory)
+        if state is None:
+            raise CheckpointError(f"No checkpoint in {directory}")
+        arrays = {}
+        for name in state["arrays"] if names is None else names:
+            path = os.path.join(directory, f"{name}-{state['slot']}.npy")
+            arrays[name] = np.array(np.load(path, mmap_mode="r"))
+        # The writer only overwrites this slot after publishing another checkpoint
+        latest = read_state(directory)
+        if latest is not None and latest["sequence"] == state["sequence"]:
+            return state, arrays
+    raise CheckpointError(f"Checkpoint in {directory} kept changing while reading")
+
+
+class Checkpoint:
+    """Writer of the checkpoints of one run."""
+
+    def __init__(self, directory):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        state = read_state(directory)
+        self.sequence = state["sequence"] if state else 0
+        self._maps = {}
+
+    def save(self, state, arrays):
+        """Write the arrays into the free slot, then publish the state pointing at it."""
+        slot = (self.sequence + 1) % 2
+        for name, array in arrays.items():
+            target = self._map(name, slot, np.shape(array), np.asarray(array).dtype)
+            target[...] = array
+            target.flush()
+
+        self.sequence += 1
+        state = dict(state, version=CHECKPOINT_VERSION, sequence=self.sequence, slot=slot,
+                     arrays=sorted(arrays), time=time.time())
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, prefix=".state-")
+        try:
+            with os.fdopen(fd, "w") as f:
+                json.dump(state, f)
+            os.replace(tmp_path, os.path.join(self.directory, STATE_FILE))
+        except Exception:
+            os.unlink(tmp_path)
+            raise
+        logger.info(f"Checkpoint {self.sequence} at iteration {state.get('iteration')} written to {self.directory}")
+
+    def _map(self, name, slot, shape, dtype):
+        """Memory map of an array slot, recreated when the shape or dtype changes."""
+        target = self._maps.get((name, slot))
+        if target is None or target.shape != tuple(shape) or target.dtype != dtype:
+            path = os.path.join(self.directory, f"{name}-{slot}.npy")
+            target = np.lib.format.open_memmap(path, mode="w+", dtype=dtype, shape=tuple(shape))
+            self._maps[(name, slot)] = target
+        return target
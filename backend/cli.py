@@ -0,0 +1,195 @@
+"""
+Headless command line entry point, used by the desktop app.
+
+    python -m backend.cli input.stl output.npy [--config config.json] [--project-id ID]
+    python -m backend.cli --serve
+
+One run reads the input STL, optimizes it and writes the result file; the format follows the
+output extension (.npy, .json, or .stl for the iso-surface). Progress is written to stdout as
+one JSON object per line; logging goes to stderr. With --serve the process stays up as a warm
+worker: it imports the solver stack once and then answers JSON requests read line by line
+from stdin, so the app pays the interpreter and import startup once per session.
+
+Only the standard library and the light modules are imported at startup; the optimizer
+(trimesh, scipy) is imported when the first run starts.
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+
+import numpy as np
+import logging
+
+from .config import OptimizationConfig
+
+logger = logging.getLogger(__name__)
+
+OUTPUT_FORMATS = (".npy", ".json", ".stl")
+
+
+class EventWriter:
+    """Writes JSON-lines events, tagged with the request id in serve mode, and flushes each one."""
+
+    def __init__(self, stream, request_id=None):
+        self.stream = stream
+        self.request_id = request_id
+
+    def __call__(self, event, **fields):
+        message = {"event": event, **fields}
+        if self.request_id is not None:
+            message["id"] = self.request_id
+        self.stream.write(json.dumps(message) + "\n")
+        self.stream.flush()
+
+
+def load_config(value):
+    """OptimizationConfig from None, a dict, inline JSON or the path of a JSON file."""
+    if value is None:
+        return OptimizationConfig()
+    if isinstance(value, str):
+        if value.lstrip().startswith("{"):
+            value = json.loads(value)
+        else:
+            with open(value) as f:
+                value = json.load(f)
+    return OptimizationConfig(**value).validate()
+
+
+def write_result(result, output_path, voxel_size=1.0, origin=None):
+    """
+    Write the density grid in the format given by the output extension, atomically.
+    STL output is placed with the grid's voxel size and origin.
+    """
+    extension = os.path.splitext(output_path)[1].lower()
+    if extension not in OUTPUT_FORMATS:
+        raise ValueError(f"Unsupported output format {extension!r}; expected one of {OUTPUT_FORMATS}")
+    temp_path = f"{output_path}.tmp{os.getpid()}"
+    try:
+        with open(temp_path, "wb") as f:
+            if extension == ".npy":
+                np.save(f, np.asarray(result))
+            elif extension == ".json":
+                f.write(json.dumps({"shape": list(np.shape(result)),
+                                    "result": np.asarray(result).tolist()}).encode())
+            else:
+                from .transport import iso_surface_stl
+                f.write(iso_surface_stl(result, voxel_size=voxel_size, origin=origin))
+        os.replace(temp_path, output_path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+
+def open_result_store(path):
+    """ResultStore at path ("" disables it); None for the OPTIMIZER_RESULTS_DB default."""
+    from .results import DEFAULT_RESULTS_DB, ResultStore
+
+    if path is None:
+        path = os.environ.get("OPTIMIZER_RESULTS_DB", DEFAULT_RESULTS_DB)
+    return ResultStore(path) if path else None
+
+
+def run(input_path, output_path, config=None, emit=None, result_store=None, project_id=None):
+    """
+    Optimize input_path and write the result to output_path, reporting started, progress and
+    completed events to emit. Returns the completed event's fields.
+    """
+    from .optimizer import TopologyOptimizer
+    from .results import run_with_store
+
+    emit = emit or EventWriter(sys.stdout)
+    if not os.path.isfile(input_path):
+        raise FileNotFoundError(f"Input STL not found: {input_path}")
+    config = config or OptimizationConfig()
+    optimizer = TopologyOptimizer(config)
+
+    def callback(iteration, voxel_grid, change):
+        emit("progress", iteration=int(iteration), change=float(change), compliance=optimizer.compliance)
+
+    start = time.perf_counter()
+    emit("started", input=input_path, output=output_path, pid=os.getpid())
+    result, stored = run_with_store(result_store, optimizer, input_path, project_id=project_id, callback=callback)
+    # The grid the result was computed on, which memory planning may have coarsened
+    counters = optimizer.metrics.counters if stored is None else stored["counters"]
+    write_result(result, output_path, voxel_size=counters.get("voxel_size", config.voxel_size),
+                 origin=counters.get("grid_origin"))
+    if stored is None:
+        summary = {"compliance": optimizer.compliance, "iterations": len(optimizer.compliance_history)}
+    else:
+        summary = {"compliance": stored["compliance"], "iterations": stored["iterations"]}
+    fields = dict(output=output_path, shape=list(np.shape(result)), cached=stored is not None,
+                  wall_time=time.perf_counter() - start, **summary)
+    emit("completed", **fields)
+    return fields
+
+
+def serve(stdin, stdout, result_store=None):
+    """
+    Warm worker loop. Each stdin line is a JSON request {"id", "input", "output", "config",
+    "project_id"}; {"command": "shutdown"} or end of input stops the worker. Failures are
+    reported as error events and do not stop it.
+    """
+    start = time.perf_counter()
+    # Pay for the solver stack before the first request instead of during it
+    from . import optimizer  # noqa: F401
+    from . import transport  # noqa: F401
+
+    EventWriter(stdout)("ready", pid=os.getpid(), startup=time.perf_counter() - start)
+    for line in stdin:
+        if not line.strip():
+            continue
+        try:
+            request = json.loads(line)
+        except json.JSONDecodeError as e:
+            EventWriter(stdout)("error", error=f"Invalid request: {e}")
+            continue
+        emit = EventWriter(stdout, request.get("id"))
+        if request.get("command") == "shutdown":
+            emit("shutdown")
+            break
+        try:
+            run(request["input"], request["output"], load_config(request.get("config")), emit=emit,
+                result_store=result_store, project_id=request.get("project_id"))
+        except Exception as e:
+            logger.error(f"Request {request.get('id')} failed: {e}", exc_info=True)
+            emit("error", error=str(e))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run topology optimizations without the HTTP server.")
+    parser.add_argument("input", nargs="?", help="input STL file")
+    parser.add_argument("output", nargs="?", help=f"output file ({', '.join(OUTPUT_FORMATS)})")
+    parser.add_argument("--config", help="OptimizationConfig as a JSON file or inline JSON object")
+    parser.add_argument("--project-id", help="project the result is stored under")
+    parser.add_argument("--results-db", help="result store path; empty to disable (default: OPTIMIZER_RESULTS_DB)")
+    parser.add_argument("--serve", action="store_true", help="stay up as a warm worker reading requests from stdin")
+    args = parser.parse_args(argv)
+    if not args.serve and (args.input is None or args.output is None):
+        parser.error("input and output are required unless --serve is given")
+
+    # stdout carries the event protocol: anything else printed during a run goes to stderr
+    stdout, sys.stdout = sys.stdout, sys.stderr
+    try:
+        result_store = open_result_store(args.results_db)
+        if args.serve:
+            serve(sys.stdin, stdout, result_store)
+            return 0
+        emit = EventWriter(stdout)
+        try:
+            run(args.input, args.output, load_config(args.config), emit=emit,
+                result_store=result_store, project_id=args.project_id)
+        except Exception as e:
+            logger.error(f"Optimization failed: {e}", exc_info=True)
+            emit("error", error=str(e))
+            return 1
+        return 0
+    finally:
+        sys.stdout = stdout
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -4,8 +4,29 @@ Configuration file for optimization settings.
 Defines key parameters used in topology optimization.
 """
 
+from .loads import LoadCase, symmetry_axes
+
+# Allowed values of the config's named options
+CHOICES = {
+    "solver": ("auto", "direct", "pcg"),
+    "preconditioner": ("multigrid", "jacobi"),
+    "precision": ("float64", "float32"),
+    "filter_type": ("sensitivity", "density", "none"),
+    "filter_method": ("auto", "matrix", "fft"),
+    "memory_policy": ("reject", "coarsen"),
+}
+
 class OptimizationConfig:
-    def __init__(self, nelx=50, nely=50, nelz=37, volfrac=0.4, penal=3.0, rmin=1.5, E1=1.0, E2=1e-9, nu=0.3, tol=1e-3, max_iter=100):
+    def __init__(self, nelx=50, nely=50, nelz=37, volfrac=0.4, penal=3.0, rmin=1.5, E1=1.0, E2=1e-9, nu=0.3, tol=1e-3, max_iter=100,
+                 solver="auto", preconditioner="multigrid", solver_tol=1e-6, solver_max_iter=1000,
+                 direct_solver_max_dofs=10000, preconditioner_reuse_tol=0.05,
+                 filter_type="sensitivity", filter_method="auto", move=0.2,
+                 voxel_cache_dir=None, voxel_cache_max_bytes=2 * 1024 ** 3, voxel_cache_max_entries=8,
+                 voxel_size=1.0, multires_levels=1, level_max_iter=None, level_tol=None,
+                 precision="float64", memory_budget_mb=None, memory_policy="reject",
+                 checkpoint_dir=None, checkpoint_interval=10, voxel_workers=None,
+                 fem_workers=1, matrix_free=False, load_cases=None, symmetry=None,
+                 active_set=False, active_set_patience=5, active_set_recheck=20):
         self.nelx = nelx
         self.nely = nely
         self.nelz = nelz
@@ -17,8 +38,101 @@ class OptimizationConfig:
         self.nu = nu
         self.tol = tol
         self.max_iter = max_iter
+        # Linear solver: "direct", "pcg" or "auto" (direct up to direct_solver_max_dofs free DOFs)
+        self.solver = solver
+        # PCG preconditioner: "jacobi" or "multigrid"
+        self.preconditioner = preconditioner
+        self.solver_tol = solver_tol
+        self.solver_max_iter = solver_max_iter
+        self.direct_solver_max_dofs = direct_solver_max_dofs
+        # Keep the PCG preconditioner until the accumulated max density change exceeds this
+        self.preconditioner_reuse_tol = preconditioner_reuse_tol
+        # Filter with radius rmin (in voxels): "sensitivity", "density" or "none"
+        self.filter_type = filter_type
+        # Filter implementation: "matrix" (sparse H), "fft" (convolution) or "auto"
+        self.filter_method = filter_method
+        # Move limit of the optimality-criteria density update
+        self.move = move
+        # Voxelization cache directory (disabled when None) and its LRU limits
+        self.voxel_cache_dir = voxel_cache_dir
+        self.voxel_cache_max_bytes = voxel_cache_max_bytes
+        self.voxel_cache_max_entries = voxel_cache_max_entries
+        # Finest voxel size; with multires_levels > 1 each coarser level doubles it
+        self.voxel_size = voxel_size
+        self.multires_levels = multires_levels
+        # Per-level budgets, coarsest level first (default: max_iter and tol on every level)
+        self.level_max_iter = level_max_iter
+        self.level_tol = level_tol
+        # Floating point precision of densities, sensitivities and element data: "float64" or "float32"
+        self.precision = precision
+        # Pre-flight peak memory budget in MB (unchecked when None); over budget the job is
+        # rejected ("reject") or its voxel size doubled until it fits ("coarsen")
+        self.memory_budget_mb = memory_budget_mb
+        self.memory_policy = memory_policy
+        # Checkpoint directory of resumable runs (disabled when None), written every checkpoint_interval iterations
+        self.checkpoint_dir = checkpoint_dir
+        self.checkpoint_interval = checkpoint_interval
+        # Processes voxelizing large binary STLs (default: all CPUs)
+        self.voxel_workers = voxel_workers
+        # Processes sharing the element assembly, compliance and operator products of one run
+        # (1: in-process with the serial assembly, None: all CPUs)
+        self.fem_workers = fem_workers
+        # Apply K element by element inside PCG instead of assembling it (Jacobi preconditioning only)
+        self.matrix_free = matrix_free
+        # Load cases as dicts of backend.loads.LoadCase arguments (fixed, loaded, force, weight, name);
+        # the objective is their weighted compliance (default: bottom fixed, unit load on top)
+        self.load_cases = load_cases
+        # Mirror symmetry: None (off), "auto" (every axis) or a list of axes ("x", "y", "z") to
+        # try; the part and load cases symmetric about an axis's mid-plane are optimized on one side
+        self.symmetry = symmetry
+        # Active-set pruning: elements at the density floor for active_set_patience iterations drop
+        # out of the assembly and solve, and every active_set_recheck iterations (0: never) all
+        # pruned elements take part in one full analysis so they can come back
+        self.active_set = active_set
+        self.active_set_patience = active_set_patience
+        self.active_set_recheck = active_set_recheck
+
+    def validate(self):
+        """
+        Check the named options, the per-level budgets, the load cases and the symmetry axes
+        (ValueError when invalid); returns the config.
+        """
+        for name, choices in CHOICES.items():
+            if getattr(self, name) not in choices:
+                raise ValueError(f"Unknown {name} {getattr(self, name)!r}; expected one of {', '.join(choices)}")
+        if not isinstance(self.multires_levels, int) or self.multires_levels < 1:
+            raise ValueError(f"multires_levels must be a positive integer, got {self.multires_levels!r}")
+        for name in ("level_max_iter", "level_tol"):
+            values = getattr(self, name)
+            if values is not None and (not isinstance(values, (list, tuple)) or len(values) != self.multires_levels):
+                raise ValueError(f"{name} needs one value per level ({self.multires_levels}), got {values!r}")
+        for spec in self.load_cases or []:
+            LoadCase.from_spec(spec)
+        symmetry_axes(self.symmetry)
+        return self
+
+    def to_dict(self):
+        """The config fields as plain JSON-serializable values (load cases as dicts)."""
+        fields = dict(vars(self))
+        if self.load_cases is not None:
+            fields["load_cases"] = [LoadCase.from_spec(spec).to_dict() for spec in self.load_cases]
+        return fields
 
     def __repr__(self):
         return (f"OptimizationConfig(nelx={self.nelx}, nely={self.nely}, nelz={self.nelz}, "
                 f"volfrac={self.volfrac}, penal={self.penal}, rmin={self.rmin}, E1={self.E1}, "
-                f"E2={self.E2}, nu={self.nu}, tol={self.tol}, max_iter={self.max_iter})")
+                f"E2={self.E2}, nu={self.nu}, tol={self.tol}, max_iter={self.max_iter}, "
+                f"solver={self.solver!r}, preconditioner={self.preconditioner!r}, solver_tol={self.solver_tol}, "
+                f"solver_max_iter={self.solver_max_iter}, direct_solver_max_dofs={self.direct_solver_max_dofs}, "
+                f"preconditioner_reuse_tol={self.preconditioner_reuse_tol}, "
+                f"filter_type={self.filter_type!r}, filter_method={self.filter_method!r}, move={self.move}, "
+                f"voxel_cache_dir={self.voxel_cache_dir!r}, voxel_cache_max_bytes={self.voxel_cache_max_bytes}, "
+                f"voxel_cache_max_entries={self.voxel_cache_max_entries}, "
+                f"voxel_size={self.voxel_size}, multires_levels={self.multires_levels}, "
+                f"level_max_iter={self.level_max_iter}, level_tol={self.level_tol}, "
+                f"precision={self.precision!r}, memory_budget_mb={self.memory_budget_mb}, "
+                f"memory_policy={self.memory_policy!r}, checkpoint_dir={self.checkpoint_dir!r}, "
+                f"checkpoint_interval={self.checkpoint_interval}, voxel_workers={self.voxel_workers}, "
+                f"fem_workers={self.fem_workers}, matrix_free={self.matrix_free}, "
+                f"load_cases={self.load_cases!r}, symmetry={self.symmetry!r}, active_set={self.active_set}, "
+                f"active_set_patience={self.active_set_patience}, active_set_recheck={self.active_set_recheck})")
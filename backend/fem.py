@@ -6,8 +6,8 @@ Handles stiffness matrix computation and system solving.
 
 import numpy as np
 import scipy.sparse as sp
-import scipy.sparse.linalg as spla
 import logging
+from .solvers import DirectSolver, check_singularity
 
 logger = logging.getLogger(__name__)
 
@@ -16,6 +16,84 @@ class FEMResult:
         self.displacements = displacements
         self.stresses = stresses
 
+def element_compliance(U, edof, KE, weights=None, chunk_size=65536, dtype=np.float64):
+    """
+    Element compliance u_e^T KE u_e for all elements, computed in chunks of elements
+    to bound the size of the gathered (chunk, 24) displacement block.
+    Returns the per-element values (as dtype) and the total compliance sum(weights * ce).
+    """
+    ce = np.empty(len(edof), dtype=dtype)
+    for start in range(0, len(edof), chunk_size):
+        Ue = U[edof[start:start + chunk_size]]
+        ce[start:start + chunk_size] = np.einsum("ij,ij->i", Ue @ KE, Ue)
+    total = float(ce.sum() if weights is None else weights @ ce)
+    return ce, total
+
+class AssemblyPattern:
+    """
+    Sparsity pattern of the global stiffness matrix for a fixed mesh.
+    Built once per mesh so that each iteration only has to compute values.
+    Element densities and matrix values are kept in dtype (float32 halves their memory).
+    """
+
+    def __init__(self, nodes, elements, grid_shape, ke_size=24, dtype=np.float64):
+        elements = np.asarray(elements, dtype=np.int64)
+        nodes = np.asarray(nodes, dtype=float)
+        if elements.size == 0:
+            raise ValueError("Empty elements array")
+        if elements.ndim != 2 or elements.shape[1] * 3 != ke_size:
+            raise ValueError(f"KE dimensions ({ke_size}) do not match element DOFs for elements of shape {elements.shape}")
+
+        self.ndof = len(nodes) * 3
+        self.grid_shape = tuple(grid_shape)
+        self.n_elements = len(elements)
+        self.dtype = np.dtype(dtype)
+        index_dtype = np.int32 if self.ndof < np.iinfo(np.int32).max else np.int64
+
+        # Element DOFs: [3n, 3n+1, 3n+2] for each of the element's nodes
+        edof = (3 * elements[:, :, None] + np.arange(3)).reshape(len(elements), -1)
+        if np.any(edof >= self.ndof):
+            raise ValueError("DOFs exceed global matrix dimensions")
+        if np.any(edof < 0):
+            raise ValueError("DOFs contain negative indices")
+        self.edof = edof.astype(index_dtype)
+        self.ke_size = ke_size
+        self._iK = None
+        self._jK = None
+        # Optional per-element stiffness factor (elements shared with mirrored copies, see backend.symmetry)
+        self.element_scale = None
+
+        # Element-to-voxel map from the element centers, in units of the voxel size
+        spacing = np.abs(nodes[elements[0, 6]] - nodes[elements[0, 0]])
+        centers = nodes[elements].mean(axis=1) / spacing
+        coords = np.clip(np.floor(centers).astype(np.int64), 0, np.array(self.grid_shape) - 1)
+        self.element_voxels = np.ravel_multi_index(coords.T, self.grid_shape).astype(index_dtype)
+
+    @property
+    def iK(self):
+        """Row index of every entry of KE for every element, matching KE.ravel() (built on first use)."""
+        if self._iK is None:
+            self._iK = np.repeat(self.edof, self.ke_size, axis=1).ravel()
+        return self._iK
+
+    @property
+    def jK(self):
+        """Column index of every entry of KE for every element, matching KE.ravel()."""
+        if self._jK is None:
+            self._jK = np.tile(self.edof, (1, self.ke_size)).ravel()
+        return self._jK
+
+    def element_densities(self, densities):
+        """Gather the density of every element from the voxel grid."""
+        return np.asarray(densities, dtype=self.dtype).ravel()[self.element_voxels]
+
+    def assemble(self, densities, KE, penal):
+        """Assemble the global stiffness matrix in CSR format for the given densities."""
+        rho = self.element_densities(densities)
+        scale = rho ** penal if self.element_scale is None else rho ** penal * self.element_scale
+        sK = (KE.ravel().astype(self.dtype)[None, :] * scale[:, None]).ravel()
+        return sp.csr_matrix((sK, (self.iK, self.jK)), shape=(self.ndof, self.ndof))
+
 class FEMSolver:
     def compute_stiffness_matrix(self, E: float, nu: float) -> np.ndarray:
         """Compute element stiffness matrix for 3D 8-node brick element."""
@@ -65,16 +143,25 @@ class FEMSolver:
         return B
 
     @staticmethod
-    def solve_system(K, F, free_dofs):
-        """Solve the system of equations K * U = F using sparse matrix techniques."""
+    def solve_system(K, F, free_dofs, solver=None):
+        """
+        Solve the system of equations K * U = F on the free DOFs.
+        Uses the given solver backend (see backend.solvers), or a direct sparse solve.
+        K is a sparse matrix or, for iterative solvers, a matrix-free ElementOperator.
+        F may hold one load case per column; U then has the same columns.
+        """
         try:
-            K_free = K[free_dofs, :][:, free_dofs]
+            if sp.issparse(K):
+                K_free = K[free_dofs, :][:, free_dofs]
+            else:
+                # Matrix-free operator (see backend.parallel)
+                K_free = K.restrict(free_dofs)
             F_free = F[free_dofs]
             logger.info(f"K_free shape: {K_free.shape}, F_free shape: {F_free.shape}")
-            if sp.linalg.norm(K_free, ord=2) == 0 or np.linalg.matrix_rank(K_free.toarray()) < K_free.shape[0]:
-                raise ValueError("Global stiffness matrix is singular. Check boundary conditions or assembly.")
-            U_free = spla.spsolve(K_free, F_free)
-            U = np.zeros(K.shape[0])
+            check_singularity(K_free)
+            solver = solver or DirectSolver()
+            U_free = solver.solve(K_free, F_free)
+            U = np.zeros((K.shape[0],) + np.shape(F)[1:])
             U[free_dofs] = U_free
             return U
         except MemoryError as e:
@@ -82,4 +169,4 @@ class FEMSolver:
             return None
         except Exception as e:
             logger.error(f"Error solving FEM system: {e}", exc_info=True)
-            return None
\ No newline at end of file
+            return None
@@ -0,0 +1,171 @@
+"""
+Lightweight instrumentation for the optimization pipeline.
+Per-run stage timers and memory growth, counters and per-iteration records (a perf_counter
+call and two RSS reads per stage), plus an in-process registry that aggregates runs for the metrics endpoints.
+"""
+
+import os
+import sys
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+try:
+    import resource
+except ImportError:  # not available on Windows
+    resource = None
+
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+def peak_rss_mb():
+    """Peak resident set size of this process in MB, or None where unsupported."""
+    if resource is None:
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in KB on Linux and bytes on macOS
+    return rss / 1024 ** 2 if sys.platform == "darwin" else rss / 1024
+
+
+def current_rss_mb():
+    """Current resident set size of this process in MB, or None where unsupported (Linux only)."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 1024 ** 2
+    except (OSError, ValueError, IndexError, AttributeError):
+        return None
+
+
+class RunMetrics:
+    """Timers and counters of one optimization run."""
+
+    def __init__(self):
+        self.stages = {}
+        self.counters = {}
+        self.iterations = []
+        self.started_at = time.time()
+        self.finished_at = None
+        self._current = {}
+
+    @contextmanager
+    def stage(self, name):
+        """
+        Time a pipeline stage; totals are kept per stage and per iteration.
+        Where the RSS can be read, the stage stats also keep the largest change of the resident
+        set over one run of the stage (rss_delta_mb) and how far the stage has raised the peak
+        RSS of the process (peak_rss_growth_mb), which catches temporaries freed before it ends.
+        """
+        rss, peak = current_rss_mb(), peak_rss_mb()
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            stats = self.stages.get(name)
+            if stats is None:
+                stats = self.stages[name] = {"count": 0, "total": 0.0, "max": 0.0}
+            stats["count"] += 1
+            stats["total"] += elapsed
+            stats["max"] = max(stats["max"], elapsed)
+            self._current[name] = self._current.get(name, 0.0) + elapsed
+            if rss is not None:
+                delta = current_rss_mb() - rss
+                stats["rss_delta_mb"] = max(stats.get("rss_delta_mb", delta), delta)
+            if peak is not None:
+                stats["peak_rss_growth_mb"] = stats.get("peak_rss_growth_mb", 0.0) + peak_rss_mb() - peak
+
+    def set(self, name, value):
+        self.counters[name] = value
+
+    def end_iteration(self, iteration, **values):
+        """Close an iteration record with the stage times accumulated since the previous one."""
+        record = {"iteration": iteration, "stages": self._current}
+        record.update(values)
+        self.iterations.append(record)
+        self._current = {}
+
+    def finish(self):
+        self.finished_at = time.time()
+        self.counters["peak_rss_mb"] = peak_rss_mb()
+
+    def to_dict(self):
+        return {
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "wall_time": (self.finished_at or time.time()) - self.started_at,
+            "stages": self.stages,
+            "counters": self.counters,
+            "iterations": self.iterations,
+        }
+
+
+def project_summary(runs):
+    """
+    Dashboard summary of a project's runs, in percent:
+    materialSavings - material removed from the part,
+    timeReduction - estimated print time saved (proportional to deposited material),
+    qualityImprovement - gain in specific stiffness 1 / (compliance * volume) over the solid part.
+    """
+    runs = [run for run in runs if run.get("counters", {}).get("volume_fraction") is not None]
+    if not runs:
+        return {"materialSavings": 0, "timeReduction": 0, "qualityImprovement": 0, "runs": 0}
+    latest = runs[-1]["counters"]
+    savings = 100.0 * (1.0 - latest["volume_fraction"])
+    quality = 0.0
+    if latest.get("initial_compliance") and latest.get("final_compliance"):
+        quality = 100.0 * (latest["initial_compliance"] / (latest["final_compliance"] * latest["volume_fraction"]) - 1.0)
+    return {
+        "materialSavings": round(savings, 2),
+        "timeReduction": round(savings, 2),
+        "qualityImprovement": round(quality, 2),
+        "runs": len(runs),
+    }
+
+
+class MetricsRegistry:
+    """Bounded in-process store of finished runs with aggregate stage statistics."""
+
+    def __init__(self, max_runs=1000):
+        self.runs = deque(maxlen=max_runs)
+        self._lock = threading.Lock()
+
+    def record(self, metrics, project_id=None, job_id=None):
+        run = metrics.to_dict() if isinstance(metrics, RunMetrics) else dict(metrics)
+        run["project_id"] = None if project_id is None else str(project_id)
+        run["job_id"] = job_id
+        with self._lock:
+            self.runs.append(run)
+        return run
+
+    def project_runs(self, project_id):
+        with self._lock:
+            return [run for run in self.runs if run["project_id"] == str(project_id)]
+
+    def aggregate(self):
+        """Totals per stage and counts over all recorded runs."""
+        with self._lock:
+            runs = list(self.runs)
+        stages = {}
+        for run in runs:
+            for name, stats in run.get("stages", {}).items():
+                total = stages.setdefault(name, {"count": 0, "total": 0.0, "max": 0.0})
+                total["count"] += stats["count"]
+                total["total"] += stats["total"]
+                total["max"] = max(total["max"], stats["max"])
+                if "rss_delta_mb" in stats:
+                    total["rss_delta_mb"] = max(total.get("rss_delta_mb", stats["rss_delta_mb"]), stats["rss_delta_mb"])
+        for total in stages.values():
+            total["mean"] = total["total"] / total["count"] if total["count"] else 0.0
+        return {
+            "runs": len(runs),
+            "iterations": sum(len(run.get("iterations", [])) for run in runs),
+            "wall_time": sum(run.get("wall_time", 0.0) for run in runs),
+            "stages": stages,
+            "peak_rss_mb": peak_rss_mb(),
+        }
+
+
+registry = MetricsRegistry()
@@ -0,0 +1,534 @@
+"""
+Asynchronous optimization jobs.
+Jobs run in a bounded process pool; progress is reported through the optimizer's
+callback(iteration, voxel_grid, change) hook and exposed for polling and server-sent events.
+"""
+
+import json
+import multiprocessing
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+
+from flask import Blueprint, Response, jsonify, request
+
+from .config import OptimizationConfig
+from .transport import result_response
+from .instrumentation import registry
+from .memory import MemoryBudgetError, plan_voxel_size
+from .checkpoint import CheckpointError, load_checkpoint, read_state
+from .cache import file_digest
+from .results import config_hash
+import logging
+
+logger = logging.getLogger(__name__)
+
+TERMINAL_STATES = ("completed", "failed", "cancelled")
+
+
+class QueueFullError(RuntimeError):
+    pass
+
+
+class JobCancelled(Exception):
+    pass
+
+
+def _run_job(job_id, stl_path, config, events, cancel_event, resume_from=None):
+    """Worker process entry point: run or resume one optimization and stream progress events."""
+    from .optimizer import TopologyOptimizer
+
+    optimizer = TopologyOptimizer(config)
+
+    def callback(iteration, voxel_grid, change):
+        if cancel_event.is_set():
+            raise JobCancelled("Job cancelled")
+        events.put({
+            "job_id": job_id,
+            "type": "progress",
+            "iteration": int(iteration),
+            "change": float(change),
+            "compliance": optimizer.compliance,
+            "stages": optimizer.metrics.iterations[-1]["stages"] if optimizer.metrics.iterations else {},
+        })
+
+    events.put({"job_id": job_id, "type": "started", "pid": os.getpid()})
+    if resume_from is not None:
+        result = optimizer.resume(resume_from, callback=callback)
+    else:
+        result = optimizer.optimize(stl_path, callback=callback)
+    return result, optimizer.metrics.to_dict()
+
+
+def _run_sweep_job(job_id, stl_path, configs, events, cancel_event, workers, return_results, results_db, project_id):
+    """Worker process entry point: run a parameter sweep, streaming each variant's summary row."""
+    from .results import ResultStore
+    from .sweep import run_sweep
+
+    events.put({"job_id": job_id, "type": "started", "pid": os.getpid()})
+    sweep = run_sweep(stl_path, configs, workers=workers, return_results=return_results,
+                      result_store=ResultStore(results_db) if results_db else None, project_id=project_id,
+                      on_row=lambda row: events.put({"job_id": job_id, "type": "row", "row": row}),
+                      cancel_event=cancel_event)
+    return sweep, None
+
+
+class Job:
+    def __init__(self, job_id, stl_path, config, project_id=None, resumed_from=None, kind="optimization"):
+        self.id = job_id
+        self.kind = kind
+        self.stl_path = stl_path
+        self.config = config
+        self.project_id = project_id
+        self.resumed_from = resumed_from
+        self.status = "queued"
+        self.iteration = None
+        self.change = None
+        self.compliance = None
+        self.error = None
+        self.result = None
+        self.metrics = None
+        # Summary rows of a sweep job, as its variants finish
+        self.rows = []
+        self.events = []
+        self.submitted_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.future = None
+        self.cancel_event = None
+        # Result store keys, and the stored result id when the job was answered from the store
+        self.mesh_hash = None
+        self.config_hash = None
+        self.result_id = None
+
+    def to_dict(self):
+        return {
+            "job_id": self.id,
+            "kind": self.kind,
+            "project_id": self.project_id,
+            "resumed_from": self.resumed_from,
+            "status": self.status,
+            "iteration": self.iteration,
+            "change": self.change,
+            "compliance": self.compliance,
+            "error": self.error,
+            "cached": self.result_id is not None,
+            "result_id": self.result_id,
+            "submitted_at": self.submitted_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+        }
+
+
+class JobManager:
+    """
+    Bounded process pool for optimization jobs with progress tracking and cancellation.
+    With a checkpoint_root, every job is checkpointed to checkpoint_root/<job id> and can be
+    resumed after it was cancelled, failed or the server restarted.
+    With a result_store, completed results are stored and a submission of an already optimized
+    (STL content, config) pair completes immediately with the stored densities.
+    Finished jobs, with their density grids, are dropped job_ttl seconds after they finished,
+    and beyond the max_finished most recent ones.
+    Parameter sweeps run as jobs too, each on at most sweep_workers processes (default: the
+    CPUs shared among the max_workers job slots), so concurrent sweeps stay within the machine.
+    """
+
+    def __init__(self, max_workers=None, max_queue=16, metrics_registry=registry, checkpoint_root=None,
+                 result_store=None, job_ttl=3600.0, max_finished=64, sweep_workers=None):
+        self.max_workers = max_workers or max(1, min(4, (os.cpu_count() or 2) // 2))
+        self.max_queue = max_queue
+        self.sweep_workers = sweep_workers or max(1, (os.cpu_count() or 1) // self.max_workers)
+        self.job_ttl = job_ttl
+        self.max_finished = max_finished
+        self.metrics_registry = metrics_registry
+        self.checkpoint_root = checkpoint_root
+        self.result_store = result_store
+        self.jobs = {}
+        self._lock = threading.Lock()
+        self._changed = threading.Condition(self._lock)
+        self._executor = None
+        self._manager = None
+        self._events = None
+
+    def _start(self):
+        if self._executor is not None:
+            return
+        context = multiprocessing.get_context("spawn")
+        self._manager = context.Manager()
+        self._events = self._manager.Queue()
+        self._executor = ProcessPoolExecutor(max_workers=self.max_workers, mp_context=context)
+        threading.Thread(target=self._drain_events, daemon=True).start()
+
+    def active_count(self):
+        return sum(job.status not in TERMINAL_STATES for job in self.jobs.values())
+
+    def submit(self, stl_path, config=None, project_id=None, resume_from=None):
+        """Queue an optimization job and return its id."""
+        config = config or OptimizationConfig()
+        keys = None
+        if self.result_store is not None:
+            keys = (file_digest(stl_path), config_hash(config))
+            stored = self.result_store.get(*keys) if resume_from is None else None
+            if stored is not None:
+                return self._complete_from_store(stl_path, config, project_id, *stored)
+        with self._lock:
+            if self.active_count() >= self.max_queue:
+                raise QueueFullError(f"Job queue is full ({self.max_queue} active jobs)")
+            self._start()
+            self._evict()
+            job_id = uuid.uuid4().hex
+            if self.checkpoint_root and not config.checkpoint_dir:
+                config = OptimizationConfig(**dict(vars(config), checkpoint_dir=os.path.join(self.checkpoint_root, job_id)))
+            job = Job(job_id, stl_path, config, project_id, resumed_from=resume_from)
+            if keys is not None:
+                job.mesh_hash, job.config_hash = keys
+            job.cancel_event = self._manager.Event()
+            self.jobs[job.id] = job
+            self._append_event(job, {"type": "queued"})
+            job.future = self._executor.submit(_run_job, job.id, stl_path, job.config, self._events, job.cancel_event,
+                                               self.checkpoint_dir(resume_from) if resume_from else None)
+        job.future.add_done_callback(lambda future, job=job: self._finish(job, future))
+        logger.info(f"Submitted job {job.id} for {stl_path}")
+        return job.id
+
+    def submit_sweep(self, stl_path, configs, workers=None, return_results=False, project_id=None):
+        """
+        Queue a parameter sweep (see backend.sweep.run_sweep) on at most sweep_workers processes
+        and return its job id. Its summary rows arrive as "row" events and in job.rows; the
+        job's result is the sweep summary.
+        """
+        workers = min(workers or self.sweep_workers, self.sweep_workers)
+        results_db = self.result_store.path if self.result_store is not None else None
+        with self._lock:
+            if self.active_count() >= self.max_queue:
+                raise QueueFullError(f"Job queue is full ({self.max_queue} active jobs)")
+            self._start()
+            self._evict()
+            job = Job(uuid.uuid4().hex, stl_path, configs[0], project_id, kind="sweep")
+            job.cancel_event = self._manager.Event()
+            self.jobs[job.id] = job
+            self._append_event(job, {"type": "queued", "variants": len(configs)})
+            job.future = self._executor.submit(_run_sweep_job, job.id, stl_path, configs, self._events,
+                                               job.cancel_event, workers, return_results, results_db, project_id)
+        job.future.add_done_callback(lambda future, job=job: self._finish(job, future))
+        logger.info(f"Submitted sweep job {job.id} of {len(configs)} variants for {stl_path}")
+        return job.id
+
+    def is_stored(self, stl_path, config):
+        """Whether the result store already holds the result of this STL and config."""
+        return self.result_store is not None and self.result_store.contains(file_digest(stl_path), config_hash(config))
+
+    def _complete_from_store(self, stl_path, config, project_id, densities, summary):
+        """Register a job answered by a stored result; it is completed without running."""
+        with self._lock:
+            self._evict()
+            job = Job(uuid.uuid4().hex, stl_path, config, project_id)
+            job.mesh_hash, job.config_hash = summary["mesh_hash"], summary["config_hash"]
+            job.result_id = summary["id"]
+            job.result = densities
+            job.metrics = {"wall_time": summary["wall_time"], "stages": summary["stages"],
+                           "counters": summary["counters"], "iterations": []}
+            job.status = "completed"
+            job.compliance = summary["compliance"]
+            job.iteration = summary["iterations"]
+            job.finished_at = time.time()
+            self.jobs[job.id] = job
+            self._append_event(job, {"type": "completed", "error": None, "result_id": job.result_id})
+        logger.info(f"Job {job.id} for {stl_path} answered by stored result {job.result_id}")
+        return job.id
+
+    def get(self, job_id):
+        return self.jobs.get(job_id)
+
+    def checkpoint_dir(self, job_or_checkpoint, allow_path=True):
+        """Checkpoint directory of a job id (current or from before a restart) or a checkpoint path."""
+        job = self.jobs.get(job_or_checkpoint)
+        if job is not None:
+            return job.config.checkpoint_dir
+        if self.checkpoint_root and read_state(os.path.join(self.checkpoint_root, job_or_checkpoint)) is not None:
+            return os.path.join(self.checkpoint_root, job_or_checkpoint)
+        if allow_path and os.path.isdir(job_or_checkpoint):
+            return job_or_checkpoint
+        return None
+
+    def resume(self, job_or_checkpoint, project_id=None):
+        """
+        Queue a job continuing the latest checkpoint of a finished or interrupted job (by id)
+        or of a checkpoint directory. Returns the new job id.
+        """
+        job = self.jobs.get(job_or_checkpoint)
+        if job is not None and job.status not in TERMINAL_STATES:
+            raise CheckpointError(f"Job {job.id} is still {job.status}")
+        directory = self.checkpoint_dir(job_or_checkpoint)
+        state = read_state(directory) if directory else None
+        if state is None:
+            raise CheckpointError(f"No checkpoint for {job_or_checkpoint}")
+        config = OptimizationConfig(**dict(state["config"], checkpoint_dir=directory))
+        if project_id is None and job is not None:
+            project_id = job.project_id
+        return self.submit(state["stl_path"], config, project_id=project_id, resume_from=job_or_checkpoint)
+
+    def latest(self, job_or_checkpoint):
+        """Latest checkpointed state and physical densities of a job, read without interrupting it."""
+        directory = self.checkpoint_dir(job_or_checkpoint)
+        if directory is None:
+            raise CheckpointError(f"No checkpoint for {job_or_checkpoint}")
+        state, arrays = load_checkpoint(directory, names=["physical"])
+        return state, arrays["physical"]
+
+    def cancel(self, job_id):
+        """Cancel a queued job, or ask a running job to stop at its next iteration."""
+        job = self.jobs.get(job_id)
+        if job is None or job.status in TERMINAL_STATES:
+            return False
+        job.cancel_event.set()
+        job.future.cancel()
+        return True
+
+    def wait(self, job_id, timeout=None):
+        """Block until the job reaches a terminal state; returns the job."""
+        job = self.jobs[job_id]
+        with self._changed:
+            self._changed.wait_for(lambda: job.status in TERMINAL_STATES, timeout=timeout)
+        return job
+
+    def iter_events(self, job_id, start=0, timeout=30.0, keepalive=False):
+        """
+        Yield the job's events from index start on, blocking for new ones until it finishes.
+        When no event arrives for timeout seconds the iteration stops, or with keepalive yields
+        None and keeps waiting.
+        """
+        job = self.jobs[job_id]
+        index = max(0, start)
+        while True:
+            with self._changed:
+                self._changed.wait_for(
+                    lambda: len(job.events) > index or job.status in TERMINAL_STATES, timeout=timeout)
+                pending = job.events[index:]
+                done = job.status in TERMINAL_STATES
+            if not pending and not done:
+                if not keepalive:
+                    return
+                yield None
+                continue
+            for event in pending:
+                yield event
+            index += len(pending)
+            if done and index >= len(job.events):
+                return
+
+    def shutdown(self):
+        if self._executor is not None:
+            for job in self.jobs.values():
+                if job.status not in TERMINAL_STATES:
+                    job.cancel_event.set()
+            self._executor.shutdown(wait=True, cancel_futures=True)
+            self._manager.shutdown()
+            self._executor = None
+
+    def _append_event(self, job, event):
+        event = dict(event, job_id=job.id, status=job.status, time=time.time(), index=len(job.events))
+        job.events.append(event)
+        self._changed.notify_all()
+
+    def _evict(self):
+        """Drop finished jobs past job_ttl and beyond the max_finished most recent (holding the lock)."""
+        finished = sorted((job for job in self.jobs.values() if job.status in TERMINAL_STATES),
+                          key=lambda job: job.finished_at)
+        expired = time.time() - self.job_ttl
+        for position, job in enumerate(finished):
+            if job.finished_at < expired or position < len(finished) - self.max_finished:
+                del self.jobs[job.id]
+
+    def _drain_events(self):
+        while True:
+            try:
+                event = self._events.get()
+            except (EOFError, OSError):
+                return
+            with self._lock:
+                job = self.jobs.get(event.get("job_id"))
+                if job is None or job.status in TERMINAL_STATES:
+                    continue
+                if event["type"] == "started":
+                    job.status = "running"
+                    job.started_at = time.time()
+                elif event["type"] == "progress":
+                    job.iteration = event["iteration"]
+                    job.change = event["change"]
+                    job.compliance = event["compliance"]
+                elif event["type"] == "row":
+                    job.rows.append(event["row"])
+                self._append_event(job, event)
+
+    def _finish(self, job, future):
+        # Store the result before the job is seen as completed, so a resubmission finds it
+        succeeded = not future.cancelled() and not job.cancel_event.is_set() and future.exception() is None
+        if succeeded and self.result_store is not None and job.mesh_hash is not None:
+            result, metrics = future.result()
+            try:
+                self.result_store.put(job.mesh_hash, job.config_hash, result, metrics, config=job.config,
+                                      project_id=job.project_id, job_id=job.id)
+            except sqlite3.Error as e:
+                logger.warning(f"Could not store the result of job {job.id}: {e}")
+        with self._lock:
+            if future.cancelled() or job.cancel_event.is_set():
+                job.status = "cancelled"
+            elif future.exception() is not None:
+                job.status = "failed"
+                job.error = str(future.exception())
+            else:
+                job.status = "completed"
+                job.result, job.metrics = future.result()
+                if job.metrics is not None:
+                    self.metrics_registry.record(job.metrics, project_id=job.project_id, job_id=job.id)
+            job.finished_at = time.time()
+            self._append_event(job, {"type": job.status, "error": job.error})
+            self._evict()
+        logger.info(f"Job {job.id} {job.status}")
+
+
+def parse_config(data):
+    """Build an OptimizationConfig from the optional 'config' object of a request."""
+    return OptimizationConfig(**(data.get("config") or {})).validate()
+
+
+def submit_request(manager, data):
+    """
+    Submit the optimization job of a request ({"stl_path", "config", "project_id"}) and return
+    the (JSON body, status) response: 202 with the job id, or 200 when the result was stored.
+    """
+    stl_path = data.get('stl_path')
+    if not stl_path or not os.path.isfile(stl_path):
+        return {"error": "Invalid or missing STL file path"}, 400
+    try:
+        config = parse_config(data)
+    except (TypeError, ValueError) as e:
+        return {"error": f"Invalid config: {e}"}, 400
+    if config.memory_budget_mb is not None and not manager.is_stored(stl_path, config):
+        # Reject over-budget jobs before they take a queue slot
+        try:
+            plan_voxel_size(stl_path, config)
+        except MemoryBudgetError as e:
+            return {"error": str(e)}, 413
+    try:
+        job_id = manager.submit(stl_path, config, project_id=data.get('project_id'))
+    except QueueFullError as e:
+        return {"error": str(e)}, 429
+    job = manager.get(job_id)
+    if job.result_id is not None:
+        return {"job_id": job_id, "status": job.status, "cached": True, "result_id": job.result_id}, 200
+    return {"job_id": job_id, "status": "queued"}, 202
+
+
+def create_jobs_blueprint(manager):
+    """Job API: submit, poll, stream progress, cancel, resume and fetch results, checkpoints and metrics."""
+    jobs = Blueprint("jobs", __name__)
+
+    @jobs.route('/api/jobs', methods=['POST'])
+    def submit_job():
+        body, status = submit_request(manager, request.get_json(silent=True) or {})
+        return jsonify(body), status
+
+    @jobs.route('/api/jobs/<job_id>', methods=['GET'])
+    def job_status(job_id):
+        job = manager.get(job_id)
+        if job is None:
+            return jsonify({"error": "Unknown job"}), 404
+        return jsonify(job.to_dict()), 200
+
+    @jobs.route('/api/jobs/<job_id>', methods=['DELETE'])
+    def cancel_job(job_id):
+        job = manager.get(job_id)
+        if job is None:
+            return jsonify({"error": "Unknown job"}), 404
+        cancelled = manager.cancel(job_id)
+        return jsonify({"job_id": job_id, "cancelled": cancelled}), 200
+
+    @jobs.route('/api/jobs/<job_id>/events', methods=['GET'])
+    def job_events(job_id):
+        if manager.get(job_id) is None:
+            return jsonify({"error": "Unknown job"}), 404
+        # A reconnecting client continues after the last event it saw
+        try:
+            start = int(request.headers.get("Last-Event-ID", -1)) + 1
+        except ValueError:
+            start = 0
+
+        def stream():
+            for event in manager.iter_events(job_id, start=start, keepalive=True):
+                if event is None:
+                    yield ": ping\n\n"
+                else:
+                    yield f"id: {event['index']}\nevent: {event['type']}\ndata: {json.dumps(event)}\n\n"
+
+        return Response(stream(), mimetype="text/event-stream", headers={"Cache-Control": "no-cache"})
+
+    @jobs.route('/api/jobs/<job_id>/resume', methods=['POST'])
+    def resume_job(job_id):
+        if manager.checkpoint_dir(job_id, allow_path=False) is None:
+            return jsonify({"error": "Unknown job"}), 404
+        try:
+            new_id = manager.resume(job_id)
+        except CheckpointError as e:
+            return jsonify({"error": str(e)}), 409
+        except QueueFullError as e:
+            return jsonify({"error": str(e)}), 429
+        return jsonify({"job_id": new_id, "resumed_from": job_id, "status": "queued"}), 202
+
+    @jobs.route('/api/jobs/<job_id>/latest', methods=['GET'])
+    def job_latest(job_id):
+        if manager.checkpoint_dir(job_id, allow_path=False) is None:
+            return jsonify({"error": "Unknown job"}), 404
+        try:
+            state, physical = manager.latest(job_id)
+        except CheckpointError as e:
+            return jsonify({"error": str(e)}), 409
+        response, status = result_response(physical, request, voxel_size=state.get("grid_voxel_size", 1.0),
+                                            origin=state.get("grid_origin"))
+        response.headers["X-Checkpoint-Iteration"] = str(state["iteration"])
+        return response, status
+
+    @jobs.route('/api/jobs/<job_id>/metrics', methods=['GET'])
+    def job_metrics(job_id):
+        job = manager.get(job_id)
+        if job is None:
+            return jsonify({"error": "Unknown job"}), 404
+        if job.metrics is None:
+            return jsonify({"error": f"Job is {job.status}", "status": job.status}), 409
+        return jsonify(job.metrics), 200
+
+    @jobs.route('/api/jobs/<job_id>/result', methods=['GET'])
+    def job_result(job_id):
+        job = manager.get(job_id)
+        if job is None:
+            return jsonify({"error": "Unknown job"}), 404
+        if job.status != "completed":
+            return jsonify({"error": f"Job is {job.status}", "status": job.status}), 409
+        counters = (job.metrics or {}).get("counters", {})
+        return result_response(job.result, request, voxel_size=counters.get("voxel_size", job.config.voxel_size),
+                               origin=counters.get("grid_origin"))
+
+    return jobs
+
+
+def register_job_api(app):
+    """
+    Set up the job manager of a server app and register the job, metrics and sweep endpoints.
+    Results are persisted to projects.db unless OPTIMIZER_RESULTS_DB points elsewhere (empty:
+    disabled); checkpoints go under OPTIMIZER_CHECKPOINT_DIR. Returns the JobManager.
+    """
+    from .metrics_api import create_metrics_blueprint
+    from .results import DEFAULT_RESULTS_DB, ResultStore
+    from .sweep_api import create_sweep_blueprint
+
+    results_path = os.environ.get("OPTIMIZER_RESULTS_DB", DEFAULT_RESULTS_DB)
+    result_store = ResultStore(results_path) if results_path else None
+    manager = JobManager(checkpoint_root=os.environ.get("OPTIMIZER_CHECKPOINT_DIR"), result_store=result_store)
+    app.register_blueprint(create_jobs_blueprint(manager))
+    app.register_blueprint(create_metrics_blueprint(registry, result_store))
+    app.register_blueprint(create_sweep_blueprint(manager))
+    return manager
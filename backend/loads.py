@@ -0,0 +1,145 @@
+"""
+Load cases for the structured voxel mesh.
+A load case clamps the nodes on some faces of the part's bounding box and distributes a total
+force over the nodes on another face. Load cases with the same supports share their free DOFs
+and so one system matrix: they are grouped and solved together with one right-hand side column
+per case.
+On a domain reduced by mirror symmetry, the normal displacement of the nodes on each symmetry
+plane is fixed, and the load on those nodes is split with their mirror images.
+"""
+
+import numpy as np
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Bounding box faces: (axis, side) with side 0 for the minimum and 1 for the maximum coordinate
+FACES = {
+    "xmin": (0, 0), "xmax": (0, 1),
+    "ymin": (1, 0), "ymax": (1, 1),
+    "zmin": (2, 0), "zmax": (2, 1),
+}
+AXES = {"x": 0, "y": 1, "z": 2}
+
+
+def symmetry_axes(setting):
+    """Axes to try for config.symmetry: none for None, all for "auto", else the listed ones."""
+    if setting is None:
+        return ()
+    if setting == "auto":
+        return tuple(AXES.values())
+    axes = []
+    for axis in [setting] if isinstance(setting, str) else setting:
+        if axis not in AXES:
+            raise ValueError(f"Unknown symmetry axis {axis!r}; expected 'auto' or axes from {sorted(AXES)}")
+        axes.append(AXES[axis])
+    return tuple(sorted(set(axes)))
+
+
+class LoadCase:
+    """
+    Nodes on the `fixed` faces are clamped and `force` (a total force vector) is spread evenly
+    over the nodes on the `loaded` face. The case's compliance enters the objective with `weight`.
+    The default is the build plate case: bottom face fixed, unit downward load on the top face.
+    """
+
+    def __init__(self, fixed=("zmin",), loaded="zmax", force=(0.0, 0.0, -1.0), weight=1.0, name=None):
+        fixed = (fixed,) if isinstance(fixed, str) else tuple(fixed)
+        for face in fixed + (loaded,):
+            if face not in FACES:
+                raise ValueError(f"Unknown face {face!r}; expected one of {sorted(FACES)}")
+        force = tuple(float(f) for f in force)
+        if len(force) != 3:
+            raise ValueError(f"Load case force must have 3 components, got {len(force)}")
+        if not weight >= 0:
+            raise ValueError(f"Load case weight must be non-negative, got {weight}")
+        self.fixed = tuple(sorted(set(fixed)))
+        self.loaded = loaded
+        self.force = force
+        self.weight = float(weight)
+        self.name = name
+
+    @classmethod
+    def from_spec(cls, spec):
+        """LoadCase from a LoadCase or a dict of its arguments (the form used in configs and requests)."""
+        return spec if isinstance(spec, cls) else cls(**spec)
+
+    def is_symmetric(self, axis):
+        """Whether the supports and the load are their own mirror image about a plane normal to axis."""
+        low, high = (face for face, (face_axis, _) in FACES.items() if face_axis == axis)
+        return ((low in self.fixed) == (high in self.fixed) and self.loaded not in (low, high)
+                and self.force[axis] == 0.0)
+
+    def to_dict(self):
+        return {"fixed": list(self.fixed), "loaded": self.loaded, "force": list(self.force),
+                "weight": self.weight, "name": self.name}
+
+    def __repr__(self):
+        return (f"LoadCase(fixed={self.fixed}, loaded={self.loaded!r}, force={self.force}, "
+                f"weight={self.weight}, name={self.name!r})")
+
+
+class LoadCaseGroup:
+    """Load cases with the same supports: their free DOFs and the (ndof, n_cases) load matrix."""
+
+    def __init__(self, cases, indices, free_dofs, F):
+        self.cases = cases
+        # Positions of the cases in the configured load case list
+        self.indices = indices
+        self.free_dofs = free_dofs
+        self.F = F
+
+    @property
+    def weights(self):
+        return np.array([case.weight for case in self.cases])
+
+    def rhs(self):
+        """Load matrix, or the load vector when the group has a single case."""
+        return self.F[:, 0] if self.F.shape[1] == 1 else self.F
+
+
+def face_nodes(nodes, face):
+    """Indices of the nodes on a bounding box face."""
+    axis, side = FACES[face]
+    coordinate = nodes[:, axis]
+    return np.flatnonzero(coordinate == (coordinate.max() if side else coordinate.min()))
+
+
+def build_load_case_groups(nodes, specs=None, symmetry_planes=None):
+    """
+    Group the load cases (LoadCase objects or dicts; default: the build plate case) by their
+    supports and build the free DOFs and load matrix of each group.
+    With symmetry_planes ({axis: coordinate}) the nodes are the low side of a mirror-symmetric
+    part cut at those planes: the high faces are the planes themselves, whose nodes keep their
+    normal DOF fixed, and each node carries the share of the full part's load that falls on it.
+    """
+    cases = [LoadCase.from_spec(spec) for spec in specs] if specs else [LoadCase()]
+    symmetry_planes = symmetry_planes or {}
+    on_plane = {axis: nodes[:, axis] == coordinate for axis, coordinate in symmetry_planes.items()}
+    ndof = len(nodes) * 3
+    groups = {}
+    for index, case in enumerate(cases):
+        groups.setdefault(case.fixed, []).append(index)
+
+    result = []
+    for fixed, indices in groups.items():
+        faces = [face for face in fixed if FACES[face] not in {(axis, 1) for axis in symmetry_planes}]
+        fixed_nodes = np.unique(np.concatenate([face_nodes(nodes, face) for face in faces]))
+        fixed_dofs = (3 * fixed_nodes[:, None] + np.arange(3)).ravel()
+        for axis, plane in on_plane.items():
+            fixed_dofs = np.concatenate((fixed_dofs, 3 * np.flatnonzero(plane) + axis))
+        free_dofs = np.setdiff1d(np.arange(ndof), fixed_dofs)
+        F = np.zeros((ndof, len(indices)))
+        for column, index in enumerate(indices):
+            loaded_nodes = face_nodes(nodes, cases[index].loaded)
+            # Copies of each node in the full part: nodes off a plane are mirrored across it
+            copies = np.ones(len(loaded_nodes))
+            for plane in on_plane.values():
+                copies *= np.where(plane[loaded_nodes], 1.0, 2.0)
+            total = copies.sum() * 2 ** len(on_plane)
+            for axis, component in enumerate(cases[index].force):
+                F[3 * loaded_nodes + axis, column] = component * copies / total
+        logger.info(f"Load case group {list(fixed)}: {len(indices)} cases, {len(fixed_nodes)} fixed nodes, "
+                    f"{len(free_dofs)} free DOFs")
+        result.append(LoadCaseGroup([cases[i] for i in indices], indices, free_dofs, F))
+    return result
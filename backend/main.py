@@ -2,11 +2,22 @@
 """
 Main entry point for the backend server.
 Handles API requests for topology optimization.
+With arguments (main.py input.stl output.npy, or --serve) it runs the headless CLI instead
+(see backend.cli), which is how the desktop app spawns it.
 """
 
+import sys
+
+if __name__ == '__main__' and len(sys.argv) > 1:
+    # Headless mode: hand over before Flask and the solver stack are imported
+    import os
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    from backend.cli import main
+    sys.exit(main())
+
 from flask import Flask, request, jsonify
-from backend.optimizer import TopologyOptimizer
 from backend.config import OptimizationConfig
+from backend.jobs import register_job_api, submit_request
 import logging
 import cProfile
 import io
@@ -14,12 +25,13 @@ import pstats
 import os
 
 app = Flask(__name__)
-
-optimizer = TopologyOptimizer()
+job_manager = register_job_api(app)
 
 def profile_function(func):
-    """Decorator to profile an endpoint."""
+    """Decorator to profile an endpoint with cProfile when the request asks for it (?profile=1)."""
     def wrapper(*args, **kwargs):
+        if request.args.get('profile', '').lower() not in ('1', 'true', 'yes'):
+            return func(*args, **kwargs)
         pr = cProfile.Profile()
         try:
             pr.enable()
@@ -42,20 +54,12 @@ def profile_function(func):
 def optimize():
     """
     API endpoint to perform topology optimization.
-    Expects a JSON request with an STL file path.
+    Expects a JSON request with an STL file path (and optionally "config" and "project_id").
+    The optimization runs as a job: the response is 202 with the job id, to be followed through
+    /api/jobs/<id> and its events, or 200 when the result is already stored.
     """
-    try:
-        data = request.get_json()
-        stl_path = data.get('stl_path')
-
-        if not stl_path or not os.path.isfile(stl_path):
-            return jsonify({"error": "Invalid or missing STL file path"}), 400
-
-        result = optimizer.optimize(stl_path)
-        return jsonify({"success": True, "result": result.tolist()}), 200
-    except Exception as e:
-        logging.error(f"Optimization error: {e}")
-        return jsonify({"error": str(e)}), 500
+    body, status = submit_request(job_manager, request.get_json(silent=True) or {})
+    return jsonify(body), status
 
 @app.route('/api/health', methods=['GET'])
 def health():
@@ -0,0 +1,150 @@
+"""
+Memory budgeting for optimization jobs.
+Predicts the peak array memory of a run from its voxel, element and node counts and
+plans the voxel size before any work is done: jobs that would exceed the configured
+budget are rejected or coarsened.
+"""
+
+import numpy as np
+import trimesh
+from .filters import filter_kernel
+from .stl import measure_binary_stl
+import logging
+
+logger = logging.getLogger(__name__)
+
+PRECISIONS = {"float64": np.float64, "float32": np.float32}
+
+# Stiffness entries per node of a hexahedral lattice (27 neighbours x 3 x 3 DOFs)
+K_NNZ_PER_NODE = 243
+# Entries of KE scattered per element by the assembly
+KE_ENTRIES = 576
+# Grid-sized arrays alive during an iteration: design, previous and physical densities,
+# sensitivities, filtered sensitivities, the OC work buffers and the updated grid
+GRID_ARRAYS = 12
+# Allowance for allocator overhead and small temporaries
+HEADROOM = 1.1
+
+
+class MemoryBudgetError(RuntimeError):
+    pass
+
+
+def precision_dtype(precision):
+    """Floating point dtype of a precision mode name."""
+    try:
+        return PRECISIONS[precision]
+    except KeyError:
+        raise ValueError(f"Unknown precision: {precision}") from None
+
+
+def estimate_peak_memory(n_voxels, n_elements, n_nodes, config):
+    """
+    Estimated peak memory in bytes of one optimization iteration, by component.
+    The assembly and the solve are transient and do not overlap; everything else is alive
+    for the whole run. Returns a dict of component sizes including "peak".
+    """
+    f = np.dtype(precision_dtype(config.precision)).itemsize
+    ndof = 3 * n_nodes
+    i = 4 if ndof < np.iinfo(np.int32).max else 8
+    nnz = K_NNZ_PER_NODE * n_nodes
+    triplets = KE_ENTRIES * n_elements
+
+    estimate = {
+        "grid": GRID_ARRAYS * n_voxels * f,
+        "mesh": n_nodes * 3 * 4 + n_elements * (8 + 24 + 1) * i,
+        "pattern": 2 * triplets * i,
+        "matrix": nnz * (f + i),
+    }
+
+    kernel = int(np.count_nonzero(filter_kernel(config.rmin))) if config.rmin > 1.0 else 0
+    if config.filter_type == "none" or kernel == 0:
+        estimate["filter"] = 0
+    elif config.filter_method == "fft" or (config.filter_method == "auto" and n_voxels * kernel > 50_000_000):
+        # Padded complex spectra of the field and the kernel
+        estimate["filter"] = 4 * n_voxels * 16
+    else:
+        estimate["filter"] = n_voxels * kernel * (f + i)
+
+    # Values and COO -> CSR conversion buffers of the scattered element matrices
+    assembly = triplets * (2 * f + i)
+    # Free-DOF submatrix (plus the row-sliced intermediate) and the solver's own storage
+    solve = 2 * nnz * (f + i)
+    matrix_free = getattr(config, "matrix_free", False)
+    cases = len(getattr(config, "load_cases", None) or []) or 1
+    if matrix_free:
+        # No global matrix: per-block local DOF maps, the block element order and shared vectors
+        estimate["pattern"] = n_elements * 25 * i
+        estimate["matrix"] = 0
+        assembly = 0
+        solve = 4 * ndof * 8 * cases
+    elif getattr(config, "fem_workers", 1) != 1:
+        # Parallel assembly keeps the CSR order of the element entries and the summation starts
+        estimate["pattern"] += (triplets + nnz) * i
+        assembly = triplets * f
+    solver = config.solver
+    if solver == "auto":
+        solver = "direct" if ndof <= config.direct_solver_max_dofs and not matrix_free else "pcg"
+    if solver == "direct":
+        # Factors are computed in double precision; the fill of solid voxel blocks, about 3.5 ndof^1.6,
+        # bounds that of thinner parts
+        solve += nnz * 12 + int(3.5 * ndof ** 1.6) * 12
+    else:
+        # CG vectors (one set per load case), plus prolongations and Galerkin coarse operators
+        # of the multigrid hierarchy
+        solve += 8 * ndof * 8 * cases
+        if config.preconditioner == "multigrid" and not matrix_free:
+            solve += nnz * (f + i) // 2
+
+    estimate["assembly"] = assembly
+    estimate["solve"] = solve
+    estimate["peak"] = int(HEADROOM * (estimate["grid"] + estimate["mesh"] + estimate["pattern"] + estimate["matrix"]
+                                       + estimate["filter"] + max(assembly, solve)))
+    return estimate
+
+
+def estimate_counts(extents, area, voxel_size):
+    """
+    Upper estimates of the voxel, element and node counts of a mesh voxelized at voxel_size,
+    from its bounding box extents and surface area. The voxelization keeps the surface layer
+    of the part, about 1.3 elements and 2.8 nodes per voxel face of area.
+    """
+    shape = np.round(np.asarray(extents, dtype=float) / voxel_size).astype(np.int64) + 1
+    n_voxels = int(np.prod(shape))
+    faces = area / voxel_size ** 2
+    n_elements = min(n_voxels, int(np.ceil(1.5 * faces)))
+    n_nodes = min(int(np.prod(shape + 1)), int(np.ceil(3.0 * faces)))
+    return n_voxels, n_elements, n_nodes
+
+
+def plan_voxel_size(stl_path, config, max_coarsening=4):
+    """
+    Pre-flight check of a job against config.memory_budget_mb.
+    Returns the finest voxel size to run at and its estimated peak memory in bytes.
+    With memory_policy "coarsen" the voxel size is doubled until the estimate fits,
+    otherwise (or when it still does not fit) MemoryBudgetError is raised.
+    Binary STLs are measured from their mapped records without loading a trimesh.
+    """
+    measured = measure_binary_stl(stl_path)
+    if measured is None:
+        mesh = trimesh.load(stl_path)
+        measured = mesh.bounds, mesh.area
+    bounds, area = measured
+    extents = bounds[1] - bounds[0]
+    voxel_size = config.voxel_size
+    budget = None if config.memory_budget_mb is None else config.memory_budget_mb * 1024 ** 2
+    for step in range(max_coarsening + 1):
+        counts = estimate_counts(extents, area, voxel_size)
+        peak = estimate_peak_memory(*counts, config)["peak"]
+        if budget is None or peak <= budget:
+            if step:
+                logger.warning(f"Coarsened voxel size from {config.voxel_size} to {voxel_size} "
+                               f"to fit the memory budget of {config.memory_budget_mb} MB")
+            return voxel_size, peak
+        logger.info(f"Voxel size {voxel_size}: {counts[0]} voxels, {counts[1]} elements, "
+                    f"estimated peak {peak / 1024 ** 2:.0f} MB")
+        if config.memory_policy != "coarsen":
+            break
+        voxel_size *= 2
+    raise MemoryBudgetError(f"Estimated peak memory {peak / 1024 ** 2:.0f} MB exceeds the budget of "
+                            f"{config.memory_budget_mb} MB")
@@ -8,22 +8,35 @@ import trimesh
 import numpy as np
 import logging
 
+from .stl import measure_binary_stl
+from .voxelize import voxelize_stl
+
 logger = logging.getLogger(__name__)
 
 class MeshHandler:
     @staticmethod
-    def load_and_voxelize(stl_path, voxel_size=1.0):
+    def load_and_voxelize(stl_path, voxel_size=1.0, cache=None, workers=None):
         try:
-            logger.info(f"Loading STL file: {stl_path}")
-            mesh = trimesh.load(stl_path)
-            logger.info(f"Loaded mesh vertices: {len(mesh.vertices)}, faces: {len(mesh.faces)}")
+            if cache is not None:
+                key = cache.key(stl_path, voxel_size)
+                cached = cache.get(key)
+                if cached is not None:
+                    logger.info(f"Voxel cache hit for {stl_path} (voxel size {voxel_size})")
+                    return cached
 
-            logger.info(f"Voxelizing mesh with voxel size: {voxel_size}")
-            voxels = mesh.voxelized(voxel_size)
-            logger.info(f"Voxel grid shape: {voxels.shape}")
+            # Binary STLs are streamed from a memory map; other formats go through trimesh
+            logger.info(f"Voxelizing {stl_path} with voxel size: {voxel_size}")
+            voxel_matrix = voxelize_stl(stl_path, voxel_size, workers=workers)
+            if voxel_matrix is None:
+                logger.info(f"Loading STL file: {stl_path}")
+                mesh = trimesh.load(stl_path)
+                logger.info(f"Loaded mesh vertices: {len(mesh.vertices)}, faces: {len(mesh.faces)}")
+                voxel_matrix = mesh.voxelized(voxel_size).matrix
+            logger.info(f"Voxel grid shape: {voxel_matrix.shape}")
 
-            voxel_matrix = voxels.matrix
             nodes, elements = MeshHandler.voxel_to_nodes_elements(voxel_matrix, voxel_size)
+            if cache is not None:
+                cache.put(key, voxel_matrix, nodes, elements)
 
             return voxel_matrix, nodes, elements
 
@@ -31,31 +44,50 @@ class MeshHandler:
             logger.error(f"Error loading STL file {stl_path}: {e}", exc_info=True)
             return None, None, None
 
+    @staticmethod
+    def grid_origin(stl_path, voxel_size):
+        """Position of the center of voxel (0, 0, 0) of the mesh voxelized at voxel_size."""
+        measured = measure_binary_stl(stl_path)
+        lower = measured[0][0] if measured is not None else trimesh.load(stl_path).bounds[0]
+        # Voxel indices are the vertex positions rounded to the pitch, starting at the lowest
+        return np.round(np.asarray(lower, dtype=float) / voxel_size) * voxel_size
+
+    # Corner offsets of a voxel in the node order expected by the element stiffness matrix
+    HEX_CORNERS = np.array([
+        [0, 0, 0],
+        [1, 0, 0],
+        [1, 1, 0],
+        [0, 1, 0],
+        [0, 0, 1],
+        [1, 0, 1],
+        [1, 1, 1],
+        [0, 1, 1],
+    ])
+
     @staticmethod
     def voxel_to_nodes_elements(voxel_matrix, voxel_size):
-        nodes = []
-        elements = []
-        node_index = 0
-        element_index = 0
-
-        for x in range(voxel_matrix.shape[0] - 1):
-            for y in range(voxel_matrix.shape[1] - 1):
-                for z in range(voxel_matrix.shape[2] - 1):
-                    if voxel_matrix[x,y,z]:
-                        node_coords = [
-                            [x, y, z],
-                            [x + 1, y, z],
-                            [x + 1, y + 1, z],
-                            [x, y + 1, z],
-                            [x, y, z + 1],
-                            [x + 1, y, z + 1],
-                            [x + 1, y + 1, z + 1],
-                            [x, y + 1, z + 1],
-                        ]
-                        nodes.extend(node_coords)
-                        elements.append(list(range(node_index, node_index + 8)))
-                        node_index += 8
-                        element_index += 1
-
-        nodes = np.array(nodes) * voxel_size
-        return nodes, elements
\ No newline at end of file
+        """
+        Build a structured hexahedral mesh from a voxel matrix.
+        Nodes are numbered once on the (nx+1)(ny+1)(nz+1) lattice and shared between
+        neighbouring elements; only nodes used by solid voxels are kept.
+        Returns float32 node coordinates (n, 3) and int32 connectivity (ne, 8).
+        """
+        voxel_matrix = np.asarray(voxel_matrix)
+        nx, ny, nz = voxel_matrix.shape
+        lattice_shape = (nx + 1, ny + 1, nz + 1)
+
+        solid = np.argwhere(voxel_matrix)
+        corners = solid[:, None, :] + MeshHandler.HEX_CORNERS[None, :, :]
+        lattice_ids = np.ravel_multi_index(corners.reshape(-1, 3).T, lattice_shape)
+
+        # Renumber the used lattice nodes contiguously, dropping unused ones
+        used = np.zeros(np.prod(lattice_shape), dtype=bool)
+        used[lattice_ids] = True
+        index_dtype = np.int32 if used.size < np.iinfo(np.int32).max else np.int64
+        remap = np.cumsum(used, dtype=index_dtype) - 1
+
+        elements = remap[lattice_ids].reshape(-1, 8)
+        nodes = np.column_stack(np.unravel_index(np.flatnonzero(used), lattice_shape)).astype(np.float32)
+        nodes *= np.float32(voxel_size)
+        logger.info(f"Structured mesh: {len(nodes)} nodes, {len(elements)} elements")
+        return nodes, elements
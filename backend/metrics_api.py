@@ -0,0 +1,41 @@
+"""
+Metrics endpoints: aggregate pipeline statistics and per-project dashboard summaries,
+backed by the persistent result store when one is configured.
+"""
+
+from flask import Blueprint, jsonify
+
+from .instrumentation import project_summary, registry
+
+
+def create_metrics_blueprint(metrics_registry=registry, result_store=None):
+    metrics = Blueprint("metrics", __name__)
+
+    @metrics.route('/api/metrics', methods=['GET'])
+    def aggregate_metrics():
+        return jsonify(metrics_registry.aggregate()), 200
+
+    @metrics.route('/api/metrics/<project_id>', methods=['GET'])
+    def project_metrics(project_id):
+        runs = metrics_registry.project_runs(project_id)
+        stored = result_store.project_results(project_id) if result_store is not None else []
+        # After a restart the registry is empty but the stored results still describe the project
+        summary = project_summary(runs or stored[::-1])
+        summary["history"] = [{
+            "job_id": run["job_id"],
+            "finished_at": run["finished_at"],
+            "wall_time": run["wall_time"],
+            "counters": run["counters"],
+            "stages": run["stages"],
+        } for run in runs]
+        summary["results"] = stored
+        return jsonify(summary), 200
+
+    @metrics.route('/api/results/<int:result_id>/history', methods=['GET'])
+    def result_history(result_id):
+        history = result_store.history(result_id) if result_store is not None else None
+        if history is None:
+            return jsonify({"error": "Unknown result"}), 404
+        return jsonify({"result_id": result_id, "history": history}), 200
+
+    return metrics
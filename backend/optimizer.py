@@ -2,168 +2,622 @@ import numpy as np
 from typing import Optional, Callable
 from .config import OptimizationConfig
 from .mesh_utils import MeshHandler
-from .fem import FEMSolver, FEMResult
+from .fem import FEMSolver, FEMResult, AssemblyPattern, element_compliance
+from .parallel import ElementPool
+from .solvers import create_solver
+from .filters import DensityFilter
+from .update import OCUpdater
+from .cache import VoxelCache
+from .instrumentation import RunMetrics
+from .memory import MemoryBudgetError, estimate_peak_memory, plan_voxel_size, precision_dtype
+from .checkpoint import Checkpoint, CheckpointError, load_checkpoint, read_state
+from .loads import LoadCaseGroup, build_load_case_groups
+from .symmetry import find_symmetry
+from .active_set import ActiveSet
+from .cache import file_digest
 import logging
-from scipy.sparse import lil_matrix
-from scipy.sparse.linalg import spsolve
+import os
 
 logger = logging.getLogger(__name__)
 
 class TopologyOptimizer:
-    def __init__(self, config: Optional[OptimizationConfig] = None):
+    def __init__(self, config: Optional[OptimizationConfig] = None, prepared=None):
         self.config = config or OptimizationConfig()
         self.mesh_handler = MeshHandler()
+        # Voxelizations, KE, assembly patterns and filters built once for several runs (sweep.PreparedMesh)
+        self.prepared = prepared
+        self.voxel_cache = None
+        if self.config.voxel_cache_dir:
+            self.voxel_cache = VoxelCache(self.config.voxel_cache_dir,
+                                          max_disk_bytes=self.config.voxel_cache_max_bytes,
+                                          max_memory_entries=self.config.voxel_cache_max_entries)
         self.fem_solver = FEMSolver()
+        self._dtype = precision_dtype(self.config.precision)
+        self._pattern = None
+        self._pattern_key = None
+        self._mesh_pattern = None
+        self._element_pool = None
+        self._load_case_nodes = None
+        self._load_case_groups = None
+        self._case_weights = None
+        self._solver = None
+        self._solvers = []
+        self._group_solvers = []
+        self._active_set = None
+        self._active_groups = None
+        self._displacements = None
+        self._filter = None
+        self._updater = None
+        self._design_mask = None
+        self._symmetry = None
+        self._checkpoint = None
+        self._run_state = {}
+        self._pending_solver_state = None
+        self.solve_stats = []
+        self.compliance = None
+        self.compliance_history = []
+        # Max density change of every iteration
+        self.change_history = []
+        self.load_case_compliances = None
+        self.level_stats = []
+        self.metrics = RunMetrics()
 
     def optimize(self, stl_path: str, callback: Optional[Callable] = None) -> np.ndarray:
+        """
+        Run the optimization and return the final density grid.
+        With config.multires_levels > 1 the part is first optimized on coarser voxelizations
+        and each result is prolonged to the next finer grid as its starting point; the
+        callback then sees grids of increasing resolution with a continuous iteration count.
+        With config.memory_budget_mb set, the job is checked against the budget before any
+        voxelization and rejected (MemoryBudgetError) or coarsened per config.memory_policy.
+        With config.checkpoint_dir set, the run is checkpointed every checkpoint_interval
+        iterations and can be continued with resume().
+        With several config.load_cases the objective is their weighted compliance; cases with the
+        same supports are solved together with one factorization (or one block PCG solve).
+        With config.active_set, elements that have settled at the density floor are pruned from
+        the analysis (see backend.active_set).
+        """
+        return self._run(stl_path, callback)
+
+    @classmethod
+    def from_checkpoint(cls, checkpoint_dir: str) -> "TopologyOptimizer":
+        """Optimizer with the configuration of a checkpointed run."""
+        state = read_state(checkpoint_dir)
+        if state is None:
+            raise CheckpointError(f"No checkpoint in {checkpoint_dir}")
+        return cls(OptimizationConfig(**state["config"]))
+
+    def resume(self, checkpoint_dir: str, callback: Optional[Callable] = None) -> np.ndarray:
+        """
+        Continue a checkpointed run from its latest checkpoint and return the final density grid.
+        The run keeps its iteration count, compliance history and solver warm start, and keeps
+        checkpointing to the same directory.
+        """
+        state, arrays = load_checkpoint(checkpoint_dir)
+        if file_digest(state["stl_path"]) != state["stl_digest"]:
+            raise CheckpointError(f"{state['stl_path']} has changed since it was checkpointed")
+        self.config.checkpoint_dir = checkpoint_dir
+        logger.info(f"Resuming from checkpoint {state['sequence']} at iteration {state['iteration']}")
+        return self._run(state["stl_path"], callback, state, arrays)
+
+    def _run(self, stl_path, callback=None, state=None, arrays=None):
         try:
             logger.info("Starting optimization process...")
-            voxel_grid, nodes, elements = self.mesh_handler.load_and_voxelize(stl_path, voxel_size=1.0)
-            if voxel_grid is None or nodes is None or elements is None:
-                raise RuntimeError("Failed to load mesh and voxelize")
-            KE = self.fem_solver.compute_stiffness_matrix(self.config.E1, self.config.nu)
+            self.metrics = RunMetrics()
+            self._dtype = precision_dtype(self.config.precision)
+            if state is not None:
+                voxel_size = state["voxel_size"]
+            elif self.config.memory_budget_mb is not None:
+                voxel_size, _ = plan_voxel_size(stl_path, self.config)
+            else:
+                voxel_size = self.config.voxel_size
+            if self.prepared is not None:
+                KE = self.prepared.KE
+            else:
+                KE = self.fem_solver.compute_stiffness_matrix(self.config.E1, self.config.nu)
             logger.info(f"Element stiffness matrix KE shape: {KE.shape}")
 
-            change = float('inf')
-            iteration = 0
+            self.solve_stats = []
+            self.compliance_history = [] if state is None else list(state["compliance_history"])
+            self.change_history = [] if state is None else list(state.get("change_history", []))
+            self.compliance = None if state is None else state["compliance"]
+            self.level_stats = []
+            self._checkpoint = None
+            if self.config.checkpoint_dir:
+                self._checkpoint = Checkpoint(self.config.checkpoint_dir)
+                self._run_state = {
+                    "stl_path": os.path.abspath(stl_path),
+                    "stl_digest": state["stl_digest"] if state else file_digest(stl_path),
+                    "voxel_size": voxel_size,
+                    "config": self.config.to_dict(),
+                }
+            densities = None
+            iteration = 0 if state is None else state["iteration"]
 
-            while change > self.config.tol and iteration < self.config.max_iter:
-                densities_old = voxel_grid.copy()
-                U = self._perform_fem_analysis(voxel_grid, nodes, elements, KE)
-                if U is None:
-                    raise RuntimeError("FEM analysis failed")
+            for level, voxel_size in enumerate(self._level_voxel_sizes(voxel_size)):
+                if state is not None and level < state["level"]:
+                    continue
+                with self.metrics.stage("voxelize"):
+                    voxel_grid, nodes, elements = self.mesh_handler.load_and_voxelize(
+                        stl_path, voxel_size=voxel_size,
+                        cache=self.prepared if self.prepared is not None else self.voxel_cache,
+                        workers=self.config.voxel_workers)
+                if voxel_grid is None or nodes is None or elements is None:
+                    raise RuntimeError("Failed to load mesh and voxelize")
+                voxel_grid = np.asarray(voxel_grid, dtype=self._dtype)
+                # Placement of the level's grid, for exporting its densities
+                grid_origin = self.mesh_handler.grid_origin(stl_path, voxel_size)
+                # Only voxels of the part are designable; the rest of the bounding box stays void
+                self._design_mask = voxel_grid > 0
+                if densities is not None and (state is None or level != state["level"]):
+                    voxel_grid = self._prolong_densities(densities, voxel_grid)
+                # On a mirror-symmetric part only the low side of the symmetry planes is optimized
+                self._symmetry = find_symmetry(self._design_mask, voxel_size, self.config.symmetry,
+                                               self.config.load_cases, allow_odd=not self.config.matrix_free)
+                if self._symmetry is not None:
+                    voxel_grid = self._symmetry.reduce(voxel_grid)
+                    self._design_mask = self._symmetry.reduce(self._design_mask)
+                    nodes, elements = self._symmetry.nodes, self._symmetry.elements
+                    self.metrics.set("symmetry_axes", self._symmetry.axis_names())
+                self.metrics.set("voxels", int(np.size(voxel_grid)))
+                self.metrics.set("elements", len(elements))
+                self.metrics.set("dofs", len(self._solve_nodes(nodes)) * 3)
+                self.metrics.set("estimated_peak_mb", estimate_peak_memory(
+                    np.size(voxel_grid), len(elements), len(nodes), self.config)["peak"] / 1024 ** 2)
+                self._updater = None
+                level_start = iteration
+                if state is not None and level == state["level"]:
+                    voxel_grid = np.asarray(arrays["design"], dtype=self._dtype)
+                    if voxel_grid.shape != self._design_mask.shape:
+                        raise CheckpointError("Checkpointed densities do not match the voxelization")
+                    level_start = state["level_start_iteration"]
+                    warm_starts = {name: array for name, array in arrays.items() if name.startswith("displacements")}
+                    self._pending_solver_state = (warm_starts, state.get("oc_lmid"))
+                    resumed, state = state, None
+                    if resumed["level_done"]:
+                        densities = self._expand(voxel_grid)
+                        physical = self._expand(np.asarray(arrays["physical"], dtype=self._dtype))
+                        continue
 
-                dc = self._compute_sensitivities(voxel_grid, U, KE)
-                voxel_grid = self._update_densities(dc, voxel_grid)
-
-                change = np.max(np.abs(voxel_grid - densities_old))
-                logger.info(f"Iteration {iteration}: change = {change:.6f}")
-                if callback:
-                    callback(iteration, voxel_grid, change)
-                if change < self.config.tol:
-                    logger.info("Convergence reached.")
-                    break
-                iteration += 1
+                max_iter, tol = self._level_budget(level)
+                logger.info(f"Level {level}: voxel size {voxel_size}, grid {voxel_grid.shape}, "
+                            f"max_iter {max_iter}, tol {tol}")
+                self._run_state = dict(self._run_state, level=level, level_start_iteration=level_start,
+                                       grid_voxel_size=voxel_size, grid_origin=grid_origin.tolist())
+                densities, physical, iteration = self._optimize_level(
+                    voxel_grid, nodes, elements, KE, max_iter - (iteration - level_start), tol, iteration, callback)
+                self._pending_solver_state = None
+                self.level_stats.append({
+                    "level": level,
+                    "voxel_size": voxel_size,
+                    "grid_shape": voxel_grid.shape,
+                    "elements": len(elements),
+                    "iterations": iteration - level_start,
+                    "symmetry_axes": self._symmetry.axis_names() if self._symmetry is not None else [],
+                    "active_elements": self.metrics.counters.get("active_elements", len(elements)),
+                })
+                if self._checkpoint is not None:
+                    self._save_checkpoint(densities, physical, iteration, level_done=True)
+                densities, physical = self._expand(densities), self._expand(physical)
 
+            self.metrics.set("iterations", iteration)
+            # Grid of the result: the finest level, at the voxel size after memory planning
+            self.metrics.set("voxel_size", float(voxel_size))
+            self.metrics.set("grid_origin", grid_origin.tolist())
+            self.metrics.set("initial_compliance", self.compliance_history[0] if self.compliance_history else None)
+            self.metrics.set("final_compliance", self.compliance)
+            self.metrics.set("volume_fraction", float(physical[self._expand(self._design_mask)].mean()))
+            self.metrics.finish()
             logger.info("Optimization completed successfully")
-            return voxel_grid
+            return physical
+        except (MemoryBudgetError, CheckpointError) as e:
+            logger.error(f"Optimization rejected: {e}")
+            raise
         except Exception as e:
             logger.error(f"Optimization failed: {e}")
             raise RuntimeError(f"Optimization failed: {e}")
+        finally:
+            self._close_element_pool()
+
+    def _optimize_level(self, voxel_grid, nodes, elements, KE, max_iter, tol, iteration, callback):
+        """Optimization loop on one voxelization. Returns design and physical densities and the next iteration number."""
+        change = float('inf')
+        level_iteration = 0
+        physical = self._physical_densities(voxel_grid)
+        self._active_set = self._get_active_set(voxel_grid, nodes, elements, KE)
+
+        while change > tol and level_iteration < max_iter:
+            densities_old = voxel_grid.copy()
+            active_elements = elements if self._active_set is None else self._active_set.active_elements
+            U = self._perform_fem_analysis(physical, nodes, active_elements, KE)
+            if U is None:
+                raise RuntimeError("FEM analysis failed")
+            self._record_solve_stats(iteration)
+
+            with self.metrics.stage("sensitivities"):
+                dc = self._compute_sensitivities(physical, U, KE)
+            self.compliance_history.append(self.compliance)
+            with self.metrics.stage("filter"):
+                dc = self._filter_sensitivities(voxel_grid, dc)
+            with self.metrics.stage("update"):
+                voxel_grid = self._update_densities(dc, voxel_grid)
+                physical = self._physical_densities(voxel_grid)
+            if self._active_set is not None:
+                self._active_set.update(physical)
+
+            change = np.max(np.abs(voxel_grid - densities_old))
+            self.change_history.append(float(change))
+            logger.info(f"Iteration {iteration}: compliance = {self.compliance}, change = {change:.6f}")
+            for solver in self._solvers:
+                solver.notify_density_change(change)
+            self.metrics.end_iteration(iteration, compliance=self.compliance, change=float(change),
+                                       inner_iterations=sum(s.last_iterations for s in self._solvers) if self._solvers else None,
+                                       load_case_compliances=self.load_case_compliances,
+                                       active_elements=len(active_elements))
+            iteration += 1
+            level_iteration += 1
+            checkpointed = False
+            if self._checkpoint is not None and iteration % self.config.checkpoint_interval == 0:
+                with self.metrics.stage("checkpoint"):
+                    self._save_checkpoint(voxel_grid, physical, iteration, change)
+                checkpointed = True
+            if callback:
+                try:
+                    callback(iteration - 1, self._expand(physical), change)
+                except BaseException:
+                    # Keep the progress of a cancelled or preempted run
+                    if self._checkpoint is not None and not checkpointed:
+                        self._save_checkpoint(voxel_grid, physical, iteration, change)
+                    raise
+            if change < tol:
+                logger.info("Convergence reached.")
+                break
+
+        if self._active_set is not None:
+            self.metrics.set("active_elements", len(active_elements))
+            self.metrics.set("active_set_rebuilds", self._active_set.rebuilds)
+        return voxel_grid, physical, iteration
+
+    def _save_checkpoint(self, design, physical, iteration, change=None, level_done=False):
+        """Checkpoint the run after `iteration` completed iterations."""
+        state = dict(self._run_state, iteration=iteration, level_done=level_done,
+                     change=None if change is None else float(change),
+                     compliance=self.compliance, compliance_history=self.compliance_history,
+                     change_history=self.change_history,
+                     oc_lmid=self._updater.lmid if self._updater is not None else None)
+        arrays = {"design": design, "physical": physical}
+        if self._solvers is not self._group_solvers and self._displacements is not None:
+            # The active-set solvers work on reduced free DOFs; save the last solution on the
+            # free DOFs of the full groups, which is what a resumed run starts from
+            warm_starts = [self._group_displacements(group) for group in self._load_case_groups]
+        else:
+            warm_starts = [solver.get_warm_start() for solver in self._solvers]
+        for group, warm_start in enumerate(warm_starts):
+            if warm_start is not None:
+                arrays["displacements" if group == 0 else f"displacements-{group}"] = warm_start
+        self._checkpoint.save(state, arrays)
+
+    def _level_voxel_sizes(self, voxel_size=None):
+        """Voxel sizes from coarsest to the finest voxel_size; each level halves the voxel size."""
+        voxel_size = self.config.voxel_size if voxel_size is None else voxel_size
+        levels = max(1, self.config.multires_levels)
+        return [voxel_size * 2 ** (levels - 1 - level) for level in range(levels)]
+
+    def _level_budget(self, level):
+        """Iteration and tolerance budget of a resolution level."""
+        max_iter = self.config.max_iter if self.config.level_max_iter is None else self.config.level_max_iter[level]
+        tol = self.config.tol if self.config.level_tol is None else self.config.level_tol[level]
+        return max_iter, tol
+
+    def _prolong_densities(self, coarse, voxel_grid):
+        """
+        Prolong a coarse density field onto the finer voxel grid by taking, for each fine voxel,
+        the coarse voxel containing its center. Part voxels that fall outside the coarse part
+        start at volfrac; voxels outside the part stay void.
+        """
+        index = np.ix_(*[
+            np.minimum((np.arange(n_fine) + 0.5) * n_coarse / n_fine, n_coarse - 1).astype(int)
+            for n_fine, n_coarse in zip(voxel_grid.shape, coarse.shape)
+        ])
+        fine = coarse[index]
+        fine = np.where(fine > 0, fine, self.config.volfrac)
+        return np.where(self._design_mask, fine, 0.0)
 
     def _perform_fem_analysis(self, voxel_grid, nodes, elements, KE):
-        K = self.assemble_global_matrix(voxel_grid, nodes, elements, KE, self.config.penal)
+        with self.metrics.stage("assemble"):
+            K = self.assemble_global_matrix(voxel_grid, nodes, elements, KE, self.config.penal)
         if K is None:
             logger.error("Failed to assemble global stiffness matrix")
             return None
         logger.info(f"Global stiffness matrix K shape: {K.shape}")
-        # ... rest of the function
+        if self._symmetry is not None:
+            K = self._symmetry.tie_matrix(K)
+        groups = self._get_load_case_groups(self._solve_nodes(nodes))
+        if self._active_set is not None:
+            groups = self._get_active_groups(groups, K, elements)
+        n_cases = sum(len(group.cases) for group in groups)
+        U = None if n_cases == 1 else np.zeros((K.shape[0], n_cases))
+        with self.metrics.stage("solve"):
+            for group, solver in zip(groups, self._solvers):
+                U_group = self.fem_solver.solve_system(K, group.rhs(), group.free_dofs, solver=solver)
+                if U_group is None:
+                    return None
+                if n_cases == 1:
+                    U = U_group
+                    break
+                U[:, group.indices] = U_group.reshape(len(U_group), -1)
+        if self._active_set is not None:
+            self._displacements = U
+        return U if self._symmetry is None else self._symmetry.untie(U)
+
+    def _solve_nodes(self, nodes):
+        """Nodes carrying the DOFs of the linear system (fewer than the mesh nodes with tied symmetry layers)."""
+        return nodes if self._symmetry is None else self._symmetry.solve_nodes
+
+    def _record_solve_stats(self, iteration):
+        """Record solve time, inner iterations and state reuse of the last linear solves (one per load case group)."""
+        if not self._solvers:
+            return
+        stats = {
+            "iteration": iteration,
+            "solver": self._solver.name,
+            "solve_time": sum(s.last_solve_time for s in self._solvers),
+            "inner_iterations": sum(s.last_iterations for s in self._solvers),
+            "reused": all(s.last_reused for s in self._solvers),
+        }
+        self.solve_stats.append(stats)
+        logger.info(f"Iteration {iteration}: {stats['solver']} solve {stats['solve_time']:.3f}s, "
+                    f"{stats['inner_iterations']} inner iterations, reused state: {stats['reused']}")
+
+    def _get_load_case(self, nodes):
+        """Load vector (or matrix) and free DOFs of the first load case group."""
+        group = self._get_load_case_groups(nodes)[0]
+        return group.rhs(), group.free_dofs
+
+    def _get_load_case_groups(self, nodes):
+        """
+        Load cases of config.load_cases (default: bottom face fixed, unit downward load on the
+        top face), grouped by their supports. Built once per mesh together with one linear
+        solver per group.
+        """
+        if self._load_case_nodes is not None and self._load_case_nodes is nodes:
+            return self._load_case_groups
+
+        planes = self._symmetry.planes if self._symmetry is not None else None
+        groups = build_load_case_groups(nodes, self.config.load_cases, symmetry_planes=planes)
+        self._load_case_nodes = nodes
+        self._load_case_groups = groups
+        self._case_weights = np.zeros(sum(len(group.cases) for group in groups))
+        for group in groups:
+            self._case_weights[group.indices] = group.weights
+        self._solvers = [create_solver(self.config, nodes, group.free_dofs) for group in groups]
+        self._solver = self._solvers[0]
+        self._group_solvers = self._solvers
+        self._active_groups = None
+        self._displacements = None
+        warm_starts = self._pending_solver_state[0] if self._pending_solver_state is not None else None
+        for index, (group, solver) in enumerate(zip(groups, self._solvers)):
+            warm_start = (warm_starts or {}).get("displacements" if index == 0 else f"displacements-{index}")
+            if warm_start is not None and warm_start.shape == (len(group.free_dofs),) + group.rhs().shape[1:]:
+                solver.set_warm_start(warm_start)
+        return groups
+
+    def _get_active_set(self, voxel_grid, nodes, elements, KE) -> Optional[ActiveSet]:
+        """Active set of a level's elements when config.active_set is enabled, or None."""
+        self._mesh_pattern = None
+        if not self.config.active_set:
+            return None
+        if self.config.fem_workers != 1 or self.config.matrix_free:
+            logger.warning("Active-set pruning needs the serial assembly; running without it")
+            return None
+        # The pattern of all elements is kept for the re-check iterations
+        pattern = self._get_assembly_pattern(voxel_grid, nodes, elements, KE)
+        self._mesh_pattern = (self._pattern_key, pattern)
+        groups = self._get_load_case_groups(self._solve_nodes(nodes))
+        fixed = []
+        loaded = np.zeros(groups[0].F.shape[0], dtype=bool)
+        for group in groups:
+            group_fixed = np.ones(group.F.shape[0], dtype=bool)
+            group_fixed[group.free_dofs] = False
+            fixed.append(group_fixed)
+            loaded |= np.any(group.F != 0, axis=1)
+        if self._symmetry is not None and self._symmetry.tie is not None:
+            # Tied nodes share the supports and loads of their mirror images
+            tie = abs(self._symmetry.tie)
+            fixed = [tie @ group_fixed.astype(float) > 0 for group_fixed in fixed]
+            loaded = tie @ loaded.astype(float) > 0
+        return ActiveSet(elements, pattern.element_voxels,
+                         supports=[group_fixed.reshape(-1, 3).all(axis=1) for group_fixed in fixed],
+                         loaded=loaded.reshape(-1, 3).any(axis=1),
+                         min_density=self._get_updater(voxel_grid.shape).min_density,
+                         patience=self.config.active_set_patience,
+                         recheck_interval=self.config.active_set_recheck)
+
+    def _get_active_groups(self, groups, K, elements):
+        """
+        Load case groups restricted to the DOFs of the active elements, with their own solvers,
+        rebuilt when the active set changes. DOFs that only pruned elements touch have no
+        stiffness and are condensed away; their displacements are zero.
+        """
+        if self._active_groups is not None and self._active_groups[0] is elements:
+            return self._active_groups[1]
+        if elements is self._active_set.elements:
+            active_groups, solvers = groups, self._group_solvers
+        else:
+            stiff = K.diagonal() > 0
+            active_groups = [LoadCaseGroup(group.cases, group.indices, group.free_dofs[stiff[group.free_dofs]], group.F)
+                             for group in groups]
+            solvers = [create_solver(self.config, self._load_case_nodes, group.free_dofs) for group in active_groups]
+            logger.info(f"Active system: {sum(len(group.free_dofs) for group in active_groups)} free DOFs "
+                        f"in {len(active_groups)} load case groups")
+        if self._displacements is not None:
+            # Warm start from the last solution on the new free DOFs
+            for group, solver in zip(active_groups, solvers):
+                solver.set_warm_start(self._group_displacements(group))
+        self._active_groups = (elements, active_groups)
+        self._solvers = solvers
+        self._solver = solvers[0]
+        return active_groups
+
+    def _group_displacements(self, group):
+        """Last solution on the free DOFs of a load case group, shaped like its load."""
+        U = self._displacements[group.free_dofs]
+        if U.ndim == 2:
+            U = U[:, group.indices[0]] if len(group.indices) == 1 else U[:, group.indices]
+        return U
+
+    def _get_filter(self, shape) -> Optional[DensityFilter]:
+        """Return the filter for the grid, built once per grid shape and rmin."""
+        if self.config.filter_type == "none" or self.config.rmin <= 1.0:
+            return None
+        f = self._filter
+        if f is None or f.shape != tuple(shape) or f.rmin != self.config.rmin:
+            f = None
+            if self.prepared is not None:
+                f = self.prepared.filter(shape, self.config.rmin, self.config.filter_method)
+            if f is None:
+                # Filtered over the voxels of the part only
+                mask = self._expand(self._design_mask) if self._design_mask is not None else None
+                f = DensityFilter(shape, self.config.rmin, method=self.config.filter_method, dtype=self._dtype,
+                                  mask=mask if mask is not None and mask.shape == tuple(shape) else None)
+            self._filter = f
+        return self._filter
+
+    def _expand(self, field):
+        """Full grid field of a field on the symmetry-reduced grid (the field itself without symmetry)."""
+        return field if self._symmetry is None else self._symmetry.expand(field)
+
+    def _full_shape(self, shape):
+        return tuple(shape) if self._symmetry is None else self._symmetry.full_shape
+
+    def _on_full_grid(self, operation, *fields):
+        """
+        Apply a filter operation on the full grid: on a symmetry-reduced grid the fields are
+        mirrored out first, so that voxels next to a symmetry plane see their mirrored neighbours.
+        """
+        if self._symmetry is None:
+            return operation(*fields)
+        return self._symmetry.reduce(operation(*(self._symmetry.expand(field) for field in fields)))
+
+    def _physical_densities(self, densities: np.ndarray) -> np.ndarray:
+        """Densities seen by the FEM analysis: filtered when density filtering is enabled."""
+        if self.config.filter_type != "density":
+            return densities
+        f = self._get_filter(self._full_shape(densities.shape))
+        return densities if f is None else self._on_full_grid(f.apply, densities)
+
+    def _filter_sensitivities(self, densities: np.ndarray, dc: np.ndarray) -> np.ndarray:
+        """Filter stage between sensitivity analysis and the density update."""
+        f = self._get_filter(self._full_shape(densities.shape))
+        if f is None:
+            return dc
+        if self.config.filter_type == "density":
+            return self._on_full_grid(f.backpropagate, dc)
+        return self._on_full_grid(f.filter_sensitivities, densities, dc)
 
     def _compute_sensitivities(self, densities: np.ndarray, U: np.ndarray, KE: np.ndarray) -> np.ndarray:
+        """
+        Compliance sensitivities dc = -penal * rho^(penal-1) * u_e^T KE u_e per voxel.
+        Voxels without an element get zero sensitivity. Stores the total compliance.
+        """
         try:
-            dc = -densities * np.sum(U**2)
-            return dc
+            pattern = self._pattern
+            rho = pattern.element_densities(densities)
+            weights = rho ** self.config.penal
+            if pattern.element_scale is not None:
+                weights = weights * pattern.element_scale
+            # Weighted sum over the load cases, one displacement column per case
+            columns = U[:, None] if U.ndim == 1 else U
+            case_weights = self._case_weights if self._case_weights is not None else np.ones(columns.shape[1])
+            ce = np.zeros(len(rho), dtype=self._dtype)
+            self.load_case_compliances = []
+            for column, case_weight in zip(columns.T, case_weights):
+                if self._element_pool is not None:
+                    ce_case, total = self._element_pool.element_compliance(column, weights=weights)
+                else:
+                    ce_case, total = element_compliance(column, pattern.edof, KE, weights=weights, dtype=self._dtype)
+                ce += case_weight * ce_case
+                self.load_case_compliances.append(total)
+            if self._symmetry is not None:
+                # Compliance of the full part: every mirrored copy carries the same energy
+                self.load_case_compliances = [self._symmetry.copies * total for total in self.load_case_compliances]
+            self.compliance = float(case_weights @ self.load_case_compliances)
+            dc = np.zeros(densities.size, dtype=self._dtype)
+            dc[pattern.element_voxels] = -self.config.penal * rho ** (self.config.penal - 1) * ce
+            return dc.reshape(densities.shape)
         except Exception as e:
             logger.error(f"Sensitivity analysis failed: {e}")
             return np.zeros_like(densities)
 
     def _update_densities(self, dc: np.ndarray, densities: np.ndarray) -> np.ndarray:
         try:
-            move = 0.2
-            l1 = 0
-            l2 = 1e9
-            target_vol = self.config.volfrac * densities.size
-
-            while (l2 - l1) > 1e-4:
-                lmid = 0.5 * (l2 + l1)
-                new_densities = np.maximum(0.001, np.maximum(
-                    densities - move,
-                    np.minimum(1.0, np.minimum(
-                        densities + move,
-                        densities * np.sqrt(np.maximum(0, -dc / lmid))
-                    ))
-                ))
-                if np.sum(new_densities) - target_vol > 0:
-                    l1 = lmid
-                else:
-                    l2 = lmid
-            return new_densities
+            return self._get_updater(densities.shape).update(dc, densities)
         except Exception as e:
             logger.error(f"Density update failed: {e}")
             return densities
 
+    def _get_updater(self, shape) -> OCUpdater:
+        """Return the OC update engine, whose work buffers are allocated once per grid."""
+        if self._updater is None or self._updater.shape != tuple(shape):
+            mask = self._design_mask if self._design_mask is not None and self._design_mask.shape == tuple(shape) else None
+            weights = self._symmetry.volume_weights() if self._symmetry is not None else None
+            dv = None
+            f = self._get_filter(self._full_shape(shape)) if self.config.filter_type == "density" else None
+            if f is not None:
+                # The volume constraint holds for the physical (filtered) densities
+                dv = self._on_full_grid(f.backpropagate, np.ones(shape, dtype=self._dtype))
+                weights = dv if weights is None else weights * dv
+            self._updater = OCUpdater(shape, self.config.volfrac, move=self.config.move, design_mask=mask,
+                                      dtype=self._dtype, volume_weights=weights, volume_sensitivities=dv)
+            if self._pending_solver_state is not None:
+                self._updater.lmid = self._pending_solver_state[1]
+                self._pending_solver_state = None
+        return self._updater
+
     def assemble_global_matrix(self, densities, nodes, elements, KE, penal):
         try:
-            logger.info("Assembling global stiffness matrix...")
-            
-            # Convert elements to numpy array and check its validity
-            elements = np.asarray(elements)
-            if elements.size == 0:
-                raise ValueError("Empty elements array")
-                
-            logger.debug(f"densities shape: {densities.shape}")
-            logger.debug(f"nodes shape: {nodes.shape}")
-            logger.debug(f"elements shape: {elements.shape}")
-            logger.debug(f"KE shape: {KE.shape}")
-
-            ndof = len(nodes) * 3
-            global_matrix = lil_matrix((ndof, ndof))
-
-            for element_index, element_nodes in enumerate(elements):
-                # Get coordinates more safely
-                node_coords = nodes[element_nodes]
-                center = node_coords.mean(axis=0)
-                
-                # Convert to integer indices more safely
-                coords = np.floor(center).astype(int)
-                coords = np.clip(coords, 0, 
-                               [densities.shape[0]-1, 
-                                densities.shape[1]-1, 
-                                densities.shape[2]-1])
-                logger.debug(f"Clipped coords: {coords}")
-
-                # Debug current element
-                if element_index % 1000 == 0:
-                    logger.debug(f"Processing element {element_index}")
-                    logger.debug(f"Element coords: {coords}")
-
-                # Get density and assemble matrix
-                element_density = densities[coords[0], coords[1], coords[2]]
-                logger.debug(f"element_density: {element_density}")
-                element_dofs = []
-                for node in element_nodes:
-                    element_dofs.extend([3*node, 3*node + 1, 3*node + 2])
-                element_dofs = np.array(element_dofs)
-                
-                logger.debug(f"Element DOFs: {element_dofs}")
-                logger.debug(f"Global matrix shape: {global_matrix.shape}")
-                logger.debug(f"KE shape: {KE.shape}")
-                logger.debug(f"Element density: {element_density}")
-
-                if np.any(element_dofs >= global_matrix.shape[0]):
-                    logger.error(f"Invalid DOFs: {element_dofs}")
-                    raise ValueError("DOFs exceed global matrix dimensions")
-                if np.any(element_dofs < 0):
-                    logger.error(f"Negative DOFs: {element_dofs}")
-                    raise ValueError("DOFs contain negative indices")
-                if KE.shape[0] != KE.shape[1] or KE.shape[0] != len(element_dofs):
-                    logger.error(f"Invalid KE shape: {KE.shape} for DOFs: {len(element_dofs)}")
-                    raise ValueError("KE dimensions do not match DOFs")
-
-                logger.debug(f"element_index: {element_index}")
-                logger.debug(f"element_nodes: {element_nodes}")
-                logger.debug(f"element_density: {element_density}")
-                logger.debug(f"KE: {KE}")
-
-                # Add contribution
-                try:
-                    global_matrix[np.ix_(element_dofs, element_dofs)] += KE * (element_density**penal)
-                except Exception as e:
-                    logger.error(f"Error updating global matrix: {e}", exc_info=True)
-                    raise
-
-            return global_matrix.tocsr()
-
+            pattern = self._get_assembly_pattern(densities, nodes, elements, KE)
+            pool = self._get_element_pool(pattern, KE)
+            if pool is None:
+                return pattern.assemble(densities, KE, penal)
+            pool.set_densities(densities, penal)
+            return pool.operator() if self.config.matrix_free else pool.assemble()
         except Exception as e:
             logger.error(f"Error assembling global matrix: {e}", exc_info=True)
-            return None
\ No newline at end of file
+            return None
+
+    def _get_assembly_pattern(self, densities, nodes, elements, KE) -> AssemblyPattern:
+        """Return the cached assembly pattern, rebuilding it only when the mesh or the active elements change."""
+        key = self._pattern_key
+        if key is None or key[0] is not nodes or key[1] is not elements or key[2] != np.shape(densities):
+            mesh = self._mesh_pattern
+            if mesh is not None and mesh[0][0] is nodes and mesh[0][1] is elements and mesh[0][2] == np.shape(densities):
+                self._pattern = mesh[1]
+            else:
+                self._pattern = self.prepared.pattern(nodes, elements) if self.prepared is not None else None
+            if self._pattern is None:
+                logger.info("Building assembly pattern...")
+                self._pattern = AssemblyPattern(nodes, elements, np.shape(densities), KE.shape[0], dtype=self._dtype)
+                if self._symmetry is not None:
+                    self._pattern.element_scale = self._symmetry.element_scale(self._pattern)
+            self._pattern_key = (nodes, elements, np.shape(densities))
+            logger.info(f"Assembly pattern: {self._pattern.n_elements} elements, {self._pattern.ndof} DOFs")
+        return self._pattern
+
+    def _get_element_pool(self, pattern, KE) -> Optional[ElementPool]:
+        """
+        Return the element pool of the mesh when the run uses parallel or matrix-free element
+        kernels (config.fem_workers other than 1, or config.matrix_free), started once per mesh.
+        """
+        if self.config.fem_workers == 1 and not self.config.matrix_free:
+            return None
+        if self._element_pool is None or self._element_pool.pattern is not pattern:
+            self._close_element_pool()
+            self._element_pool = ElementPool(pattern, KE, workers=self.config.fem_workers,
+                                             matrix_free=self.config.matrix_free)
+        return self._element_pool
+
+    def _close_element_pool(self):
+        if self._element_pool is not None:
+            self._element_pool.close()
+            self._element_pool = None
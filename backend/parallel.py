@@ -0,0 +1,282 @@
+"""
+Parallel element-level FEM kernels.
+Connectivity, element stiffness scales and the displacement and result vectors live in shared
+memory, and the elements are split into blocks that a process pool works on: assembly of the
+global stiffness values, element compliances and a matrix-free stiffness operator that applies
+K element by element without ever forming it.
+"""
+
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+import numpy as np
+import scipy.sparse as sp
+import scipy.sparse.linalg as spla
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Elements gathered at once inside a task, bounding the (chunk, 24) work arrays
+CHUNK_ELEMENTS = 1 << 15
+# Tasks per worker for the evenly divisible kernels, for load balance
+TASKS_PER_WORKER = 4
+
+# Arrays of the pool in this worker process, set by _init_worker
+_worker_state = None
+
+
+def _init_worker(spec, KE):
+    """Process pool initializer: attach the shared arrays of the pool."""
+    global _worker_state
+    blocks, arrays = {}, {}
+    for key, (name, shape, dtype) in spec.items():
+        blocks[key] = shared_memory.SharedMemory(name=name)
+        arrays[key] = np.ndarray(shape, dtype=dtype, buffer=blocks[key].buf)
+    arrays["KE"] = KE
+    # Keep the blocks referenced for the lifetime of the worker
+    arrays["_blocks"] = blocks
+    _worker_state = arrays
+
+
+def _call(task, *args):
+    return task(_worker_state, *args)
+
+
+def _assemble_range(state, k0, k1):
+    """Global stiffness values data[k0:k1] from the element entries summed into them."""
+    first, order, scale = state["first"], state["order"], state["scale"]
+    ke, n_entries = state["KE"].ravel(), state["KE"].size
+    c0 = first[k0]
+    c1 = first[k1] if k1 < len(first) else len(order)
+    entries = order[c0:c1]
+    values = scale[entries // n_entries] * ke[entries % n_entries]
+    state["data"][k0:k1] = np.add.reduceat(values, first[k0:k1] - c0)
+
+
+def _compliance_range(state, e0, e1):
+    """Element compliances u_e^T KE u_e of elements [e0, e1)."""
+    edof, x, KE = state["edof"], state["x"], state["KE"]
+    for start in range(e0, e1, CHUNK_ELEMENTS):
+        stop = min(start + CHUNK_ELEMENTS, e1)
+        Ue = x[edof[start:stop]]
+        state["ce"][start:stop] = np.einsum("ij,ij->i", Ue @ KE, Ue)
+
+
+def _matvec_block(state, block):
+    """Add the K * x contributions of the elements of a block to y."""
+    edof, x, KE, scale = state["edof"], state["x"], state["KE"], state["scale"]
+    s0, s1 = state["block_ptr"][block:block + 2]
+    d0, d1 = state["dof_ptr"][block:block + 2]
+    acc = np.zeros(d1 - d0)
+    for start in range(s0, s1, CHUNK_ELEMENTS):
+        stop = min(start + CHUNK_ELEMENTS, s1)
+        elements = state["block_elements"][start:stop]
+        Ye = (x[edof[elements]] @ KE) * scale[elements][:, None]
+        acc += np.bincount(state["block_local"][start:stop].ravel(), Ye.ravel(), minlength=d1 - d0)
+    # Blocks run concurrently only with blocks that share none of these DOFs
+    state["y"][state["block_dofs"][d0:d1]] += acc
+
+
+def _layer_blocks(pattern, n_blocks):
+    """
+    Split the elements into blocks of whole voxel layers along the longest grid axis, with
+    similar element counts. Elements two or more layers apart share no nodes, so even and odd
+    blocks can each be processed concurrently.
+    """
+    axis = int(np.argmax(pattern.grid_shape))
+    layer = np.unravel_index(pattern.element_voxels, pattern.grid_shape)[axis]
+    counts = np.cumsum(np.bincount(layer, minlength=pattern.grid_shape[axis]))
+    cuts = np.searchsorted(counts, counts[-1] * np.arange(1, n_blocks) / n_blocks, side="right")
+    bounds = np.unique(np.concatenate(([0], cuts, [len(counts)])))
+    block_of_layer = np.repeat(np.arange(len(bounds) - 1), np.diff(bounds))
+    block = block_of_layer[layer]
+    elements = np.argsort(block, kind="stable")
+    block_ptr = np.concatenate(([0], np.cumsum(np.bincount(block, minlength=len(bounds) - 1))))
+    return elements, block_ptr
+
+
+class ElementPool:
+    """
+    Element kernels of one mesh run by `workers` processes (in-process when workers is 1).
+    Call set_densities() before each assembly, operator product or compliance evaluation.
+    With matrix_free the global matrix structure is never built.
+    """
+
+    def __init__(self, pattern, KE, workers=None, matrix_free=False):
+        self.pattern = pattern
+        self.ndof = pattern.ndof
+        self.workers = workers or os.cpu_count() or 1
+        self.matrix_free = matrix_free
+        self.KE = np.asarray(KE, dtype=pattern.dtype)
+        self._blocks = []
+        self._executor = None
+
+        arrays = {
+            "edof": pattern.edof,
+            "scale": np.zeros(pattern.n_elements, dtype=pattern.dtype),
+            "x": np.zeros(self.ndof),
+            "ce": np.zeros(pattern.n_elements, dtype=pattern.dtype),
+        }
+        if matrix_free:
+            arrays.update(self._block_arrays(pattern))
+            arrays["y"] = np.zeros(self.ndof)
+            self.n_blocks = len(arrays["block_ptr"]) - 1
+        else:
+            arrays.update(self._matrix_structure(pattern))
+            self.indptr, self.indices = arrays.pop("indptr"), arrays.pop("indices")
+        self.arrays = self._share(arrays) if self.workers > 1 else dict(arrays, KE=self.KE)
+        logger.info(f"Element pool: {pattern.n_elements} elements on {self.workers} processes, "
+                    f"matrix-free: {matrix_free}")
+
+    def _block_arrays(self, pattern):
+        """Layer blocks of the elements with the DOFs each block touches."""
+        elements, block_ptr = _layer_blocks(pattern, 2 * TASKS_PER_WORKER * self.workers)
+        block_local = np.empty((pattern.n_elements, pattern.edof.shape[1]), dtype=pattern.edof.dtype)
+        dofs = []
+        for b in range(len(block_ptr) - 1):
+            s0, s1 = block_ptr[b:b + 2]
+            unique, inverse = np.unique(pattern.edof[elements[s0:s1]], return_inverse=True)
+            block_local[s0:s1] = inverse.reshape(s1 - s0, -1)
+            dofs.append(unique)
+        dof_ptr = np.concatenate(([0], np.cumsum([len(d) for d in dofs])))
+        return {
+            "block_elements": elements.astype(pattern.edof.dtype),
+            "block_ptr": block_ptr,
+            "block_local": block_local,
+            "block_dofs": np.concatenate(dofs).astype(pattern.edof.dtype),
+            "dof_ptr": dof_ptr,
+        }
+
+    @staticmethod
+    def _matrix_structure(pattern):
+        """
+        CSR structure of the global matrix and, for every stored entry, the element matrix
+        entries (element * KE.size + entry) summed into it, in CSR order.
+        """
+        keys = pattern.iK.astype(np.int64) * pattern.ndof + pattern.jK
+        order = np.argsort(keys, kind="stable")
+        keys = keys[order]
+        first = np.flatnonzero(np.concatenate(([True], keys[1:] != keys[:-1])))
+        keys = keys[first]
+        entry_dtype = np.int32 if len(order) < np.iinfo(np.int32).max else np.int64
+        index_dtype = pattern.edof.dtype
+        rows = keys // pattern.ndof
+        return {
+            "order": order.astype(entry_dtype),
+            "first": first.astype(entry_dtype),
+            "data": np.zeros(len(first), dtype=pattern.dtype),
+            "indptr": np.concatenate(([0], np.cumsum(np.bincount(rows, minlength=pattern.ndof)))).astype(index_dtype),
+            "indices": (keys % pattern.ndof).astype(index_dtype),
+        }
+
+    def _share(self, arrays):
+        """Copy the arrays into shared memory and start the workers attached to them."""
+        spec, shared = {}, {}
+        for key, array in arrays.items():
+            block = shared_memory.SharedMemory(create=True, size=max(1, array.nbytes))
+            self._blocks.append(block)
+            shared[key] = np.ndarray(array.shape, dtype=array.dtype, buffer=block.buf)
+            shared[key][...] = array
+            spec[key] = (block.name, array.shape, array.dtype.str)
+        context = multiprocessing.get_context("spawn")
+        self._executor = ProcessPoolExecutor(max_workers=self.workers, mp_context=context,
+                                             initializer=_init_worker, initargs=(spec, self.KE))
+        return dict(shared, KE=self.KE)
+
+    def _map(self, task, args):
+        """Run task(state, *a) for every a in args and wait for all of them."""
+        if self._executor is None:
+            for a in args:
+                task(self.arrays, *a)
+            return
+        for future in [self._executor.submit(_call, task, *a) for a in args]:
+            future.result()
+
+    def _ranges(self, n):
+        """Split [0, n) into about TASKS_PER_WORKER ranges per worker."""
+        cuts = np.linspace(0, n, min(n, TASKS_PER_WORKER * self.workers) + 1).astype(np.int64)
+        return [(int(a), int(b)) for a, b in zip(cuts[:-1], cuts[1:]) if b > a]
+
+    def set_densities(self, densities, penal):
+        """Scale the element stiffness by rho^penal of the element densities."""
+        self.arrays["scale"][...] = self.pattern.element_densities(densities) ** penal
+        if self.pattern.element_scale is not None:
+            self.arrays["scale"] *= self.pattern.element_scale
+
+    def assemble(self):
+        """Global stiffness matrix (CSR) for the current densities."""
+        if self.matrix_free:
+            raise ValueError("A matrix-free element pool does not assemble the global matrix")
+        self._map(_assemble_range, self._ranges(len(self.arrays["first"])))
+        return sp.csr_matrix((self.arrays["data"].copy(), self.indices, self.indptr),
+                             shape=(self.ndof, self.ndof))
+
+    def operator(self):
+        """Matrix-free stiffness operator for the current densities."""
+        return ElementOperator(self)
+
+    def element_compliance(self, U, weights=None):
+        """Per-element compliance and the total compliance, as fem.element_compliance."""
+        self.arrays["x"][...] = U
+        self._map(_compliance_range, self._ranges(self.pattern.n_elements))
+        ce = self.arrays["ce"].copy()
+        return ce, float(ce.sum() if weights is None else weights @ ce)
+
+    def matvec(self, x):
+        """K * x over all DOFs, element by element."""
+        self.arrays["x"][...] = x
+        self.arrays["y"][...] = 0.0
+        for parity in (0, 1):
+            self._map(_matvec_block, [(b,) for b in range(parity, self.n_blocks, 2)])
+        return self.arrays["y"].copy()
+
+    def diagonal(self):
+        """Diagonal of K for the current densities."""
+        edof = self.pattern.edof
+        contributions = self.arrays["scale"][:, None] * np.diag(self.KE)[None, :]
+        return np.bincount(edof.ravel(), contributions.ravel(), minlength=self.ndof)
+
+    def close(self):
+        """Stop the workers and release the shared memory."""
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+        self.arrays = {}
+        for block in self._blocks:
+            block.close()
+            block.unlink()
+        self._blocks = []
+
+
+class ElementOperator(spla.LinearOperator):
+    """
+    Stiffness operator K applied element by element by an ElementPool, optionally restricted
+    to the free DOFs. Supports what the PCG solver needs: products and the diagonal.
+    """
+
+    def __init__(self, pool, free_dofs=None):
+        self.pool = pool
+        self.free_dofs = free_dofs
+        n = pool.ndof if free_dofs is None else len(free_dofs)
+        super().__init__(dtype=np.float64, shape=(n, n))
+
+    def restrict(self, free_dofs):
+        """Operator on the free DOFs: K[free_dofs, :][:, free_dofs]."""
+        return ElementOperator(self.pool, free_dofs)
+
+    def _matvec(self, x):
+        x = np.ravel(x)
+        if self.free_dofs is None:
+            return self.pool.matvec(x)
+        full = np.zeros(self.pool.ndof)
+        full[self.free_dofs] = x
+        return self.pool.matvec(full)[self.free_dofs]
+
+    def _adjoint(self):
+        return self
+
+    def diagonal(self):
+        diagonal = self.pool.diagonal()
+        return diagonal if self.free_dofs is None else diagonal[self.free_dofs]
@@ -0,0 +1,206 @@
+"""
+Persistent store of optimization results in the application's SQLite database (projects.db).
+Results are keyed by the SHA-256 of the STL content and a canonical hash of the
+OptimizationConfig, so an identical submission is answered from the store instead of being
+recomputed. Densities are kept as compressed blobs next to the convergence history and stage
+timings; project listings read only the summary columns.
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from contextlib import closing
+
+import numpy as np
+from .cache import file_digest
+import logging
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_RESULTS_DB = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "projects.db")
+
+# Version of the optimizer numerics, part of every config hash: bump it whenever a change to the
+# solvers, filters, update or meshing changes the computed densities, so that stored results of
+# the previous numerics are no longer served
+RESULT_VERSION = 1
+
+# Config fields that do not change the computed densities: where and how the work is done
+CONFIG_HASH_EXCLUDE = frozenset({
+    "voxel_cache_dir", "voxel_cache_max_bytes", "voxel_cache_max_entries", "voxel_workers",
+    "fem_workers", "checkpoint_dir", "checkpoint_interval",
+})
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS optimization_results (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    mesh_hash TEXT NOT NULL,
+    config_hash TEXT NOT NULL,
+    project_id TEXT,
+    job_id TEXT,
+    created_at REAL NOT NULL,
+    last_hit_at REAL,
+    hits INTEGER NOT NULL DEFAULT 0,
+    config JSON NOT NULL,
+    shape JSON NOT NULL,
+    dtype TEXT NOT NULL,
+    densities BLOB NOT NULL,
+    compliance REAL,
+    iterations INTEGER,
+    volume_fraction REAL,
+    wall_time REAL,
+    history JSON,
+    stages JSON,
+    counters JSON,
+    UNIQUE (mesh_hash, config_hash)
+);
+CREATE INDEX IF NOT EXISTS idx_optimization_results_project ON optimization_results (project_id, created_at);
+CREATE INDEX IF NOT EXISTS idx_optimization_results_config ON optimization_results (config_hash);
+"""
+
+SUMMARY_COLUMNS = ("id", "mesh_hash", "config_hash", "project_id", "job_id", "created_at", "last_hit_at", "hits",
+                   "shape", "compliance", "iterations", "volume_fraction", "wall_time", "stages", "counters")
+
+
+def _canonical(value):
+    """Numbers as floats (so penal=3 and penal=3.0 hash alike), recursively through lists and dicts."""
+    if isinstance(value, bool) or value is None or isinstance(value, str):
+        return value
+    if isinstance(value, (int, float, np.integer, np.floating)):
+        return float(value)
+    if isinstance(value, (list, tuple)):
+        return [_canonical(item) for item in value]
+    if isinstance(value, dict):
+        return {key: _canonical(item) for key, item in value.items()}
+    return value
+
+
+def config_hash(config):
+    """SHA-256 of the canonical JSON of the config fields that affect the result and the RESULT_VERSION."""
+    fields = {key: _canonical(value) for key, value in config.to_dict().items() if key not in CONFIG_HASH_EXCLUDE}
+    fields["result_version"] = RESULT_VERSION
+    canonical = json.dumps(fields, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(canonical.encode()).hexdigest()
+
+
+class ResultStore:
+    """
+    Optimization results in a SQLite database in WAL mode, so the dashboard can read while
+    jobs write. Connections are opened per operation and the schema is created on first use.
+    """
+
+    def __init__(self, path=DEFAULT_RESULTS_DB, compression_level=6):
+        self.path = path
+        self.compression_level = compression_level
+        self._initialized = False
+        self._lock = threading.Lock()
+
+    def _connect(self):
+        connection = sqlite3.connect(self.path, timeout=30.0)
+        connection.row_factory = sqlite3.Row
+        connection.execute("PRAGMA synchronous=NORMAL")
+        if not self._initialized:
+            with self._lock:
+                if not self._initialized:
+                    connection.execute("PRAGMA journal_mode=WAL")
+                    connection.executescript(SCHEMA)
+                    self._initialized = True
+        return connection
+
+    def get(self, mesh_hash, config_hash):
+        """Densities and summary of a stored result, or None. Counts the hit."""
+        with closing(self._connect()) as connection, connection:
+            row = connection.execute(
+                "SELECT * FROM optimization_results WHERE mesh_hash = ? AND config_hash = ?",
+                (mesh_hash, config_hash)).fetchone()
+            if row is None:
+                return None
+            connection.execute("UPDATE optimization_results SET hits = hits + 1, last_hit_at = ? WHERE id = ?",
+                               (time.time(), row["id"]))
+        densities = np.frombuffer(zlib.decompress(row["densities"]), dtype=row["dtype"])
+        logger.info(f"Result store hit {row['id']} for mesh {mesh_hash[:12]}, config {config_hash[:12]}")
+        return densities.reshape(json.loads(row["shape"])), self._summary(row)
+
+    def contains(self, mesh_hash, config_hash):
+        with closing(self._connect()) as connection:
+            row = connection.execute("SELECT 1 FROM optimization_results WHERE mesh_hash = ? AND config_hash = ?",
+                                     (mesh_hash, config_hash)).fetchone()
+        return row is not None
+
+    def put(self, mesh_hash, config_hash, densities, metrics, config=None, project_id=None, job_id=None):
+        """Store a result with its run metrics (RunMetrics.to_dict()); returns the row id."""
+        densities = np.ascontiguousarray(densities)
+        counters = metrics.get("counters", {})
+        history = [{key: record.get(key) for key in ("iteration", "compliance", "change")}
+                   for record in metrics.get("iterations", [])]
+        values = {
+            "mesh_hash": mesh_hash,
+            "config_hash": config_hash,
+            "project_id": None if project_id is None else str(project_id),
+            "job_id": job_id,
+            "created_at": time.time(),
+            "config": json.dumps(config.to_dict() if config is not None else {}, sort_keys=True, default=str),
+            "shape": json.dumps(list(densities.shape)),
+            "dtype": densities.dtype.str,
+            "densities": zlib.compress(densities.tobytes(), self.compression_level),
+            "compliance": counters.get("final_compliance"),
+            "iterations": counters.get("iterations"),
+            "volume_fraction": counters.get("volume_fraction"),
+            "wall_time": metrics.get("wall_time"),
+            "history": json.dumps(history),
+            "stages": json.dumps(metrics.get("stages", {})),
+            "counters": json.dumps(counters, default=str),
+        }
+        columns = ", ".join(values)
+        with closing(self._connect()) as connection, connection:
+            cursor = connection.execute(
+                f"INSERT OR REPLACE INTO optimization_results ({columns}) VALUES ({', '.join('?' * len(values))})",
+                tuple(values.values()))
+        logger.info(f"Stored result {cursor.lastrowid} ({len(values['densities'])} bytes compressed)")
+        return cursor.lastrowid
+
+    def project_results(self, project_id, limit=100):
+        """Summaries of a project's results, newest first, without their density grids."""
+        with closing(self._connect()) as connection:
+            rows = connection.execute(
+                f"SELECT {', '.join(SUMMARY_COLUMNS)} FROM optimization_results WHERE project_id = ? "
+                "ORDER BY created_at DESC LIMIT ?", (str(project_id), limit)).fetchall()
+        return [self._summary(row) for row in rows]
+
+    def history(self, result_id):
+        """Convergence history of a result, or None when there is no such result."""
+        with closing(self._connect()) as connection:
+            row = connection.execute("SELECT history FROM optimization_results WHERE id = ?",
+                                     (result_id,)).fetchone()
+        return None if row is None else json.loads(row["history"])
+
+    @staticmethod
+    def _summary(row):
+        summary = {key: row[key] for key in SUMMARY_COLUMNS}
+        summary["shape"] = json.loads(summary["shape"])
+        for key in ("stages", "counters"):
+            summary[key] = json.loads(summary[key]) if summary[key] else {}
+        return summary
+
+
+def run_with_store(store, optimizer, stl_path, project_id=None, callback=None):
+    """
+    Densities of optimizer.config for stl_path: the stored result when there is one, otherwise
+    a fresh run (reporting to callback) whose result is then stored.
+    Returns (densities, stored summary or None).
+    """
+    if store is None:
+        return optimizer.optimize(stl_path, callback=callback), None
+    mesh_hash, key = file_digest(stl_path), config_hash(optimizer.config)
+    stored = store.get(mesh_hash, key)
+    if stored is not None:
+        return stored
+    result = optimizer.optimize(stl_path, callback=callback)
+    try:
+        store.put(mesh_hash, key, result, optimizer.metrics.to_dict(), config=optimizer.config, project_id=project_id)
+    except sqlite3.Error as e:
+        logger.warning(f"Could not store the result of {stl_path}: {e}")
+    return result, None
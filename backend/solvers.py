@@ -0,0 +1,326 @@
+"""
+Linear solver backends for the FEM system K * U = F.
+Provides a direct sparse solver and a preconditioned conjugate-gradient solver
+with Jacobi or geometric multigrid preconditioning on the structured voxel mesh.
+"""
+
+import numpy as np
+import scipy.sparse as sp
+import scipy.sparse.linalg as spla
+import logging
+import time
+
+try:
+    from sksparse.cholmod import analyze as cholmod_analyze
+except ImportError:  # scikit-sparse is optional
+    cholmod_analyze = None
+
+logger = logging.getLogger(__name__)
+
+
+def check_singularity(K):
+    """
+    Cheap singularity check for a symmetric positive definite stiffness matrix.
+    Raises ValueError if the matrix is empty or has non-positive diagonal entries,
+    which is what unconstrained or disconnected DOFs look like after assembly.
+    Matrix-free operators only have their diagonal checked.
+    """
+    if K.shape[0] == 0 or (sp.issparse(K) and (K.nnz == 0 or not np.any(K.data))):
+        raise ValueError("Global stiffness matrix is singular. Check boundary conditions or assembly.")
+    diagonal = K.diagonal()
+    bad = np.flatnonzero(~(diagonal > 0))
+    if bad.size:
+        raise ValueError(
+            f"Global stiffness matrix is singular: {bad.size} DOFs have no stiffness "
+            f"(first: {bad[:5].tolist()}). Check boundary conditions or assembly."
+        )
+
+
+def scale_rows(scale, x):
+    """Multiply the rows of a vector or of a block of right-hand side columns by scale."""
+    return scale * x if x.ndim == 1 else scale[:, None] * x
+
+
+def column_dot(a, b):
+    """Dot products of matching columns: a scalar for vectors, one value per column for blocks."""
+    return a @ b if a.ndim == 1 else np.einsum("ij,ij->j", a, b)
+
+
+def lattice_coordinates(nodes):
+    """Integer lattice coordinates of structured mesh nodes."""
+    nodes = np.asarray(nodes, dtype=float)
+    origin = nodes.min(axis=0)
+    steps = np.diff(np.unique(nodes[:, 0]))
+    spacing = steps.min() if steps.size else 1.0
+    return np.rint((nodes - origin) / spacing).astype(np.int64)
+
+
+class DirectSolver:
+    """
+    Sparse direct solver.
+    With scikit-sparse installed the CHOLMOD symbolic factorization is computed once and
+    refactorized numerically in place while the sparsity pattern stays the same; otherwise
+    SuperLU (symmetric mode) factorizes every system from scratch.
+    """
+
+    name = "direct"
+
+    def __init__(self):
+        self._factor = None
+        self._pattern = None
+        self.last_iterations = 0
+        self.last_solve_time = 0.0
+        # Whether the last solve reused the CHOLMOD symbolic factorization
+        self.last_reused = False
+
+    def solve(self, K, F, x0=None):
+        start = time.perf_counter()
+        # Factorize in double precision even when the matrix is assembled in float32
+        K = K.tocsc().astype(np.float64, copy=False)
+        if cholmod_analyze is not None:
+            pattern = (K.shape, K.nnz)
+            if pattern != self._pattern:
+                self._factor = None
+                self._pattern = pattern
+            self.last_reused = self._factor is not None
+            if self._factor is None:
+                self._factor = cholmod_analyze(K)
+            self._factor.cholesky_inplace(K)
+            U = self._factor(F)
+        else:
+            self.last_reused = False
+            lu = spla.splu(K, permc_spec="MMD_AT_PLUS_A", diag_pivot_thresh=0.0,
+                           options=dict(SymmetricMode=True))
+            U = lu.solve(F)
+
+        self.last_solve_time = time.perf_counter() - start
+        return U
+
+    def notify_density_change(self, change):
+        pass
+
+    def get_warm_start(self):
+        return None
+
+    def set_warm_start(self, x):
+        pass
+
+
+class JacobiPreconditioner:
+    """Diagonal (Jacobi) preconditioner."""
+
+    name = "jacobi"
+
+    def setup(self, K):
+        self.inv_diag = 1.0 / K.diagonal()
+
+    def apply(self, r):
+        return scale_rows(self.inv_diag, r)
+
+
+class MultigridPreconditioner:
+    """
+    Geometric multigrid V-cycle on the structured voxel hierarchy.
+    Each level halves the node lattice; fine nodes are interpolated trilinearly from
+    their coarse parents and coarse operators are formed as P^T A P.
+    """
+
+    name = "multigrid"
+
+    def __init__(self, nodes, free_dofs, max_levels=6, coarse_size=5000, smoothing_steps=2, omega=0.6):
+        self.max_levels = max_levels
+        self.coarse_size = coarse_size
+        self.smoothing_steps = smoothing_steps
+        self.omega = omega
+        self.prolongations = self._build_prolongations(lattice_coordinates(nodes), np.asarray(free_dofs))
+        logger.info(f"Multigrid hierarchy: {len(self.prolongations) + 1} levels")
+
+    def _build_prolongations(self, lattice, free_dofs):
+        prolongations = []
+        dofs = free_dofs
+        while len(prolongations) < self.max_levels - 1 and len(dofs) > self.coarse_size:
+            lattice, P = self._coarsen(lattice)
+            P = sp.kron(P, sp.identity(3), format="csr")[dofs, :]
+            dofs = np.unique(P.indices)
+            if len(dofs) >= P.shape[0]:
+                break
+            prolongations.append(P[:, dofs].tocsr())
+        return prolongations
+
+    @staticmethod
+    def _coarsen(lattice):
+        """Coarse lattice nodes and the node-level trilinear prolongation."""
+        odd = lattice % 2
+        rows, keys, weights = [], [], []
+        coarse_shape = lattice.max(axis=0) // 2 + 2
+        for corner in MultigridPreconditioner._corners():
+            parent = lattice // 2 + corner * odd
+            weight = np.prod(np.where(odd, 0.5, 1 - corner), axis=1)
+            keep = weight > 0
+            rows.append(np.flatnonzero(keep))
+            keys.append(np.ravel_multi_index(parent[keep].T, coarse_shape))
+            weights.append(weight[keep])
+        keys = np.concatenate(keys)
+        coarse_keys, cols = np.unique(keys, return_inverse=True)
+        P = sp.csr_matrix(
+            (np.concatenate(weights), (np.concatenate(rows), cols)),
+            shape=(len(lattice), len(coarse_keys)),
+        )
+        coarse_lattice = np.column_stack(np.unravel_index(coarse_keys, coarse_shape))
+        return coarse_lattice, P
+
+    @staticmethod
+    def _corners():
+        return np.array([[i, j, k] for i in (0, 1) for j in (0, 1) for k in (0, 1)])
+
+    def setup(self, K):
+        self.operators = [K.tocsr()]
+        for P in self.prolongations:
+            self.operators.append((P.T @ self.operators[-1] @ P).tocsr())
+        self.inv_diags = [1.0 / A.diagonal() for A in self.operators[:-1]]
+        # On thin parts coarse basis functions can coincide on the fine DOFs, making P^T A P
+        # singular. Those directions lie in the null space of P and never reach the fine level,
+        # so a tiny diagonal shift makes the coarse solve well-posed without changing the result.
+        coarse = self.operators[-1]
+        if self.prolongations:
+            coarse = coarse + sp.diags(1e-10 * coarse.diagonal())
+        self.coarse_solve = spla.factorized(coarse.tocsc())
+
+    def apply(self, r):
+        return self._vcycle(0, r)
+
+    def _vcycle(self, level, b):
+        if level == len(self.prolongations):
+            return self.coarse_solve(b)
+        A = self.operators[level]
+        inv_diag = self.omega * self.inv_diags[level]
+        x = scale_rows(inv_diag, b)
+        for _ in range(self.smoothing_steps - 1):
+            x += scale_rows(inv_diag, b - A @ x)
+        P = self.prolongations[level]
+        x += P @ self._vcycle(level + 1, P.T @ (b - A @ x))
+        for _ in range(self.smoothing_steps):
+            x += scale_rows(inv_diag, b - A @ x)
+        return x
+
+
+class PCGSolver:
+    """
+    Preconditioned conjugate-gradient solver for symmetric positive definite systems.
+    Warm-starts from the previous solution and keeps the preconditioner while the
+    accumulated density change since it was built stays below reuse_tol.
+    A block of right-hand side columns (n, k) is solved in one pass: the columns iterate together
+    so every iteration applies K and the preconditioner once to the whole block, and each column
+    stops moving once it has converged.
+    """
+
+    name = "pcg"
+
+    def __init__(self, preconditioner=None, tol=1e-6, max_iter=1000, reuse_tol=0.0):
+        self.preconditioner = preconditioner or JacobiPreconditioner()
+        self.tol = tol
+        self.max_iter = max_iter
+        self.reuse_tol = reuse_tol
+        self.last_iterations = 0
+        self.last_residual = None
+        self.last_solve_time = 0.0
+        self.last_reused = False
+        self._previous = None
+        self._change_since_setup = None
+
+    def notify_density_change(self, change):
+        """Record the density change of an optimization iteration."""
+        if self._change_since_setup is not None:
+            self._change_since_setup += change
+
+    def get_warm_start(self):
+        """Previous solution, the starting point of the next solve (checkpointed with the run)."""
+        return self._previous
+
+    def set_warm_start(self, x):
+        self._previous = None if x is None else np.asarray(x, dtype=float)
+
+    def solve(self, K, F, x0=None):
+        start = time.perf_counter()
+        if x0 is None and self._previous is not None and self._previous.shape == F.shape:
+            x0 = self._previous
+        self.last_reused = self._change_since_setup is not None and self._change_since_setup <= self.reuse_tol
+        if not self.last_reused:
+            self.preconditioner.setup(K)
+            self._change_since_setup = 0.0
+        U = self._pcg(K, F, x0)
+        self._previous = U
+        self.last_solve_time = time.perf_counter() - start
+        return U
+
+    def _pcg(self, K, F, x0=None):
+        F_norm = np.linalg.norm(F, axis=0)
+        if not np.any(F_norm):
+            self.last_iterations, self.last_residual = 0, 0.0
+            return np.zeros_like(F)
+        F_norm = np.where(F_norm > 0, F_norm, 1.0)
+
+        x = np.zeros_like(F) if x0 is None else np.array(x0, dtype=F.dtype)
+        r = F - K @ x
+        z = self.preconditioner.apply(r)
+        p = z.copy()
+        rz = column_dot(r, z)
+        residual = np.linalg.norm(r, axis=0) / F_norm
+        active = residual > self.tol
+        iteration = 0
+        while np.any(active) and iteration < self.max_iter:
+            Kp = K @ p
+            pKp = column_dot(p, Kp)
+            if np.any(np.where(active, pKp, 1.0) <= 0):
+                raise ValueError("Global stiffness matrix is singular or indefinite (CG breakdown).")
+            # Converged columns keep their solution
+            alpha = np.divide(rz, pKp, out=np.zeros_like(rz), where=active)
+            x += alpha * p
+            r -= alpha * Kp
+            residual = np.linalg.norm(r, axis=0) / F_norm
+            active = residual > self.tol
+            iteration += 1
+            z = self.preconditioner.apply(r)
+            rz_new = column_dot(r, z)
+            p *= np.divide(rz_new, rz, out=np.zeros_like(rz), where=active)
+            p += z
+            rz = rz_new
+
+        residual = float(np.max(residual))
+        if residual > self.tol:
+            logger.warning(f"PCG did not converge: residual {residual:.3e} after {iteration} iterations")
+        self.last_iterations = iteration
+        self.last_residual = residual
+        logger.info(f"PCG ({self.preconditioner.name}) converged in {iteration} iterations, residual {residual:.3e}")
+        return x
+
+
+def create_solver(config, nodes=None, free_dofs=None):
+    """Create the linear solver selected by the optimization config."""
+    name = getattr(config, "solver", "direct")
+    matrix_free = getattr(config, "matrix_free", False)
+    if name == "auto":
+        n_free = len(free_dofs) if free_dofs is not None else 0
+        name = "direct" if n_free <= config.direct_solver_max_dofs and not matrix_free else "pcg"
+    if name == "direct":
+        if matrix_free:
+            raise ValueError("The direct solver needs the assembled matrix; use solver='pcg' with matrix_free")
+        return DirectSolver()
+    if name != "pcg":
+        raise ValueError(f"Unknown solver: {name}")
+
+    preconditioner = config.preconditioner
+    if matrix_free and preconditioner == "multigrid":
+        # The Galerkin coarse operators need the assembled matrix
+        logger.warning("Multigrid preconditioning needs the assembled matrix; using Jacobi with matrix_free")
+        preconditioner = "jacobi"
+    if preconditioner == "multigrid":
+        if nodes is None or free_dofs is None:
+            raise ValueError("Multigrid preconditioner requires the mesh nodes and free DOFs")
+        preconditioner = MultigridPreconditioner(nodes, free_dofs)
+    elif preconditioner == "jacobi":
+        preconditioner = JacobiPreconditioner()
+    else:
+        raise ValueError(f"Unknown preconditioner: {config.preconditioner}")
+    return PCGSolver(preconditioner, tol=config.solver_tol, max_iter=config.solver_max_iter,
+                     reuse_tol=config.preconditioner_reuse_tol)
@@ -0,0 +1,71 @@
+"""
+Binary STL file access.
+Binary STLs are an 84 byte header followed by fixed 50 byte triangle records, so a file can be
+memory-mapped and viewed as a structured array without creating per-triangle objects.
+"""
+
+import os
+
+import numpy as np
+
+STL_HEADER_SIZE = 84
+# Triangles converted to float64 at a time when scanning a file
+MEASURE_CHUNK = 1_000_000
+
+STL_TRIANGLE = np.dtype([
+    ("normal", "<f4", (3,)),
+    ("vertices", "<f4", (3, 3)),
+    ("attributes", "<u2"),
+])
+
+
+def binary_stl_count(path):
+    """Triangle count of a binary STL file, or None when the file is not a binary STL."""
+    try:
+        size = os.path.getsize(path)
+        with open(path, "rb") as f:
+            header = f.read(STL_HEADER_SIZE)
+    except OSError:
+        return None
+    if len(header) < STL_HEADER_SIZE:
+        return None
+    # Same test as trimesh: the record count in the header must match the file length
+    count = int(np.frombuffer(header, dtype="<u4", count=1, offset=80)[0])
+    if size - STL_HEADER_SIZE != count * STL_TRIANGLE.itemsize:
+        return None
+    return count
+
+
+def read_binary_stl(path):
+    """Read-only memory-mapped view of the triangle records of a binary STL file."""
+    count = binary_stl_count(path)
+    if count is None:
+        raise ValueError(f"{path} is not a binary STL file")
+    if count == 0:
+        return np.zeros(0, dtype=STL_TRIANGLE)
+    return np.memmap(path, dtype=STL_TRIANGLE, mode="r", offset=STL_HEADER_SIZE, shape=(count,))
+
+
+def measure_binary_stl(path):
+    """
+    Bounds ((2, 3): lower and upper corner) and surface area of a binary STL file, in one pass over the mapped
+    records (triangles with non-finite vertices are skipped), or None when the file is not a
+    non-empty binary STL.
+    """
+    if not binary_stl_count(path):
+        return None
+    triangles = read_binary_stl(path)
+    lower = np.full(3, np.inf)
+    upper = np.full(3, -np.inf)
+    area = 0.0
+    for start in range(0, len(triangles), MEASURE_CHUNK):
+        tri = triangles["vertices"][start:start + MEASURE_CHUNK].astype(np.float64)
+        tri = tri[np.isfinite(tri).all(axis=(1, 2))]
+        if not len(tri):
+            continue
+        lower = np.minimum(lower, tri.min(axis=(0, 1)))
+        upper = np.maximum(upper, tri.max(axis=(0, 1)))
+        area += 0.5 * np.linalg.norm(np.cross(tri[:, 1] - tri[:, 0], tri[:, 2] - tri[:, 0]), axis=1).sum()
+    if not np.isfinite(lower).all():
+        return None
+    return np.array([lower, upper]), float(area)
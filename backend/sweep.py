@@ -0,0 +1,341 @@
+"""
+Parameter sweeps: one STL optimized under many configurations.
+The part is voxelized once, and KE, the assembly pattern and the density filters are built
+once, in the parent process. The variants then run concurrently in a process pool whose workers
+attach these arrays read-only from shared memory instead of rebuilding them. Each variant
+reports a row of a compact summary table (compliance, volume fraction, iterations, time);
+the density grids are returned on request.
+"""
+
+import itertools
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from multiprocessing import shared_memory
+
+import numpy as np
+import scipy.sparse as sp
+
+from .config import OptimizationConfig
+from .fem import AssemblyPattern
+from .filters import DensityFilter
+from .mesh_utils import MeshHandler
+from .memory import plan_voxel_size, precision_dtype
+from .optimizer import TopologyOptimizer
+from .cache import file_digest
+from .results import config_hash
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Config fields that determine the voxelization and KE, and so must agree across a sweep
+SHARED_FIELDS = ("voxel_size", "multires_levels", "precision", "E1", "nu", "memory_budget_mb", "memory_policy")
+
+# Prepared mesh of this worker process, set by _init_worker
+_worker_mesh = None
+
+
+class SweepCancelled(RuntimeError):
+    pass
+
+
+def expand_sweep(base=None, grid=None, variants=None):
+    """
+    Configs of a sweep: base (an OptimizationConfig) with every combination of the grid values
+    ({field: [values]}), and with each of the variants ([{field: value}]) applied on top of
+    every combination. Without grid and variants the sweep is the base config alone.
+    """
+    base = vars(base or OptimizationConfig())
+    grid = grid or {}
+    combinations = [dict(zip(grid, values)) for values in itertools.product(*grid.values())]
+    configs = []
+    for combination in combinations:
+        for overrides in variants or [{}]:
+            configs.append(OptimizationConfig(**dict(base, **combination, **overrides)).validate())
+    return configs
+
+
+def check_sweep_configs(configs):
+    """Raise ValueError unless the configs can share one voxelization and KE."""
+    if not configs:
+        raise ValueError("A sweep needs at least one configuration")
+    first = vars(configs[0])
+    for field in SHARED_FIELDS:
+        values = {repr(vars(config)[field]) for config in configs}
+        if len(values) > 1:
+            raise ValueError(f"All configurations of a sweep must share {field}, got {sorted(values)}")
+    return first
+
+
+def _share_array(array, blocks):
+    block = shared_memory.SharedMemory(create=True, size=max(1, array.nbytes))
+    blocks.append(block)
+    np.ndarray(array.shape, dtype=array.dtype, buffer=block.buf)[...] = array
+    return ("array", block.name, array.shape, array.dtype.str)
+
+
+def _attach_array(spec, blocks):
+    _, name, shape, dtype = spec
+    block = shared_memory.SharedMemory(name=name)
+    blocks.append(block)
+    array = np.ndarray(shape, dtype=dtype, buffer=block.buf)
+    array.flags.writeable = False
+    return array
+
+
+def _share_object(obj, blocks):
+    """Picklable spec of an object whose array and sparse matrix attributes are put in shared memory."""
+    fields = {}
+    for name, value in vars(obj).items():
+        if isinstance(value, np.ndarray):
+            fields[name] = _share_array(value, blocks)
+        elif sp.issparse(value):
+            value = value.tocsr()
+            fields[name] = ("csr", tuple(_share_array(a, blocks) for a in (value.data, value.indices, value.indptr)),
+                            value.shape)
+        else:
+            fields[name] = ("value", value)
+    return type(obj), fields
+
+
+def _attach_object(spec, blocks):
+    cls, fields = spec
+    obj = cls.__new__(cls)
+    for name, field in fields.items():
+        if field[0] == "array":
+            value = _attach_array(field, blocks)
+        elif field[0] == "csr":
+            value = sp.csr_matrix(tuple(_attach_array(a, blocks) for a in field[1]), shape=field[2])
+        else:
+            value = field[1]
+        setattr(obj, name, value)
+    return obj
+
+
+class PreparedMesh:
+    """
+    Voxelizations of one STL (one per multiresolution level) with their assembly patterns and
+    density filters, and KE. It serves as the voxel cache of the variants' optimizers (key, get,
+    put) and hands them the prepared patterns and filters.
+    """
+
+    def __init__(self, KE, levels):
+        self.KE = KE
+        # voxel size -> {"voxels", "nodes", "elements", "pattern", "filters": {(rmin, method): DensityFilter}}
+        self.levels = levels
+        self._blocks = []
+
+    def key(self, stl_path, voxel_size):
+        return float(voxel_size)
+
+    def get(self, key):
+        level = self.levels.get(key)
+        return None if level is None else (level["voxels"], level["nodes"], level["elements"])
+
+    def put(self, key, voxel_matrix, nodes, elements):
+        # Voxelizations outside the prepared levels are not kept
+        pass
+
+    def pattern(self, nodes, elements):
+        """Assembly pattern of the prepared voxelization with these nodes and elements, or None."""
+        for level in self.levels.values():
+            if level["nodes"] is nodes and level["elements"] is elements:
+                return level["pattern"]
+        return None
+
+    def filter(self, shape, rmin, method):
+        """Prepared filter of a grid shape, or None."""
+        for level in self.levels.values():
+            if level["voxels"].shape == tuple(shape):
+                return level["filters"].get((rmin, method))
+        return None
+
+    def share(self):
+        """Copy the arrays into shared memory; returns the picklable spec for attach()."""
+        levels = {}
+        for size, level in self.levels.items():
+            levels[size] = {
+                "voxels": _share_array(np.asarray(level["voxels"]), self._blocks),
+                "nodes": _share_array(np.asarray(level["nodes"]), self._blocks),
+                "elements": _share_array(np.asarray(level["elements"]), self._blocks),
+                "pattern": _share_object(level["pattern"], self._blocks),
+                "filters": {key: _share_object(f, self._blocks) for key, f in level["filters"].items()},
+            }
+        return {"KE": self.KE, "levels": levels}
+
+    @classmethod
+    def attach(cls, spec):
+        """Prepared mesh backed by the shared memory of another process's share()."""
+        blocks = []
+        levels = {}
+        for size, level in spec["levels"].items():
+            levels[size] = {
+                "voxels": _attach_array(level["voxels"], blocks),
+                "nodes": _attach_array(level["nodes"], blocks),
+                "elements": _attach_array(level["elements"], blocks),
+                "pattern": _attach_object(level["pattern"], blocks),
+                "filters": {key: _attach_object(f, blocks) for key, f in level["filters"].items()},
+            }
+        mesh = cls(spec["KE"], levels)
+        # Keep the blocks referenced for the lifetime of the mesh
+        mesh._attached = blocks
+        return mesh
+
+    def close(self):
+        """Release the shared memory created by share()."""
+        for block in self._blocks:
+            block.close()
+            block.unlink()
+        self._blocks = []
+
+
+def prepare_mesh(stl_path, configs):
+    """
+    Voxelize stl_path and build KE and, per level, the assembly pattern and the filters of
+    every (rmin, filter_method) in the configs. Returns the PreparedMesh and the finest voxel size.
+    """
+    base = configs[0]
+    optimizer = TopologyOptimizer(base)
+    voxel_size = plan_voxel_size(stl_path, base)[0] if base.memory_budget_mb is not None else base.voxel_size
+    dtype = precision_dtype(base.precision)
+    KE = optimizer.fem_solver.compute_stiffness_matrix(base.E1, base.nu)
+    filter_keys = sorted({(config.rmin, config.filter_method) for config in configs
+                          if config.filter_type != "none" and config.rmin > 1.0})
+    levels = {}
+    for size in optimizer._level_voxel_sizes(voxel_size):
+        voxels, nodes, elements = MeshHandler.load_and_voxelize(
+            stl_path, voxel_size=size, cache=optimizer.voxel_cache, workers=base.voxel_workers)
+        if voxels is None or nodes is None or elements is None:
+            raise RuntimeError(f"Failed to load and voxelize {stl_path}")
+        shape = np.shape(voxels)
+        levels[float(size)] = {
+            "voxels": voxels,
+            "nodes": nodes,
+            "elements": elements,
+            "pattern": AssemblyPattern(nodes, elements, shape, KE.shape[0], dtype=dtype),
+            "filters": {key: DensityFilter(shape, key[0], method=key[1], dtype=dtype, mask=np.asarray(voxels) > 0)
+                        for key in filter_keys},
+        }
+    return PreparedMesh(KE, levels), voxel_size
+
+
+def _run_variant(prepared, stl_path, config, return_result):
+    optimizer = TopologyOptimizer(config, prepared=prepared)
+    result = optimizer.optimize(stl_path)
+    return (result if return_result else None), optimizer.metrics.to_dict()
+
+
+def _init_worker(spec):
+    """Process pool initializer: attach the shared prepared mesh."""
+    global _worker_mesh
+    _worker_mesh = PreparedMesh.attach(spec)
+
+
+def _call_variant(stl_path, config, return_result):
+    return _run_variant(_worker_mesh, stl_path, config, return_result)
+
+
+def run_sweep(stl_path, configs, workers=None, return_results=False, result_store=None, project_id=None,
+              on_row=None, cancel_event=None):
+    """
+    Optimize stl_path under every config, `workers` variants at a time (default: one per CPU;
+    in-process when 1). Variants already in the result store are answered from it and new
+    results are stored. Returns {"rows", "results" (with return_results), "prepare_time",
+    "wall_time"}; rows hold the fields that vary across the sweep ("params") and the summary
+    of each variant, or its "error". on_row(row) is called as each row is complete. Once
+    cancel_event is set, no further variant is started and SweepCancelled is raised.
+    """
+    start = time.perf_counter()
+    first = check_sweep_configs(configs)
+    varying = [field for field in first if any(vars(config)[field] != first[field] for config in configs)]
+    rows = [{"index": index, "params": {field: config.to_dict()[field] for field in varying}, "cached": False,
+             "result_id": None, "error": None} for index, config in enumerate(configs)]
+    results = [None] * len(configs)
+
+    mesh_hash = file_digest(stl_path) if result_store is not None else None
+    pending = []
+    for index, config in enumerate(configs):
+        stored = result_store.get(mesh_hash, config_hash(config)) if result_store is not None else None
+        if stored is None:
+            pending.append(index)
+            continue
+        densities, summary = stored
+        rows[index].update(cached=True, result_id=summary["id"], compliance=summary["compliance"],
+                           volume_fraction=summary["volume_fraction"], iterations=summary["iterations"],
+                           wall_time=summary["wall_time"], voxel_size=summary["counters"].get("voxel_size"),
+                           grid_origin=summary["counters"].get("grid_origin"))
+        results[index] = densities
+        if on_row is not None:
+            on_row(rows[index])
+
+    prepare_time = 0.0
+    if pending:
+        prepare_start = time.perf_counter()
+        prepared, voxel_size = prepare_mesh(stl_path, configs)
+        prepare_time = time.perf_counter() - prepare_start
+        # The voxel size is planned once; the variants run at it without re-planning
+        run_configs = {index: OptimizationConfig(**dict(vars(configs[index]), voxel_size=voxel_size,
+                                                        memory_budget_mb=None)) for index in pending}
+        return_result = return_results or result_store is not None
+        workers = min(len(pending), workers or os.cpu_count() or 1)
+        logger.info(f"Sweep of {len(configs)} variants ({len(pending)} to run) on {workers} processes, "
+                    f"prepared in {prepare_time:.2f}s")
+
+        def finish(index, outcome):
+            result, metrics = outcome
+            counters = metrics.get("counters", {})
+            rows[index].update(compliance=counters.get("final_compliance"),
+                               volume_fraction=counters.get("volume_fraction"),
+                               iterations=counters.get("iterations"), wall_time=metrics.get("wall_time"),
+                               voxel_size=counters.get("voxel_size"), grid_origin=counters.get("grid_origin"))
+            if result_store is not None:
+                rows[index]["result_id"] = result_store.put(mesh_hash, config_hash(configs[index]), result, metrics,
+                                                            config=configs[index], project_id=project_id)
+            if return_results:
+                results[index] = result
+
+        def fail(index, error):
+            logger.error(f"Sweep variant {index} failed: {error}")
+            rows[index]["error"] = str(error)
+
+        def check_cancelled():
+            if cancel_event is not None and cancel_event.is_set():
+                raise SweepCancelled("Sweep cancelled")
+
+        try:
+            if workers == 1:
+                for index in pending:
+                    check_cancelled()
+                    try:
+                        finish(index, _run_variant(prepared, stl_path, run_configs[index], return_result))
+                    except Exception as e:
+                        fail(index, e)
+                    if on_row is not None:
+                        on_row(rows[index])
+            else:
+                context = multiprocessing.get_context("spawn")
+                with ProcessPoolExecutor(max_workers=workers, mp_context=context, initializer=_init_worker,
+                                         initargs=(prepared.share(),)) as executor:
+                    futures = {executor.submit(_call_variant, stl_path, run_configs[index], return_result): index
+                               for index in pending}
+                    for future in as_completed(futures):
+                        try:
+                            finish(futures[future], future.result())
+                        except Exception as e:
+                            fail(futures[future], e)
+                        if on_row is not None:
+                            on_row(rows[futures[future]])
+                        if cancel_event is not None and cancel_event.is_set():
+                            for other in futures:
+                                other.cancel()
+                            check_cancelled()
+        finally:
+            prepared.close()
+
+    return {
+        "rows": rows,
+        "results": results if return_results else None,
+        "prepare_time": prepare_time,
+        "wall_time": time.perf_counter() - start,
+    }
@@ -0,0 +1,95 @@
+"""
+Sweep endpoints: optimize one STL over a grid of parameter values, sharing the voxelization,
+assembly pattern and filters across the variants (see backend.sweep). A sweep runs as a job
+of the JobManager, so it is queued, streamed (/api/jobs/<id>/events) and cancelled like one.
+"""
+
+import os
+
+from flask import Blueprint, jsonify, request
+
+from .config import OptimizationConfig
+from .jobs import QueueFullError
+from .memory import MemoryBudgetError, plan_voxel_size
+from .sweep import check_sweep_configs, expand_sweep
+from .transport import result_response
+import logging
+
+logger = logging.getLogger(__name__)
+
+MAX_SWEEP_VARIANTS = 256
+
+
+def create_sweep_blueprint(manager, max_variants=MAX_SWEEP_VARIANTS):
+    sweeps = Blueprint("sweeps", __name__)
+
+    @sweeps.route('/api/sweeps', methods=['POST'])
+    def submit_sweep():
+        """
+        Body: stl_path, config (base overrides), grid ({field: [values]}), variants
+        ([{field: value}]), workers, return_results, project_id.
+        Returns 202 with the sweep's job id; GET /api/sweeps/<id> gives its summary table and
+        GET /api/sweeps/<id>/results/<index> each requested density grid.
+        """
+        data = request.get_json(silent=True) or {}
+        stl_path = data.get('stl_path')
+        if not stl_path or not os.path.isfile(stl_path):
+            return jsonify({"error": "Invalid or missing STL file path"}), 400
+        try:
+            base = OptimizationConfig(**(data.get("config") or {}))
+            configs = expand_sweep(base, data.get("grid"), data.get("variants"))
+            check_sweep_configs(configs)
+            workers = data.get("workers")
+            workers = None if workers is None else max(1, int(workers))
+        except (TypeError, ValueError) as e:
+            return jsonify({"error": f"Invalid sweep: {e}"}), 400
+        if len(configs) > max_variants:
+            return jsonify({"error": f"Sweep has {len(configs)} variants, at most {max_variants} are allowed"}), 400
+        if base.memory_budget_mb is not None:
+            try:
+                plan_voxel_size(stl_path, base)
+            except MemoryBudgetError as e:
+                return jsonify({"error": str(e)}), 413
+
+        try:
+            job_id = manager.submit_sweep(stl_path, configs, workers=workers,
+                                          return_results=bool(data.get("return_results", False)),
+                                          project_id=data.get("project_id"))
+        except QueueFullError as e:
+            return jsonify({"error": str(e)}), 429
+        return jsonify({"job_id": job_id, "status": "queued", "variants": len(configs)}), 202
+
+    @sweeps.route('/api/sweeps/<job_id>', methods=['GET'])
+    def sweep_status(job_id):
+        """
+        Status and summary rows of a sweep; once completed, its timings and, with return_results,
+        the URLs of the variants' density grids.
+        """
+        job = manager.get(job_id)
+        if job is None or job.kind != "sweep":
+            return jsonify({"error": "Unknown sweep"}), 404
+        body = dict(job.to_dict(), rows=sorted(job.rows, key=lambda row: row["index"]))
+        if job.status == "completed":
+            sweep = job.result
+            body.update(rows=sweep["rows"], prepare_time=sweep["prepare_time"], wall_time=sweep["wall_time"])
+            if sweep["results"] is not None:
+                body["results"] = [None if result is None else f"/api/sweeps/{job_id}/results/{index}"
+                                   for index, result in enumerate(sweep["results"])]
+        return jsonify(body), 200
+
+    @sweeps.route('/api/sweeps/<job_id>/results/<int:index>', methods=['GET'])
+    def sweep_result(job_id, index):
+        """Density grid of one variant of a completed sweep, in the negotiated result format."""
+        job = manager.get(job_id)
+        if job is None or job.kind != "sweep":
+            return jsonify({"error": "Unknown sweep"}), 404
+        if job.status != "completed":
+            return jsonify({"error": f"Sweep is {job.status}", "status": job.status}), 409
+        results = job.result["results"]
+        if results is None or not 0 <= index < len(results) or results[index] is None:
+            return jsonify({"error": f"No result for variant {index}"}), 404
+        row = job.result["rows"][index]
+        return result_response(results[index], request, voxel_size=row.get("voxel_size") or 1.0,
+                               origin=row.get("grid_origin"))
+
+    return sweeps
@@ -0,0 +1,149 @@
+"""
+Mirror symmetry of voxelized parts.
+A part whose voxel grid and load cases are their own mirror image about the mid-plane of an
+axis is optimized on the low side of the plane only (a half, quarter or eighth of the grid),
+and the result is mirrored back to the full grid. The reduced run reproduces the full one
+with 2-8x fewer DOFs:
+
+- With an even number of voxels along the axis the plane lies on a node layer, whose normal
+  displacement is fixed (see backend.loads).
+- With an odd number the plane cuts the middle voxel layer, which is kept. Its outer nodes are
+  tied to the mirror image of its inner nodes, and since the full part holds the layer only
+  once, its stiffness and volume count half.
+
+The filters see the mirrored field, so voxels next to a plane keep their mirrored neighbours.
+"""
+
+import numpy as np
+import scipy.sparse as sp
+import logging
+
+from .loads import AXES, LoadCase, symmetry_axes
+from .mesh_utils import MeshHandler
+
+logger = logging.getLogger(__name__)
+
+
+def mirror_axes(mask, axes=(0, 1, 2)):
+    """Axes among `axes` along which the grid is its own mirror image."""
+    mask = np.asarray(mask)
+    return tuple(axis for axis in axes if mask.shape[axis] > 1 and np.array_equal(mask, np.flip(mask, axis)))
+
+
+class SymmetryReduction:
+    """
+    Low side of a voxel grid cut at the mid-planes of `axes`, with its structured mesh.
+
+    nodes/elements are the mesh of the reduced grid. solve_nodes are the nodes that carry DOFs
+    of the linear system; `tie` (None without odd axes) maps those DOFs to the DOFs of all nodes.
+    `planes` maps each axis to the coordinate of its mid-plane, and `copies` is the number of
+    mirrored copies that make up the full part.
+    """
+
+    def __init__(self, mask, axes, voxel_size):
+        self.full_shape = tuple(np.shape(mask))
+        self.axes = tuple(axes)
+        self.shape = tuple((n + 1) // 2 if axis in self.axes else n for axis, n in enumerate(self.full_shape))
+        self.odd_axes = tuple(axis for axis in self.axes if self.full_shape[axis] % 2)
+        self.copies = 2 ** len(self.axes)
+        self.nodes, self.elements = MeshHandler.voxel_to_nodes_elements(self.reduce(mask), voxel_size)
+        # Same arithmetic as the node coordinates, so nodes on an even plane compare equal to it;
+        # no node lies on an odd plane, which runs through voxel centers
+        self.planes = {axis: np.float32(self.full_shape[axis] / 2) * np.float32(voxel_size) for axis in self.axes}
+        self.tie = None
+        self.solve_nodes = self.nodes
+        if self.odd_axes:
+            self._tie_middle_layers(voxel_size)
+
+    def _tie_middle_layers(self, voxel_size):
+        """Express the outer nodes of the middle layers by their mirror images on the inner side."""
+        lattice = np.rint(self.nodes / np.float32(voxel_size)).astype(np.int64)
+        lattice_shape = tuple(n + 1 for n in self.shape)
+        lookup = np.full(int(np.prod(lattice_shape)), -1, dtype=np.int64)
+        lookup[np.ravel_multi_index(lattice.T, lattice_shape)] = np.arange(len(lattice))
+
+        mirrored = lattice.copy()
+        signs = np.ones((len(lattice), 3))
+        for axis in self.odd_axes:
+            outer = lattice[:, axis] == self.shape[axis]
+            mirrored[outer, axis] -= 1
+            signs[outer, axis] = -1.0
+        partner = lookup[np.ravel_multi_index(mirrored.T, lattice_shape)]
+        kept = np.all(signs > 0, axis=1)
+        solve_index = np.cumsum(kept) - 1
+        self.solve_nodes = self.nodes[kept]
+
+        columns = 3 * solve_index[partner][:, None] + np.arange(3)
+        self.tie = sp.csr_matrix((signs.ravel(), (np.arange(3 * len(lattice)), columns.ravel())),
+                                 shape=(3 * len(lattice), 3 * len(self.solve_nodes)))
+        logger.info(f"Tied {np.count_nonzero(~kept)} middle layer nodes to their mirror images")
+
+    def _middle_layer_weights(self, coordinates):
+        """Weight of voxels (by their grid coordinates): halved on each odd axis's middle layer."""
+        weights = np.ones(len(coordinates[0]))
+        for axis in self.odd_axes:
+            weights[coordinates[axis] == self.shape[axis] - 1] *= 0.5
+        return weights
+
+    def element_scale(self, pattern):
+        """Stiffness factors of the elements of an assembly pattern on the reduced grid, or None."""
+        if not self.odd_axes:
+            return None
+        return self._middle_layer_weights(np.unravel_index(pattern.element_voxels, self.shape)).astype(pattern.dtype)
+
+    def volume_weights(self):
+        """Volume weights of the reduced grid voxels, or None when all count fully."""
+        if not self.odd_axes:
+            return None
+        return self._middle_layer_weights(np.indices(self.shape).reshape(3, -1)).reshape(self.shape)
+
+    def tie_matrix(self, K):
+        """Stiffness matrix on the solve DOFs."""
+        return K if self.tie is None else (self.tie.T @ K @ self.tie).tocsr()
+
+    def untie(self, U):
+        """Displacements of all nodes from those of the solve DOFs."""
+        return U if self.tie is None else self.tie @ U
+
+    def reduce(self, field):
+        """The low side of a full grid field."""
+        return np.ascontiguousarray(np.asarray(field)[tuple(slice(0, n) for n in self.shape)])
+
+    def expand(self, field):
+        """The full grid field of a reduced one, mirrored across the planes."""
+        for axis in self.axes:
+            mirrored = np.flip(field, axis)
+            if axis in self.odd_axes:
+                # The middle layer is its own mirror image
+                mirrored = np.take(mirrored, np.arange(1, field.shape[axis]), axis=axis)
+            field = np.concatenate((field, mirrored), axis=axis)
+        return field
+
+    def axis_names(self):
+        names = {index: name for name, index in AXES.items()}
+        return [names[axis] for axis in self.axes]
+
+
+def find_symmetry(mask, voxel_size, setting, load_cases=None, allow_odd=True):
+    """
+    SymmetryReduction for the axes of config.symmetry that the part (its voxel mask) and all
+    load cases are symmetric about, or None when there are none. Without allow_odd, axes with
+    an odd number of voxels (whose middle layer needs the assembled matrix) are left out.
+    """
+    axes = symmetry_axes(setting)
+    if not axes:
+        return None
+    cases = [LoadCase.from_spec(spec) for spec in load_cases] if load_cases else [LoadCase()]
+    loaded = tuple(axis for axis in axes if all(case.is_symmetric(axis) for case in cases))
+    found = tuple(axis for axis in mirror_axes(mask, loaded) if allow_odd or np.shape(mask)[axis] % 2 == 0)
+    for axis in axes:
+        if axis not in loaded:
+            logger.info(f"No mirror symmetry about axis {axis}: the load cases are not symmetric")
+        elif axis not in found:
+            logger.info(f"No mirror symmetry about axis {axis} of grid {np.shape(mask)}")
+    if not found:
+        return None
+    reduction = SymmetryReduction(mask, found, voxel_size)
+    logger.info(f"Mirror symmetry about axes {reduction.axis_names()}: grid {reduction.full_shape} "
+                f"reduced to {reduction.shape}, {3 * len(reduction.solve_nodes)} DOFs")
+    return reduction
@@ -0,0 +1,15 @@
+import pytest
+import trimesh
+
+
+@pytest.fixture
+def box_extents():
+    """Extents of the stl_file box; override the fixture in a module, or parametrize it, for another size."""
+    return (4, 4, 4)
+
+
+@pytest.fixture
+def stl_file(tmp_path, box_extents):
+    path = tmp_path / "box.stl"
+    trimesh.creation.box(extents=box_extents).export(str(path))
+    return str(path)
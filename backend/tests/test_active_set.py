@@ -0,0 +1,103 @@
+import numpy as np
+import pytest
+import trimesh
+from backend.active_set import ActiveSet
+from backend.checkpoint import load_checkpoint
+from backend.config import OptimizationConfig
+from backend.mesh_utils import MeshHandler
+from backend.optimizer import TopologyOptimizer
+
+
+def plate(loaded_x=6):
+    """
+    Active set of a 6x2x1 plate of voxels (element x * 2 + y), supported at x = 0 and loaded on
+    the nodes at x = loaded_x, with a patience of 2 and a re-check every 5 updates.
+    """
+    nodes, elements = MeshHandler.voxel_to_nodes_elements(np.ones((6, 2, 1), dtype=bool), 1.0)
+    return ActiveSet(elements, np.arange(len(elements)), supports=[nodes[:, 0] == 0],
+                     loaded=nodes[:, 0] == loaded_x, patience=2, recheck_interval=5)
+
+
+def densities(void):
+    densities = np.ones(12)
+    densities[void] = 0.001
+    return densities
+
+
+def test_void_elements_are_pruned_after_patience():
+    active_set = plate()
+    assert not active_set.update(densities([5, 7]))
+    assert active_set.update(densities([5, 7]))
+    assert np.flatnonzero(~active_set.active).tolist() == [5, 7]
+    assert active_set.active_elements.shape == (10, 8)
+
+
+def test_pruning_keeps_loaded_elements_connected():
+    # Pruning the x = 3 column would cut the loaded end off the support
+    active_set = plate()
+    for _ in range(3):
+        assert not active_set.update(densities([6, 7]))
+    assert active_set.active.all() and active_set.active_elements is active_set.elements
+
+
+def test_unsupported_elements_are_pruned_with_the_void():
+    # With the load next to the support, everything beyond a void column hangs on nothing
+    active_set = plate(loaded_x=1)
+    active_set.update(densities([4, 5]))
+    assert active_set.update(densities([4, 5]))
+    assert np.flatnonzero(active_set.active).tolist() == [0, 1, 2, 3]
+
+
+def test_pruned_elements_come_back():
+    active_set = plate()
+    active_set.update(densities([5, 7]))
+    active_set.update(densities([5, 7]))
+    # Pulled off the floor by its neighbours
+    rho = densities([5, 7])
+    rho[5] = 0.01
+    assert active_set.update(rho)
+    assert np.flatnonzero(~active_set.active).tolist() == [7]
+
+
+def test_recheck_reinstates_pruned_elements():
+    active_set = plate()
+    for _ in range(4):
+        active_set.update(densities([5, 7]))
+    assert not active_set.active[5]
+    # The fifth update is the re-check; the elements still void after it are pruned again at once
+    assert active_set.update(densities([5, 7])) and active_set.active.all()
+    assert active_set.update(densities([5, 7]))
+    assert np.flatnonzero(~active_set.active).tolist() == [5, 7]
+
+
+@pytest.mark.parametrize("extra", [{}, {"symmetry": "auto", "filter_type": "density"}])
+def test_active_set_run_matches_full_run(tmp_path, extra):
+    stl = str(tmp_path / "box.stl")
+    trimesh.creation.box(extents=(20, 10, 6)).export(stl)
+
+    def run(active_set):
+        optimizer = TopologyOptimizer(OptimizationConfig(
+            max_iter=25, tol=0, volfrac=0.15, active_set=active_set, active_set_patience=3, **extra))
+        return optimizer.optimize(stl), optimizer
+
+    full, full_optimizer = run(False)
+    pruned, pruned_optimizer = run(True)
+    counters = pruned_optimizer.metrics.to_dict()["counters"]
+    assert counters["active_elements"] < counters["elements"] and counters["active_set_rebuilds"] > 0
+    assert np.allclose(pruned_optimizer.compliance_history, full_optimizer.compliance_history, rtol=1e-5)
+    assert np.allclose(pruned, full, atol=1e-4)
+
+
+def test_checkpoint_keeps_warm_start_while_pruned(tmp_path):
+    stl = str(tmp_path / "box.stl")
+    trimesh.creation.box(extents=(20, 10, 6)).export(stl)
+    directory = str(tmp_path / "run")
+    optimizer = TopologyOptimizer(OptimizationConfig(
+        max_iter=12, tol=0, volfrac=0.15, solver="pcg", active_set=True, active_set_patience=3,
+        checkpoint_dir=directory, checkpoint_interval=1))
+    optimizer.optimize(stl)
+    assert optimizer._solvers is not optimizer._group_solvers
+
+    # Saved on the free DOFs of the full system, the shape a resumed run accepts
+    _, arrays = load_checkpoint(directory)
+    assert arrays["displacements"].shape == optimizer._load_case_groups[0].free_dofs.shape
@@ -0,0 +1,25 @@
+import pytest
+from backend.benchmarks.bench import STAGES, compare, run
+from backend.benchmarks.parts import PARTS
+
+@pytest.mark.parametrize("name", list(PARTS))
+def test_parts_fit_resolution(name):
+    """Synthetic parts span the requested number of voxels along their longest side."""
+    mesh = PARTS[name](16)
+    assert len(mesh.faces) > 0
+    assert max(mesh.extents) == pytest.approx(16, rel=0.1)
+
+def test_benchmark_run_and_regression_check(tmp_path):
+    """Every stage is timed and slowdowns beyond the threshold are flagged."""
+    current = run(["box"], [8], repeats=1, workdir=str(tmp_path))
+    stages = current["results"]["box-8"]
+    for stage in STAGES:
+        assert stages[stage]["time"] > 0
+        assert stages[stage]["peak_mb"] >= 0
+    assert stages["size"]["elements"] > 0
+
+    assert compare(current, current) == []
+    baseline = {"results": {"box-8": {stage: dict(stats, time=stats["time"] / 2)
+                                      for stage, stats in stages.items() if stage != "size"}}}
+    flagged = {r["stage"] for r in compare(current, baseline, threshold=0.5)}
+    assert flagged == set(stages) - {"size"}
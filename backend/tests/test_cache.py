@@ -0,0 +1,46 @@
+import numpy as np
+import pytest
+import trimesh
+from backend.cache import VoxelCache
+from backend.mesh_utils import MeshHandler
+
+@pytest.fixture
+def box_extents():
+    return (6, 4, 3)
+
+def test_repeat_voxelization_hits_cache(tmp_path, stl_file, mocker):
+    """A repeated job is served from the cache without loading the mesh."""
+    cache = VoxelCache(str(tmp_path / "cache"))
+    voxels, nodes, elements = MeshHandler.load_and_voxelize(stl_file, 1.0, cache=cache)
+    assert cache.misses == 1 and cache.hits == 0
+
+    load = mocker.patch("trimesh.load")
+    cached = MeshHandler.load_and_voxelize(stl_file, 1.0, cache=cache)
+    load.assert_not_called()
+    assert cache.memory_hits == 1
+    for original, restored in zip((voxels, nodes, elements), cached):
+        assert np.array_equal(original, restored)
+
+    # A fresh cache on the same directory memory-maps the stored arrays
+    disk_cache = VoxelCache(str(tmp_path / "cache"))
+    restored = MeshHandler.load_and_voxelize(stl_file, 1.0, cache=disk_cache)
+    load.assert_not_called()
+    assert isinstance(restored[0], np.memmap)
+    assert disk_cache.hits == 1 and disk_cache.memory_hits == 0
+    assert np.array_equal(restored[2], elements)
+
+def test_cache_key_depends_on_content_and_voxel_size(tmp_path, stl_file):
+    cache = VoxelCache(str(tmp_path / "cache"))
+    copy = tmp_path / "copy.stl"
+    copy.write_bytes(open(stl_file, "rb").read())
+    assert cache.key(stl_file, 1.0) == cache.key(str(copy), 1.0)
+    assert cache.key(stl_file, 1.0) != cache.key(stl_file, 0.5)
+
+def test_cache_evicts_least_recently_used(tmp_path):
+    cache = VoxelCache(str(tmp_path / "cache"), max_disk_bytes=1, max_memory_entries=1)
+    arrays = (np.ones((2, 2, 2), dtype=bool), np.zeros((27, 3), np.float32), np.zeros((8, 8), np.int32))
+    cache.put("a", *arrays)
+    cache.put("b", *arrays)
+    assert cache.get("a") is None
+    assert cache.get("b") is not None
+    assert cache.stats()["memory_entries"] == 1
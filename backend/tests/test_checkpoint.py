@@ -0,0 +1,81 @@
+import numpy as np
+import pytest
+from flask import Flask
+from backend.checkpoint import Checkpoint, CheckpointError, load_checkpoint, read_state
+from backend.config import OptimizationConfig
+from backend.jobs import JobManager, create_jobs_blueprint
+from backend.optimizer import TopologyOptimizer
+
+@pytest.fixture
+def box_extents():
+    return (12, 8, 6)
+
+def test_checkpoint_slots(tmp_path):
+    """Checkpoints alternate between two memory-mapped slots; the state points at the latest."""
+    directory = str(tmp_path / "run")
+    with pytest.raises(CheckpointError):
+        load_checkpoint(directory)
+
+    checkpoint = Checkpoint(directory)
+    for iteration in range(3):
+        checkpoint.save({"iteration": iteration}, {"design": np.full((2, 3), iteration, dtype=np.float32)})
+        state, arrays = load_checkpoint(directory)
+        assert state["iteration"] == iteration and state["slot"] == (iteration + 1) % 2
+        assert arrays["design"].dtype == np.float32 and np.all(arrays["design"] == iteration)
+
+    # A new writer on the same directory continues the sequence
+    assert Checkpoint(directory).sequence == read_state(directory)["sequence"] == 3
+
+def test_interrupted_run_resumes_to_same_result(tmp_path, stl_file):
+    """A run stopped mid-way and resumed from its checkpoint matches an uninterrupted run."""
+    config = dict(max_iter=8, tol=0.0, solver="pcg", preconditioner="jacobi")
+    uninterrupted = TopologyOptimizer(OptimizationConfig(**config))
+    expected = uninterrupted.optimize(stl_file)
+
+    def stop(iteration, densities, change):
+        if iteration == 4:
+            raise KeyboardInterrupt
+
+    directory = str(tmp_path / "run")
+    interrupted = TopologyOptimizer(OptimizationConfig(checkpoint_dir=directory, checkpoint_interval=3, **config))
+    with pytest.raises(KeyboardInterrupt):
+        interrupted.optimize(stl_file, callback=stop)
+    assert read_state(directory)["iteration"] == 5
+
+    seen = []
+    resumed = TopologyOptimizer.from_checkpoint(directory)
+    result = resumed.resume(directory, callback=lambda i, d, c: seen.append(i))
+    assert seen == [5, 6, 7]
+    assert len(resumed.compliance_history) == 8
+    assert np.allclose(resumed.change_history, uninterrupted.change_history)
+    assert np.allclose(result, expected)
+    # The solver continues from the checkpointed displacements
+    assert resumed.solve_stats[0]["inner_iterations"] == uninterrupted.solve_stats[5]["inner_iterations"]
+
+def test_job_latest_and_resume(tmp_path, stl_file):
+    """Jobs are checkpointed; the latest density is readable and a stopped job can be resumed."""
+    manager = JobManager(max_workers=1, checkpoint_root=str(tmp_path / "checkpoints"))
+    app = Flask(__name__)
+    app.register_blueprint(create_jobs_blueprint(manager))
+    client = app.test_client()
+    try:
+        job_id = manager.submit(stl_file, OptimizationConfig(max_iter=6, tol=0.0, checkpoint_interval=1))
+        for event in manager.iter_events(job_id, timeout=120):
+            if event["type"] == "progress":
+                manager.cancel(job_id)
+                break
+        manager.wait(job_id, timeout=120)
+
+        latest = client.get(f"/api/jobs/{job_id}/latest?format=npy")
+        assert latest.status_code == 200
+        assert int(latest.headers["X-Checkpoint-Iteration"]) >= 1
+
+        response = client.post(f"/api/jobs/{job_id}/resume")
+        assert response.status_code == 202
+        resumed = manager.wait(response.get_json()["job_id"], timeout=120)
+        assert resumed.status == "completed", resumed.error
+        assert resumed.resumed_from == job_id
+        assert resumed.metrics["counters"]["iterations"] == 6
+        assert client.post("/api/jobs/unknown/resume").status_code == 404
+    finally:
+        manager.shutdown()
@@ -0,0 +1,88 @@
+import io
+import json
+import os
+import subprocess
+import sys
+
+import numpy as np
+import pytest
+import trimesh
+from backend.cli import load_config, main, serve
+
+ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def events(text):
+    return [json.loads(line) for line in text.splitlines()]
+
+
+def test_cli_import_is_light():
+    code = ("import sys, backend.cli; "
+            "print(sorted(m for m in ('trimesh', 'scipy', 'flask', 'backend.optimizer') if m in sys.modules))")
+    output = subprocess.run([sys.executable, "-c", code], cwd=ROOT, capture_output=True, text=True, check=True)
+    assert output.stdout.strip() == "[]"
+    from backend import TopologyOptimizer
+    from backend.optimizer import TopologyOptimizer as direct
+    assert TopologyOptimizer is direct
+
+
+def test_cli_run_writes_result_and_progress(stl_file, tmp_path, capsys):
+    output = str(tmp_path / "result.npy")
+    assert main([stl_file, output, "--config", '{"max_iter": 2}', "--results-db", ""]) == 0
+
+    lines = events(capsys.readouterr().out)
+    assert [line["event"] for line in lines] == ["started", "progress", "progress", "completed"]
+    assert lines[-1]["shape"] == list(np.load(output).shape) and not lines[-1]["cached"]
+
+    assert main([str(tmp_path / "missing.stl"), output, "--results-db", ""]) == 1
+    assert events(capsys.readouterr().out)[-1]["event"] == "error"
+
+
+def test_cli_stl_output_uses_the_planned_voxel_size(tmp_path, capsys):
+    """A run coarsened to fit its memory budget is exported at the coarse voxel size."""
+    from backend.config import OptimizationConfig
+    from backend.memory import plan_voxel_size
+
+    part = trimesh.creation.box(extents=(16, 8, 8)).apply_translation((8, 4, 4))
+    path = str(tmp_path / "part.stl")
+    part.export(path)
+    budget = 0.5 * plan_voxel_size(path, OptimizationConfig())[1] / 1024 ** 2
+    config = {"max_iter": 1, "volfrac": 0.95, "memory_budget_mb": budget, "memory_policy": "coarsen"}
+    output = str(tmp_path / "result.stl")
+    assert main([path, output, "--config", json.dumps(config), "--results-db", ""]) == 0
+
+    mesh = trimesh.load(output)
+    assert np.allclose(mesh.bounds, part.bounds, atol=1.0)
+
+
+def test_serve_answers_requests_until_shutdown(stl_file, tmp_path):
+    from backend.results import ResultStore
+
+    store = ResultStore(str(tmp_path / "projects.db"))
+    request = {"input": stl_file, "config": {"max_iter": 2}}
+    stdin = io.StringIO("\n".join([
+        json.dumps({"id": "a", "output": str(tmp_path / "a.json"), **request}),
+        json.dumps({"id": "b", "output": str(tmp_path / "b.xyz"), **request}),
+        json.dumps({"id": "c", "output": str(tmp_path / "c.stl"), **request}),
+        json.dumps({"command": "shutdown"}),
+        json.dumps({"id": "d", "output": str(tmp_path / "d.npy"), **request}),
+    ]) + "\n")
+    stdout = io.StringIO()
+    serve(stdin, stdout, store)
+
+    lines = events(stdout.getvalue())
+    assert lines[0]["event"] == "ready" and lines[-1]["event"] == "shutdown"
+    final = {line["id"]: line for line in lines[1:-1] if line["event"] in ("completed", "error")}
+    assert final["a"]["event"] == "completed" and not final["a"]["cached"]
+    assert final["b"]["event"] == "error" and "Unsupported output format" in final["b"]["error"]
+    assert final["c"]["cached"] and (tmp_path / "c.stl").stat().st_size > 84
+    assert "d" not in final
+    assert np.array(json.loads((tmp_path / "a.json").read_text())["result"]).shape == tuple(final["a"]["shape"])
+
+
+def test_load_config_validates_load_cases(tmp_path):
+    path = tmp_path / "config.json"
+    path.write_text(json.dumps({"volfrac": 0.3}))
+    assert load_config(str(path)).volfrac == 0.3
+    with pytest.raises(ValueError):
+        load_config({"load_cases": [{"loaded": "top"}]})
@@ -31,3 +31,23 @@ def test_assemble_global_matrix():
     KE = np.eye(2)
     K = FEMSolver.assemble_global_matrix(densities, 1.0, KE, 3.0)
     assert K.shape[0] == 20  # Should match 2 * number of elements
+
+def test_element_compliance_matches_loop(fem_solver):
+    """Chunked element compliance matches a per-element loop and sums to U^T K U."""
+    from ..fem import AssemblyPattern, element_compliance
+    from ..mesh_utils import MeshHandler
+
+    voxels = np.ones((3, 2, 2), dtype=bool)
+    nodes, elements = MeshHandler.voxel_to_nodes_elements(voxels, 1.0)
+    KE = fem_solver.compute_stiffness_matrix(1.0, 0.3)
+    pattern = AssemblyPattern(nodes, elements, voxels.shape)
+    densities = np.random.default_rng(2).uniform(0.1, 1.0, voxels.shape)
+    U = np.random.default_rng(3).standard_normal(pattern.ndof)
+
+    weights = pattern.element_densities(densities) ** 3.0
+    ce, total = element_compliance(U, pattern.edof, KE, weights=weights, chunk_size=5)
+
+    expected = np.array([U[dofs] @ KE @ U[dofs] for dofs in pattern.edof])
+    assert np.allclose(ce, expected)
+    K = pattern.assemble(densities, KE, 3.0)
+    assert total == pytest.approx(U @ K @ U)
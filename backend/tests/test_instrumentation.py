@@ -0,0 +1,87 @@
+import numpy as np
+import pytest
+from flask import Flask
+from backend.config import OptimizationConfig
+from backend.instrumentation import MetricsRegistry, RunMetrics, current_rss_mb, project_summary
+from backend.metrics_api import create_metrics_blueprint
+from backend.optimizer import TopologyOptimizer
+
+def test_run_metrics_stage_timers():
+    """Stage timers accumulate per stage and per iteration."""
+    metrics = RunMetrics()
+    for _ in range(2):
+        with metrics.stage("solve"):
+            pass
+    metrics.end_iteration(0, change=0.5)
+    with metrics.stage("update"):
+        pass
+    metrics.end_iteration(1)
+    metrics.finish()
+
+    data = metrics.to_dict()
+    assert data["stages"]["solve"]["count"] == 2
+    assert set(data["iterations"][0]["stages"]) == {"solve"}
+    assert data["iterations"][0]["change"] == 0.5
+    assert set(data["iterations"][1]["stages"]) == {"update"}
+    assert data["finished_at"] is not None
+
+@pytest.mark.skipif(current_rss_mb() is None, reason="RSS is read from /proc")
+def test_run_metrics_stage_memory():
+    """Stages record the resident memory they leave allocated."""
+    metrics = RunMetrics()
+    with metrics.stage("assemble"):
+        kept = np.ones(16 * 1024 ** 2)
+    with metrics.stage("update"):
+        pass
+    stages = metrics.to_dict()["stages"]
+    assert stages["assemble"]["rss_delta_mb"] > 100
+    assert abs(stages["update"]["rss_delta_mb"]) < 10
+    assert stages["assemble"]["peak_rss_growth_mb"] >= 0
+    del kept
+
+def test_optimizer_records_stage_metrics(stl_file):
+    """An optimization run records every pipeline stage and its result counters."""
+    optimizer = TopologyOptimizer(OptimizationConfig(max_iter=3, tol=0.0))
+    optimizer.optimize(stl_file)
+
+    data = optimizer.metrics.to_dict()
+    for stage in ("voxelize", "assemble", "solve", "sensitivities", "filter", "update"):
+        assert stage in data["stages"]
+    assert len(data["iterations"]) == 3
+    assert data["counters"]["iterations"] == 3
+    assert data["counters"]["final_compliance"] == pytest.approx(optimizer.compliance)
+
+def test_project_summary():
+    """Savings follow the volume fraction; quality compares specific stiffness with the solid part."""
+    runs = [{"counters": {"volume_fraction": 0.4, "initial_compliance": 1.0, "final_compliance": 2.0}}]
+    summary = project_summary(runs)
+    assert summary["materialSavings"] == pytest.approx(60.0)
+    assert summary["timeReduction"] == pytest.approx(60.0)
+    assert summary["qualityImprovement"] == pytest.approx(25.0)
+    assert project_summary([])["runs"] == 0
+
+def test_metrics_api():
+    """Aggregate and per-project metrics endpoints."""
+    registry = MetricsRegistry()
+    metrics = RunMetrics()
+    with metrics.stage("solve"):
+        pass
+    metrics.set("volume_fraction", 0.5)
+    metrics.end_iteration(0)
+    metrics.finish()
+    registry.record(metrics, project_id=7)
+    registry.record(RunMetrics())
+
+    app = Flask(__name__)
+    app.register_blueprint(create_metrics_blueprint(registry))
+    client = app.test_client()
+
+    aggregate = client.get("/api/metrics").get_json()
+    assert aggregate["runs"] == 2
+    assert aggregate["stages"]["solve"]["count"] == 1
+
+    project = client.get("/api/metrics/7").get_json()
+    assert project["materialSavings"] == pytest.approx(50.0)
+    assert len(project["history"]) == 1
+    assert "iterations" not in project["history"][0]
+    assert client.get("/api/metrics/unknown").get_json()["runs"] == 0
@@ -0,0 +1,123 @@
+import io
+import time
+import numpy as np
+import pytest
+import trimesh
+from flask import Flask
+from backend.config import OptimizationConfig
+from backend.jobs import Job, JobManager, QueueFullError, create_jobs_blueprint, register_job_api
+
+@pytest.fixture
+def manager():
+    manager = JobManager(max_workers=1, max_queue=2)
+    yield manager
+    manager.shutdown()
+
+def test_job_runs_in_worker_and_streams_progress(manager, stl_file):
+    """A submitted job runs in the pool and reports progress through the callback."""
+    job_id = manager.submit(stl_file, OptimizationConfig(max_iter=2, tol=0.0))
+    job = manager.wait(job_id, timeout=120)
+
+    assert job.status == "completed", job.error
+    assert isinstance(job.result, np.ndarray)
+    types = [event["type"] for event in manager.iter_events(job_id)]
+    assert types[0] == "queued" and types[-1] == "completed"
+    assert types.count("progress") == 2
+    assert job.iteration == 1
+    assert job.metrics["counters"]["iterations"] == 2
+
+def test_queue_depth_limit_and_cancellation(manager, stl_file):
+    """Submissions beyond the queue limit are rejected; queued jobs can be cancelled."""
+    config = OptimizationConfig(max_iter=50, tol=0.0)
+    first = manager.submit(stl_file, config)
+    second = manager.submit(stl_file, config)
+    with pytest.raises(QueueFullError):
+        manager.submit(stl_file, config)
+
+    assert manager.cancel(second)
+    assert manager.cancel(first)
+    assert manager.wait(first, timeout=120).status == "cancelled"
+    assert manager.wait(second, timeout=120).status == "cancelled"
+
+def test_jobs_api(manager, stl_file):
+    """Submit, poll and fetch a job through the HTTP API."""
+    app = Flask(__name__)
+    app.register_blueprint(create_jobs_blueprint(manager))
+    client = app.test_client()
+
+    response = client.post('/api/jobs', json={"stl_path": stl_file, "config": {"max_iter": 1}})
+    assert response.status_code == 202
+    job_id = response.get_json()["job_id"]
+    assert client.post('/api/jobs', json={"stl_path": stl_file, "config": {"bogus": 1}}).status_code == 400
+    assert client.post('/api/jobs', json={"stl_path": stl_file, "config": {"solver": "nope"}}).status_code == 400
+
+    manager.wait(job_id, timeout=120)
+    status = client.get(f'/api/jobs/{job_id}').get_json()
+    assert status["status"] == "completed"
+    events = client.get(f'/api/jobs/{job_id}/events').get_data(as_text=True)
+    assert "event: completed" in events
+    assert client.get(f'/api/jobs/{job_id}/result').status_code == 200
+    assert client.get('/api/jobs/unknown').status_code == 404
+
+def test_stl_result_keeps_the_part_placement(manager, tmp_path):
+    """The STL export uses the voxel size and grid origin the job ran with."""
+    part = trimesh.creation.box(extents=(16, 8, 8)).apply_translation((3.3, -1.7, 20.2))
+    path = str(tmp_path / "part.stl")
+    part.export(path)
+    app = Flask(__name__)
+    app.register_blueprint(create_jobs_blueprint(manager))
+
+    job = manager.wait(manager.submit(path, OptimizationConfig(voxel_size=2.0, max_iter=1)), timeout=120)
+    assert job.status == "completed", job.error
+    response = app.test_client().get(f'/api/jobs/{job.id}/result?format=stl&threshold=0.0001')
+    mesh = trimesh.load(io.BytesIO(response.data), file_type="stl")
+    # Voxel centres snap to the 2.0 pitch, and the near-zero threshold reaches the void voxel beyond them
+    assert np.allclose(mesh.bounds, np.round(part.bounds / 2.0) * 2.0 + [[-2.0], [2.0]], atol=0.01)
+
+def test_event_stream_keepalive_and_reconnect(manager, stl_file):
+    """A quiet running job gets keepalives instead of a closed stream; reconnects skip seen events."""
+    app = Flask(__name__)
+    app.register_blueprint(create_jobs_blueprint(manager))
+    client = app.test_client()
+    job = Job("quiet", stl_file, OptimizationConfig())
+    job.status = "running"
+    with manager._lock:
+        manager.jobs[job.id] = job
+        manager._append_event(job, {"type": "queued"})
+        manager._append_event(job, {"type": "started"})
+
+    events = manager.iter_events(job.id, start=1, timeout=0.01, keepalive=True)
+    assert next(events)["type"] == "started"
+    assert next(events) is None
+
+    with manager._lock:
+        job.status = "completed"
+        manager._append_event(job, {"type": "completed"})
+    stream = client.get(f'/api/jobs/{job.id}/events', headers={"Last-Event-ID": "1"}).get_data(as_text=True)
+    assert stream.startswith("id: 2\nevent: completed")
+
+
+def test_finished_jobs_are_evicted(stl_file):
+    manager = JobManager(max_workers=1, job_ttl=60, max_finished=2)
+    now = time.time()
+    for index, finished_at in enumerate([now - 120, now - 3, now - 2, now - 1]):
+        job = Job(f"job{index}", stl_file, OptimizationConfig())
+        job.status, job.finished_at = "completed", finished_at
+        manager.jobs[job.id] = job
+    running = Job("running", stl_file, OptimizationConfig())
+    manager.jobs[running.id] = running
+    with manager._lock:
+        manager._evict()
+    assert sorted(manager.jobs) == ["job2", "job3", "running"]
+
+def test_register_job_api(monkeypatch, tmp_path):
+    """Both server apps get the job manager and the job, metrics and sweep endpoints from one place."""
+    monkeypatch.setenv("OPTIMIZER_RESULTS_DB", str(tmp_path / "projects.db"))
+    app = Flask(__name__)
+    manager = register_job_api(app)
+    try:
+        assert manager.result_store is not None
+        routes = {rule.rule for rule in app.url_map.iter_rules()}
+        assert {"/api/jobs", "/api/metrics", "/api/sweeps"} <= routes
+    finally:
+        manager.shutdown()
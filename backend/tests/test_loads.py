@@ -0,0 +1,98 @@
+import numpy as np
+import pytest
+import trimesh
+from backend.config import OptimizationConfig
+from backend.loads import LoadCase, build_load_case_groups
+from backend.mesh_utils import MeshHandler
+from backend.optimizer import TopologyOptimizer
+
+
+@pytest.fixture
+def nodes():
+    nodes, _ = MeshHandler.voxel_to_nodes_elements(np.ones((4, 3, 2), dtype=bool), 1.0)
+    return nodes
+
+
+def test_default_load_case_is_build_plate(nodes):
+    (group,) = build_load_case_groups(nodes)
+    z = nodes[:, 2]
+    top = np.flatnonzero(z == z.max())
+    assert group.rhs().ndim == 1
+    assert np.allclose(group.rhs()[3 * top + 2], -1.0 / len(top))
+    assert group.rhs().sum() == pytest.approx(-1.0)
+    assert len(group.free_dofs) == 3 * np.count_nonzero(z > z.min())
+
+
+def test_cases_are_grouped_by_supports(nodes):
+    groups = build_load_case_groups(nodes, [
+        {"loaded": "zmax", "force": [0, 0, -1]},
+        {"fixed": ["xmin"], "loaded": "xmax", "force": [0, 1, 0]},
+        {"loaded": "xmax", "force": [2, 0, 0], "weight": 0.5},
+    ])
+    assert [group.indices for group in groups] == [[0, 2], [1]]
+    assert groups[0].rhs().shape == (3 * len(nodes), 2)
+    assert groups[0].rhs()[0::3, 1].sum() == pytest.approx(2.0)
+    assert np.allclose(groups[0].weights, [1.0, 0.5])
+
+
+def test_invalid_load_case():
+    with pytest.raises(ValueError, match="face"):
+        LoadCase(fixed="bottom")
+    with pytest.raises(ValueError, match="weight"):
+        LoadCase(weight=-1)
+
+
+@pytest.mark.parametrize("solver", ["direct", "pcg"])
+def test_weighted_compliance_of_load_cases(tmp_path, solver):
+    """One run with several load cases sees the weighted sum of the single-case compliances."""
+    stl = tmp_path / "box.stl"
+    trimesh.creation.box(extents=(6, 4, 3)).export(str(stl))
+    cases = [
+        {"loaded": "zmax", "force": [0, 0, -1], "weight": 0.7},
+        {"loaded": "xmax", "force": [0, 1, 0], "weight": 0.3},
+        {"fixed": "xmin", "loaded": "xmax", "force": [0, 0, -1], "weight": 1.0},
+    ]
+    settings = dict(max_iter=1, solver=solver, solver_tol=1e-10)
+    single = []
+    for case in cases:
+        optimizer = TopologyOptimizer(OptimizationConfig(load_cases=[dict(case, weight=1.0)], **settings))
+        optimizer.optimize(str(stl))
+        single.append(optimizer.compliance_history[0])
+
+    optimizer = TopologyOptimizer(OptimizationConfig(load_cases=cases, **settings))
+    optimizer.optimize(str(stl))
+    assert len(optimizer._solvers) == 2
+    assert optimizer.load_case_compliances == pytest.approx(single, rel=1e-6)
+    expected = sum(case["weight"] * c for case, c in zip(cases, single))
+    assert optimizer.compliance_history[0] == pytest.approx(expected, rel=1e-6)
+
+
+def test_config_with_load_case_objects_checkpoints(tmp_path):
+    stl = tmp_path / "box.stl"
+    trimesh.creation.box(extents=(4, 4, 4)).export(str(stl))
+    config = OptimizationConfig(max_iter=2, load_cases=[LoadCase(name="top")], checkpoint_dir=str(tmp_path / "run"),
+                                checkpoint_interval=1)
+    assert config.validate() is config
+    assert config.to_dict()["load_cases"] == [LoadCase(name="top").to_dict()]
+    TopologyOptimizer(config).optimize(str(stl))
+    assert TopologyOptimizer.from_checkpoint(str(tmp_path / "run")).config.load_cases[0]["name"] == "top"
+
+    with pytest.raises(ValueError, match="face"):
+        OptimizationConfig(load_cases=[{"loaded": "top"}]).validate()
+    with pytest.raises(ValueError, match="symmetry axis"):
+        OptimizationConfig(symmetry=["w"]).validate()
+
+
+@pytest.mark.parametrize("fields,message", [
+    ({"solver": "nope"}, "solver"),
+    ({"filter_type": "densty"}, "filter_type"),
+    ({"filter_method": "fast"}, "filter_method"),
+    ({"preconditioner": "ilu"}, "preconditioner"),
+    ({"precision": "float16"}, "precision"),
+    ({"memory_policy": "shrink"}, "memory_policy"),
+    ({"multires_levels": 2, "level_max_iter": [10]}, "level_max_iter"),
+    ({"level_tol": [0.01, 0.01]}, "level_tol"),
+])
+def test_config_validation_rejects_unknown_options(fields, message):
+    with pytest.raises(ValueError, match=message):
+        OptimizationConfig(**fields).validate()
@@ -0,0 +1,75 @@
+import tracemalloc
+import numpy as np
+import pytest
+import trimesh
+from flask import Flask
+from backend.config import OptimizationConfig
+from backend.jobs import JobManager, create_jobs_blueprint
+from backend.memory import MemoryBudgetError, estimate_counts, estimate_peak_memory, plan_voxel_size
+from backend.optimizer import TopologyOptimizer
+
+@pytest.fixture
+def box_extents():
+    return (16, 12, 10)
+
+def test_float32_mode_matches_float64(stl_file):
+    """The float32 pipeline keeps densities and element data in single precision with the same result."""
+    results = {}
+    for precision in ("float64", "float32"):
+        optimizer = TopologyOptimizer(OptimizationConfig(max_iter=3, tol=0.0, precision=precision))
+        results[precision] = (optimizer.optimize(stl_file), optimizer.compliance)
+        pattern = optimizer._pattern
+        assert pattern.iK.dtype == np.int32 and pattern.edof.dtype == np.int32
+
+    (grid64, c64), (grid32, c32) = results["float64"], results["float32"]
+    assert grid64.dtype == np.float64 and grid32.dtype == np.float32
+    assert c32 == pytest.approx(c64, rel=1e-4)
+    assert np.allclose(grid32, grid64, atol=1e-3)
+
+def test_estimate_tracks_measured_peak(stl_file):
+    """The estimate from the actual mesh counts is close to the traced peak of a run."""
+    # Direct solver factors are allocated outside the Python allocator and not traced
+    config = OptimizationConfig(max_iter=2, tol=0.0, solver="pcg")
+    optimizer = TopologyOptimizer(config)
+    tracemalloc.start()
+    optimizer.optimize(stl_file)
+    peak = tracemalloc.get_traced_memory()[1] / 1024 ** 2
+    tracemalloc.stop()
+
+    estimate = optimizer.metrics.counters["estimated_peak_mb"]
+    assert 0.8 * peak <= estimate <= 2.0 * peak
+
+    mesh = trimesh.load(stl_file)
+    counts = estimate_counts(mesh.extents, mesh.area, 1.0)
+    assert counts[1] >= optimizer.metrics.counters["elements"]
+    single = estimate_peak_memory(*counts, OptimizationConfig(precision="float32", solver="pcg"))["peak"]
+    assert single < estimate_peak_memory(*counts, config)["peak"]
+
+def test_budget_rejects_or_coarsens(stl_file, monkeypatch):
+    """Over-budget jobs are rejected, or run on a coarser voxelization that fits."""
+    _, peak = plan_voxel_size(stl_file, OptimizationConfig())
+    budget = 0.5 * peak / 1024 ** 2
+    with pytest.raises(MemoryBudgetError):
+        plan_voxel_size(stl_file, OptimizationConfig(memory_budget_mb=budget))
+
+    config = OptimizationConfig(max_iter=1, memory_budget_mb=budget, memory_policy="coarsen")
+    with monkeypatch.context() as patch:
+        # Binary STLs are measured from the file without loading the mesh
+        patch.setattr(trimesh, "load", None)
+        voxel_size, coarse_peak = plan_voxel_size(stl_file, config)
+    assert voxel_size == 2.0 and coarse_peak <= budget * 1024 ** 2
+    optimizer = TopologyOptimizer(config)
+    optimizer.optimize(stl_file)
+    assert optimizer.level_stats[-1]["voxel_size"] == 2.0
+
+    with pytest.raises(MemoryBudgetError):
+        TopologyOptimizer(OptimizationConfig(memory_budget_mb=budget)).optimize(stl_file)
+
+def test_job_api_rejects_over_budget(stl_file):
+    """Job submission answers 413 for jobs over the memory budget."""
+    manager = JobManager(max_workers=1)
+    app = Flask(__name__)
+    app.register_blueprint(create_jobs_blueprint(manager))
+    response = app.test_client().post("/api/jobs", json={"stl_path": stl_file, "config": {"memory_budget_mb": 0.01}})
+    assert response.status_code == 413
+    assert not manager.jobs
@@ -13,3 +13,17 @@ def test_load_and_voxelize(mocker):
     voxel_data = mesh_handler.load_and_voxelize("mock.stl", 5, 5, 5)
     assert voxel_data.shape == (5, 5, 5)
     assert np.all(voxel_data == 1)
+
+def test_voxel_to_nodes_elements_shares_nodes():
+    """Neighbouring voxels share nodes and the last slab is meshed."""
+    voxels = np.zeros((3, 2, 2), dtype=bool)
+    voxels[:, 0, 0] = True
+    nodes, elements = MeshHandler.voxel_to_nodes_elements(voxels, 0.5)
+
+    assert elements.shape == (3, 8)
+    assert elements.dtype == np.int32
+    assert nodes.dtype == np.float32
+    assert len(nodes) == 16  # 4 x 2 x 2 lattice nodes along the row
+    assert np.array_equal(np.unique(elements), np.arange(len(nodes)))
+    assert len(np.intersect1d(elements[0], elements[1])) == 4
+    assert np.allclose(nodes.max(axis=0), [1.5, 0.5, 0.5])
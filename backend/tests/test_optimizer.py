@@ -37,3 +37,70 @@ def test_optimization_process(optimizer, mocker):
     # Run optimization
     densities = optimizer.optimize("mock_model.stl")
     assert densities.shape == (10, 10, 10)
+
+def test_assemble_global_matrix_matches_elementwise(optimizer):
+    """Vectorized assembly should match a per-element reference assembly."""
+    voxels = np.zeros((3, 3, 3), dtype=bool)
+    voxels[:2, :2, :2] = True
+    voxels[2, 0, 0] = True
+    densities = np.random.default_rng(0).uniform(0.1, 1.0, voxels.shape)
+    nodes, elements = optimizer.mesh_handler.voxel_to_nodes_elements(voxels, 1.0)
+    KE = optimizer.fem_solver.compute_stiffness_matrix(1.0, 0.3)
+
+    K = optimizer.assemble_global_matrix(densities, nodes, elements, KE, 3.0)
+
+    ndof = len(nodes) * 3
+    K_ref = np.zeros((ndof, ndof))
+    for element_nodes in np.asarray(elements):
+        x, y, z = np.floor(nodes[element_nodes].mean(axis=0)).astype(int)
+        dofs = (3 * np.asarray(element_nodes)[:, None] + np.arange(3)).ravel()
+        K_ref[np.ix_(dofs, dofs)] += KE * densities[x, y, z] ** 3.0
+    assert K.shape == (ndof, ndof)
+    assert np.allclose(K.toarray(), K_ref)
+
+    # The pattern is built once per mesh and reused across iterations
+    pattern = optimizer._pattern
+    optimizer.assemble_global_matrix(densities * 0.5, nodes, elements, KE, 3.0)
+    assert optimizer._pattern is pattern
+
+def test_multiresolution_continuation(tmp_path):
+    """Coarse levels run first and their result seeds the finer level."""
+    import trimesh
+    stl_path = str(tmp_path / "bar.stl")
+    trimesh.creation.box(extents=(12, 6, 6)).export(stl_path)
+    config = OptimizationConfig(multires_levels=2, level_max_iter=[3, 2], level_tol=[0.0, 0.0], volfrac=0.5)
+    optimizer = TopologyOptimizer(config)
+    shapes = []
+
+    result = optimizer.optimize(stl_path, callback=lambda iteration, grid, change: shapes.append((iteration, grid.shape)))
+
+    coarse_shape, fine_shape = optimizer.level_stats[0]["grid_shape"], optimizer.level_stats[1]["grid_shape"]
+    assert [stats["voxel_size"] for stats in optimizer.level_stats] == [2.0, 1.0]
+    assert [stats["iterations"] for stats in optimizer.level_stats] == [3, 2]
+    assert shapes == [(0, coarse_shape), (1, coarse_shape), (2, coarse_shape), (3, fine_shape), (4, fine_shape)]
+    assert result.shape == fine_shape
+    part = optimizer._design_mask
+    assert np.all(result[~part] == 0.0)
+    assert result[part].mean() == pytest.approx(0.5, rel=1e-3)
+
+def test_prolong_densities(optimizer):
+    """Each fine voxel takes the density of the coarse voxel containing it."""
+    coarse = np.arange(8, dtype=float).reshape(2, 2, 2) / 10 + 0.1
+    optimizer._design_mask = np.ones((4, 4, 4), dtype=bool)
+    fine = optimizer._prolong_densities(coarse, np.ones((4, 4, 4)))
+    assert np.allclose(fine, coarse.repeat(2, 0).repeat(2, 1).repeat(2, 2))
+
+@pytest.mark.parametrize("filter_method", ["matrix", "fft"])
+def test_density_filter_keeps_volume_on_the_part(tmp_path, filter_method):
+    """With the density filter the physical field meets volfrac on the part and stays void outside it."""
+    import trimesh
+    stl_path = str(tmp_path / "box.stl")
+    trimesh.creation.box(extents=(24, 12, 12)).export(stl_path)
+    optimizer = TopologyOptimizer(OptimizationConfig(
+        max_iter=5, tol=0.0, volfrac=0.4, rmin=2.0, filter_type="density", filter_method=filter_method))
+    result = optimizer.optimize(stl_path)
+
+    part = optimizer._design_mask
+    assert not part.all() and np.all(result[~part] == 0.0)
+    assert result[part].mean() == pytest.approx(0.4, rel=1e-4)
+    assert result.max() <= 1.0 + 1e-9
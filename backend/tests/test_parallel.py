@@ -0,0 +1,62 @@
+import numpy as np
+import pytest
+import trimesh
+from backend.config import OptimizationConfig
+from backend.fem import AssemblyPattern, FEMSolver, element_compliance
+from backend.mesh_utils import MeshHandler
+from backend.optimizer import TopologyOptimizer
+from backend.parallel import ElementPool
+
+
+@pytest.fixture
+def mesh():
+    voxels = np.ones((8, 3, 4), dtype=bool)
+    voxels[2:5, 1, 1:3] = False
+    nodes, elements = MeshHandler.voxel_to_nodes_elements(voxels, 1.0)
+    pattern = AssemblyPattern(nodes, elements, voxels.shape)
+    KE = FEMSolver().compute_stiffness_matrix(1.0, 0.3)
+    densities = np.random.default_rng(0).uniform(0.1, 1.0, voxels.shape)
+    return pattern, KE, densities
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_pool_matches_serial_kernels(mesh, workers):
+    pattern, KE, densities = mesh
+    K = pattern.assemble(densities, KE, 3.0)
+    U = np.random.default_rng(1).standard_normal(pattern.ndof)
+    weights = pattern.element_densities(densities) ** 3.0
+
+    pool = ElementPool(pattern, KE, workers=workers)
+    free = ElementPool(pattern, KE, workers=workers, matrix_free=True)
+    try:
+        pool.set_densities(densities, 3.0)
+        free.set_densities(densities, 3.0)
+        assert np.allclose(pool.assemble().toarray(), K.toarray())
+
+        ce, total = pool.element_compliance(U, weights)
+        expected_ce, expected_total = element_compliance(U, pattern.edof, KE, weights=weights)
+        assert np.allclose(ce, expected_ce) and total == pytest.approx(expected_total)
+
+        operator = free.operator()
+        assert np.allclose(operator @ U, K @ U)
+        assert np.allclose(operator.diagonal(), K.diagonal())
+        dofs = np.arange(0, pattern.ndof, 2)
+        assert np.allclose(operator.restrict(dofs) @ U[dofs], K[dofs, :][:, dofs] @ U[dofs])
+    finally:
+        pool.close()
+        free.close()
+
+
+def test_matrix_free_optimization_matches_assembled(tmp_path):
+    stl = tmp_path / "box.stl"
+    trimesh.creation.box(extents=(6, 4, 3)).export(str(stl))
+    settings = dict(max_iter=3, solver="pcg", preconditioner="jacobi", solver_tol=1e-10, rmin=1.5)
+
+    reference = TopologyOptimizer(OptimizationConfig(**settings))
+    expected = reference.optimize(str(stl))
+    optimizer = TopologyOptimizer(OptimizationConfig(fem_workers=2, matrix_free=True, **settings))
+    result = optimizer.optimize(str(stl))
+
+    assert np.allclose(result, expected, atol=1e-6)
+    assert optimizer.compliance_history == pytest.approx(reference.compliance_history, rel=1e-6)
+    assert optimizer._element_pool is None
@@ -0,0 +1,92 @@
+import sqlite3
+
+import numpy as np
+import pytest
+from flask import Flask
+from backend.config import OptimizationConfig
+from backend.jobs import JobManager, create_jobs_blueprint
+from backend.metrics_api import create_metrics_blueprint
+from backend.instrumentation import MetricsRegistry
+from backend.optimizer import TopologyOptimizer
+from backend import results
+from backend.results import ResultStore, config_hash, run_with_store
+
+METRICS = {
+    "wall_time": 1.5,
+    "stages": {"solve": {"count": 2, "total": 1.0, "max": 0.6}},
+    "counters": {"iterations": 2, "final_compliance": 0.5, "initial_compliance": 1.0, "volume_fraction": 0.4},
+    "iterations": [{"iteration": 0, "compliance": 1.0, "change": 0.2, "stages": {}},
+                   {"iteration": 1, "compliance": 0.5, "change": 0.1, "stages": {}}],
+}
+
+
+@pytest.fixture
+def store(tmp_path):
+    return ResultStore(str(tmp_path / "projects.db"))
+
+
+def test_config_hash_ignores_execution_settings():
+    base = config_hash(OptimizationConfig())
+    assert config_hash(OptimizationConfig(checkpoint_dir="/tmp/run", fem_workers=8, voxel_workers=4)) == base
+    assert config_hash(OptimizationConfig(volfrac=0.3)) != base
+    assert config_hash(OptimizationConfig(penal=3, max_iter=100.0)) == base
+
+
+def test_config_hash_follows_result_version(monkeypatch):
+    base = config_hash(OptimizationConfig())
+    monkeypatch.setattr(results, "RESULT_VERSION", results.RESULT_VERSION + 1)
+    assert config_hash(OptimizationConfig()) != base
+
+
+def test_store_round_trip(store):
+    densities = np.random.default_rng(0).uniform(size=(4, 5, 6)).astype(np.float32)
+    result_id = store.put("mesh", "config", densities, METRICS, config=OptimizationConfig(), project_id=7)
+
+    loaded, summary = store.get("mesh", "config")
+    assert loaded.dtype == np.float32 and np.array_equal(loaded, densities)
+    assert summary["id"] == result_id and summary["compliance"] == 0.5 and summary["shape"] == [4, 5, 6]
+    assert store.get("mesh", "other") is None
+
+    (listed,) = store.project_results(7)
+    assert "densities" not in listed and listed["hits"] == 1
+    assert [record["compliance"] for record in store.history(result_id)] == [1.0, 0.5]
+
+    with sqlite3.connect(store.path) as connection:
+        assert connection.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+        indexes = {row[1] for row in connection.execute("PRAGMA index_list(optimization_results)")}
+    assert {"idx_optimization_results_project", "idx_optimization_results_config"} <= indexes
+
+
+def test_identical_run_is_served_from_store(store, stl_file, mocker):
+    optimizer = TopologyOptimizer(OptimizationConfig(max_iter=2))
+    result, stored = run_with_store(store, optimizer, stl_file, project_id="p")
+    assert stored is None
+
+    optimize = mocker.spy(optimizer, "optimize")
+    cached, stored = run_with_store(store, optimizer, stl_file, project_id="p")
+    optimize.assert_not_called()
+    assert stored is not None and np.array_equal(cached, result)
+
+
+def test_jobs_complete_from_store(store, stl_file):
+    manager = JobManager(max_workers=1, result_store=store)
+    app = Flask(__name__)
+    app.register_blueprint(create_jobs_blueprint(manager))
+    app.register_blueprint(create_metrics_blueprint(MetricsRegistry(), store))
+    client = app.test_client()
+    try:
+        request = {"stl_path": stl_file, "project_id": "p", "config": {"max_iter": 2}}
+        first = client.post('/api/jobs', json=request).get_json()["job_id"]
+        assert manager.wait(first, timeout=120).status == "completed"
+
+        response = client.post('/api/jobs', json=request)
+        assert response.status_code == 200 and response.get_json()["cached"]
+        job = manager.get(response.get_json()["job_id"])
+        assert job.status == "completed" and np.array_equal(job.result, manager.get(first).result)
+
+        summary = client.get('/api/metrics/p').get_json()
+        assert summary["runs"] == 1 and len(summary["results"]) == 1
+        result_id = summary["results"][0]["id"]
+        assert len(client.get(f'/api/results/{result_id}/history').get_json()["history"]) == 2
+    finally:
+        manager.shutdown()
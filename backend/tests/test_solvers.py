@@ -0,0 +1,114 @@
+import numpy as np
+import pytest
+import scipy.sparse as sp
+from backend.config import OptimizationConfig
+from backend.fem import FEMSolver
+from backend.mesh_utils import MeshHandler
+from backend.optimizer import TopologyOptimizer
+from backend.solvers import (
+    DirectSolver, JacobiPreconditioner, MultigridPreconditioner, PCGSolver,
+    check_singularity, cholmod_analyze, create_solver,
+)
+
+@pytest.fixture
+def block_system():
+    """Stiffness system of a solid 6x6x6 block fixed at the bottom and loaded on top."""
+    optimizer = TopologyOptimizer(OptimizationConfig())
+    voxels = np.ones((6, 6, 6), dtype=bool)
+    nodes, elements = MeshHandler.voxel_to_nodes_elements(voxels, 1.0)
+    KE = optimizer.fem_solver.compute_stiffness_matrix(1.0, 0.3)
+    K = optimizer.assemble_global_matrix(voxels.astype(float), nodes, elements, KE, 3.0)
+    F, free_dofs = optimizer._get_load_case(nodes)
+    return nodes, K, F, free_dofs
+
+@pytest.mark.parametrize("preconditioner", ["jacobi", "multigrid"])
+def test_pcg_matches_direct_solver(block_system, preconditioner):
+    """PCG with either preconditioner should reproduce the direct solution."""
+    nodes, K, F, free_dofs = block_system
+    U_direct = FEMSolver.solve_system(K, F, free_dofs, solver=DirectSolver())
+
+    if preconditioner == "multigrid":
+        pre = MultigridPreconditioner(nodes, free_dofs, coarse_size=100)
+        assert len(pre.prolongations) >= 1
+    else:
+        pre = JacobiPreconditioner()
+    solver = PCGSolver(pre, tol=1e-10, max_iter=2000)
+    U = FEMSolver.solve_system(K, F, free_dofs, solver=solver)
+
+    assert 0 < solver.last_iterations < 2000
+    assert np.allclose(U, U_direct, atol=1e-8 * np.abs(U_direct).max())
+
+def test_check_singularity_detects_unconstrained_dofs():
+    """A DOF with no stiffness should be reported without forming a dense matrix."""
+    K = sp.diags([1.0, 2.0, 0.0]).tocsr()
+    with pytest.raises(ValueError, match="singular"):
+        check_singularity(K)
+    check_singularity(sp.diags([1.0, 2.0, 3.0]).tocsr())
+
+def test_create_solver_from_config(block_system):
+    """The config selects the solver backend."""
+    nodes, _, _, free_dofs = block_system
+    assert isinstance(create_solver(OptimizationConfig(solver="direct")), DirectSolver)
+    solver = create_solver(OptimizationConfig(solver="pcg", preconditioner="multigrid"), nodes, free_dofs)
+    assert isinstance(solver.preconditioner, MultigridPreconditioner)
+    auto = create_solver(OptimizationConfig(solver="auto", direct_solver_max_dofs=10), nodes, free_dofs)
+    assert isinstance(auto, PCGSolver)
+
+def test_direct_solver_refactorization(block_system):
+    """Refactorizing the same pattern gives the same solution; only CHOLMOD reuses its analysis."""
+    _, K, F, free_dofs = block_system
+    solver = DirectSolver()
+    U_first = FEMSolver.solve_system(K, F, free_dofs, solver=solver)
+    assert not solver.last_reused
+    U_second = FEMSolver.solve_system(K * 2.0, F, free_dofs, solver=solver)
+    assert solver.last_reused == (cholmod_analyze is not None)
+    assert np.allclose(U_second, U_first / 2.0)
+
+def test_pcg_warm_start_and_preconditioner_reuse(block_system):
+    """PCG restarts from the previous solution and keeps the preconditioner for small changes."""
+    _, K, F, free_dofs = block_system
+    solver = PCGSolver(JacobiPreconditioner(), tol=1e-8, max_iter=2000, reuse_tol=0.1)
+    FEMSolver.solve_system(K, F, free_dofs, solver=solver)
+    cold_iterations = solver.last_iterations
+    assert not solver.last_reused
+
+    solver.notify_density_change(0.05)
+    FEMSolver.solve_system(K, F, free_dofs, solver=solver)
+    assert solver.last_reused
+    assert solver.last_iterations < cold_iterations
+
+    solver.notify_density_change(0.2)
+    FEMSolver.solve_system(K, F, free_dofs, solver=solver)
+    assert not solver.last_reused
+
+def test_multigrid_on_thin_shell():
+    """Multigrid stays well-posed on one-voxel-thick parts where coarse bases coincide."""
+    optimizer = TopologyOptimizer(OptimizationConfig())
+    voxels = np.zeros((12, 12, 12), dtype=bool)
+    voxels[[0, -1], :, :] = voxels[:, [0, -1], :] = voxels[:, :, [0, -1]] = True
+    nodes, elements = MeshHandler.voxel_to_nodes_elements(voxels, 1.0)
+    KE = optimizer.fem_solver.compute_stiffness_matrix(1.0, 0.3)
+    K = optimizer.assemble_global_matrix(voxels.astype(float), nodes, elements, KE, 3.0)
+    F, free_dofs = optimizer._get_load_case(nodes)
+
+    U_direct = FEMSolver.solve_system(K, F, free_dofs, solver=DirectSolver())
+    solver = PCGSolver(MultigridPreconditioner(nodes, free_dofs, coarse_size=100), tol=1e-10, max_iter=2000)
+    U = FEMSolver.solve_system(K, F, free_dofs, solver=solver)
+    assert U is not None
+    assert np.allclose(U, U_direct, atol=1e-8 * np.abs(U_direct).max())
+
+
+@pytest.mark.parametrize("preconditioner", ["jacobi", "multigrid"])
+def test_block_pcg_matches_direct_per_column(block_system, preconditioner):
+    """A block of right-hand sides is solved in one PCG pass, including an all-zero column."""
+    nodes, K, F, free_dofs = block_system
+    F_block = np.column_stack([F, np.roll(F, 1), np.zeros_like(F)])
+    U_direct = FEMSolver.solve_system(K, F_block, free_dofs, solver=DirectSolver())
+
+    pre = MultigridPreconditioner(nodes, free_dofs, coarse_size=100) if preconditioner == "multigrid" else JacobiPreconditioner()
+    solver = PCGSolver(pre, tol=1e-10, max_iter=2000)
+    U = FEMSolver.solve_system(K, F_block, free_dofs, solver=solver)
+
+    assert U.shape == F_block.shape
+    assert np.allclose(U, U_direct, atol=1e-8 * np.abs(U_direct).max())
+    assert not np.any(U[:, 2])
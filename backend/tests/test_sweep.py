@@ -0,0 +1,95 @@
+import io
+import threading
+import zlib
+
+import numpy as np
+import pytest
+from flask import Flask
+from backend.config import OptimizationConfig
+from backend.optimizer import TopologyOptimizer
+from backend.results import ResultStore
+from backend.jobs import JobManager, create_jobs_blueprint
+from backend.sweep import SweepCancelled, check_sweep_configs, expand_sweep, run_sweep
+from backend.sweep_api import create_sweep_blueprint
+
+
+@pytest.fixture
+def box_extents():
+    return (8, 5, 4)
+
+
+def test_expand_sweep_combines_grid_and_variants():
+    configs = expand_sweep(OptimizationConfig(max_iter=3), {"volfrac": [0.3, 0.5], "penal": [2.0, 3.0]},
+                           [{"rmin": 1.5}, {"rmin": 2.0}])
+    assert len(configs) == 8 and all(config.max_iter == 3 for config in configs)
+    assert {(c.volfrac, c.penal, c.rmin) for c in configs} == {
+        (v, p, r) for v in (0.3, 0.5) for p in (2.0, 3.0) for r in (1.5, 2.0)}
+    with pytest.raises(ValueError, match="voxel_size"):
+        check_sweep_configs(expand_sweep(grid={"voxel_size": [1.0, 0.5]}))
+    with pytest.raises(TypeError):
+        expand_sweep(grid={"not_a_field": [1]})
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_sweep_matches_independent_runs(stl_file, tmp_path, workers):
+    configs = expand_sweep(OptimizationConfig(max_iter=3, filter_type="density"),
+                           {"volfrac": [0.3, 0.5], "rmin": [1.5, 2.0]})
+    store = ResultStore(str(tmp_path / "projects.db"))
+    sweep = run_sweep(stl_file, configs, workers=workers, return_results=True, result_store=store)
+
+    for config, row, result in zip(configs, sweep["rows"], sweep["results"]):
+        optimizer = TopologyOptimizer(config)
+        assert np.array_equal(result, optimizer.optimize(stl_file))
+        assert row["error"] is None and not row["cached"]
+        assert row["params"] == {"volfrac": config.volfrac, "rmin": config.rmin}
+        assert row["compliance"] == pytest.approx(optimizer.compliance) and row["iterations"] == 3
+
+    again = run_sweep(stl_file, configs, workers=workers, result_store=store)
+    assert all(row["cached"] for row in again["rows"]) and again["prepare_time"] == 0.0
+    assert again["results"] is None
+
+
+def test_sweep_endpoint(stl_file):
+    manager = JobManager(max_workers=1, sweep_workers=1)
+    app = Flask(__name__)
+    app.register_blueprint(create_sweep_blueprint(manager, max_variants=4))
+    app.register_blueprint(create_jobs_blueprint(manager))
+    client = app.test_client()
+    try:
+        request = {"stl_path": stl_file, "config": {"max_iter": 2}, "grid": {"penal": [2.0, 3.0]}, "workers": 8}
+        response = client.post('/api/sweeps', json=dict(request, return_results=True))
+        assert response.status_code == 202 and response.get_json()["variants"] == 2
+        job_id = response.get_json()["job_id"]
+        assert manager.wait(job_id, timeout=300).status == "completed"
+
+        data = client.get(f'/api/sweeps/{job_id}').get_json()
+        assert [row["params"] for row in data["rows"]] == [{"penal": 2.0}, {"penal": 3.0}]
+        assert data["results"] == [f"/api/sweeps/{job_id}/results/{index}" for index in range(2)]
+        result = client.get(data["results"][0] + "?format=zlib")
+        assert result.headers["X-Grid-Shape"] == "9,5,5"
+        assert np.load(io.BytesIO(zlib.decompress(result.data))).shape == (9, 5, 5)
+        assert client.get(f'/api/sweeps/{job_id}/results/2').status_code == 404
+        events = client.get(f'/api/jobs/{job_id}/events').get_data(as_text=True)
+        assert events.count("event: row") == 2 and "event: completed" in events
+
+        assert client.get('/api/sweeps/unknown').status_code == 404
+        assert client.post('/api/sweeps', json=dict(request, grid={"penal": [1, 2, 3, 4, 5]})).status_code == 400
+        assert client.post('/api/sweeps', json=dict(request, grid={"voxel_size": [1.0, 2.0]})).status_code == 400
+        assert client.post('/api/sweeps', json=dict(request, config={"bogus": 1})).status_code == 400
+        assert client.post('/api/sweeps', json=dict(request, grid={"filter_type": ["density", "densty"]})).status_code == 400
+    finally:
+        manager.shutdown()
+
+
+def test_sweep_stops_when_cancelled(stl_file):
+    cancel_event = threading.Event()
+    rows = []
+
+    def on_row(row):
+        rows.append(row)
+        cancel_event.set()
+
+    with pytest.raises(SweepCancelled):
+        run_sweep(stl_file, expand_sweep(OptimizationConfig(max_iter=2), {"penal": [2.0, 3.0, 4.0]}), workers=1,
+                  on_row=on_row, cancel_event=cancel_event)
+    assert len(rows) == 1
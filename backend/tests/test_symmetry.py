@@ -0,0 +1,62 @@
+import numpy as np
+import pytest
+import trimesh
+from backend.config import OptimizationConfig
+from backend.loads import LoadCase, symmetry_axes
+from backend.optimizer import TopologyOptimizer
+from backend.symmetry import SymmetryReduction, find_symmetry
+
+
+@pytest.mark.parametrize("shape", [(6, 5, 3), (7, 4, 2)])
+def test_reduce_expand_round_trip(shape):
+    mask = np.ones(shape, dtype=bool)
+    reduction = SymmetryReduction(mask, (0, 1, 2), 1.0)
+    assert reduction.shape == tuple((n + 1) // 2 for n in shape)
+
+    field = reduction.expand(np.random.default_rng(0).uniform(size=reduction.shape))
+    assert field.shape == shape
+    for axis in range(3):
+        assert np.array_equal(field, np.flip(field, axis))
+    assert np.array_equal(reduction.expand(reduction.reduce(field)), field)
+
+    # Half weights on odd middle layers make the reduced volume a copies-th of the full one
+    weights = reduction.volume_weights()
+    assert np.sum(weights * reduction.reduce(field)) == pytest.approx(field.sum() / reduction.copies)
+
+
+def test_symmetry_setting():
+    assert symmetry_axes(None) == () and symmetry_axes("auto") == (0, 1, 2)
+    assert symmetry_axes(["y", "x", "y"]) == (0, 1)
+    with pytest.raises(ValueError, match="symmetry axis"):
+        symmetry_axes(["w"])
+
+    assert LoadCase().is_symmetric(0) and not LoadCase().is_symmetric(2)
+    bridge = LoadCase(fixed=["xmin", "xmax"], loaded="zmax")
+    assert bridge.is_symmetric(0) and bridge.is_symmetric(1)
+    assert find_symmetry(np.ones((4, 4, 4), dtype=bool), 1.0, "auto",
+                         [{"fixed": ["xmin"], "loaded": "xmax", "force": [0, 0, -1]}]).axis_names() == ["y"]
+
+
+@pytest.mark.parametrize("extents,translate,solver", [
+    ((16, 10, 8), False, "direct"),
+    ((15, 9, 6), True, "pcg"),
+])
+def test_symmetric_run_matches_full_run(tmp_path, extents, translate, solver):
+    box = trimesh.creation.box(extents=extents)
+    if translate:
+        box.apply_translation(np.asarray(extents) / 2)
+    stl = str(tmp_path / "box.stl")
+    box.export(stl)
+
+    def run(symmetry):
+        optimizer = TopologyOptimizer(OptimizationConfig(
+            voxel_size=1.0, max_iter=3, solver=solver, symmetry=symmetry, filter_type="density", rmin=1.5))
+        return optimizer.optimize(stl), optimizer
+
+    full, full_optimizer = run(None)
+    reduced, reduced_optimizer = run("auto")
+    assert reduced_optimizer.metrics.to_dict()["counters"]["symmetry_axes"] == ["x", "y"]
+    assert reduced.shape == full.shape
+    assert np.allclose(reduced, full, atol=1e-6)
+    assert np.allclose(reduced_optimizer.compliance_history, full_optimizer.compliance_history, rtol=1e-6)
+    assert reduced_optimizer.metrics.to_dict()["counters"]["dofs"] < full_optimizer.metrics.to_dict()["counters"]["dofs"] / 3
@@ -0,0 +1,59 @@
+import io
+import zlib
+import numpy as np
+import pytest
+import trimesh
+from flask import Flask, request
+from backend.transport import iso_surface_stl, pack_mask, result_response, unpack_mask
+
+GRID = np.random.default_rng(5).uniform(0.0, 1.0, (6, 5, 4))
+
+@pytest.fixture
+def client():
+    app = Flask(__name__)
+
+    @app.route('/result')
+    def result():
+        return result_response(GRID, request)
+
+    return app.test_client()
+
+def test_json_is_default(client):
+    response = client.get('/result')
+    assert response.mimetype == "application/json"
+    assert np.allclose(response.get_json()["result"], GRID)
+
+@pytest.mark.parametrize("dtype", ["float32", "float16"])
+def test_npy_format(client, dtype):
+    response = client.get(f'/result?format=npy&dtype={dtype}')
+    grid = np.load(io.BytesIO(response.data))
+    assert grid.dtype == np.dtype(dtype)
+    assert np.allclose(grid, GRID, atol=1e-3)
+    assert response.headers["X-Grid-Shape"] == "6,5,4"
+
+def test_accept_header_and_streamed_zlib(client):
+    response = client.get('/result?stream=1', headers={"Accept": "application/x-npy+zlib"})
+    assert response.mimetype == "application/x-npy+zlib"
+    grid = np.load(io.BytesIO(zlib.decompress(response.data)))
+    assert np.allclose(grid, GRID.astype(np.float32))
+
+def test_bit_packed_mask(client):
+    response = client.get('/result?format=mask&threshold=0.3')
+    assert len(response.data) == (GRID.size + 7) // 8
+    assert np.array_equal(unpack_mask(response.data, GRID.shape), GRID >= 0.3)
+    assert np.array_equal(unpack_mask(pack_mask(GRID), GRID.shape), GRID >= 0.5)
+
+def test_unknown_format_is_rejected(client):
+    assert client.get('/result?format=xml').status_code == 406
+
+def test_invalid_threshold_is_rejected(client):
+    for threshold in ("abc", "nan"):
+        response = client.get(f'/result?format=mask&threshold={threshold}')
+        assert response.status_code == 400 and "threshold" in response.get_json()["error"]
+
+def test_iso_surface_stl_is_closed_geometry():
+    grid = np.zeros((6, 6, 6))
+    grid[1:5, 1:5, 1:5] = 1.0
+    mesh = trimesh.load(io.BytesIO(iso_surface_stl(grid, voxel_size=2.0)), file_type="stl")
+    assert mesh.is_watertight
+    assert np.allclose(mesh.bounds, [[2.0, 2.0, 2.0], [8.0, 8.0, 8.0]], atol=1.0)
@@ -0,0 +1,58 @@
+import numpy as np
+import pytest
+from backend.update import OCUpdater
+
+def reference_oc(dc, densities, volfrac, move=0.2):
+    """The original bisection-based OC update."""
+    l1, l2 = 0, 1e9
+    target_vol = volfrac * densities.size
+    while (l2 - l1) > 1e-4:
+        lmid = 0.5 * (l2 + l1)
+        new_densities = np.maximum(0.001, np.maximum(
+            densities - move,
+            np.minimum(1.0, np.minimum(densities + move, densities * np.sqrt(np.maximum(0, -dc / lmid))))
+        ))
+        if np.sum(new_densities) - target_vol > 0:
+            l1 = lmid
+        else:
+            l2 = lmid
+    return new_densities
+
+@pytest.fixture
+def design():
+    rng = np.random.default_rng(4)
+    densities = rng.uniform(0.001, 1.0, (12, 10, 8))
+    dc = -rng.uniform(0.0, 1.0, densities.shape) ** 3
+    return densities, dc
+
+def test_oc_update_matches_bisection(design):
+    """The update engine matches the bisection reference with far fewer volume evaluations."""
+    densities, dc = design
+    updater = OCUpdater(densities.shape, 0.4)
+    new_densities = updater.update(dc, densities)
+    assert np.allclose(new_densities, reference_oc(dc, densities, 0.4), atol=1e-3)
+    assert new_densities.sum() == pytest.approx(0.4 * densities.size, rel=1e-5)
+    assert updater.evaluations < 20
+
+def test_oc_update_respects_move_limit_and_mask(design):
+    """Passive voxels keep their value and design voxels move at most `move`."""
+    densities, dc = design
+    mask = np.zeros(densities.shape, dtype=bool)
+    mask[:6] = True
+    densities[~mask] = 0.0
+    updater = OCUpdater(densities.shape, 0.45, move=0.1, design_mask=mask)
+    new_densities = updater.update(dc, densities)
+
+    assert np.all(new_densities[~mask] == 0.0)
+    assert np.max(np.abs(new_densities - densities)[mask]) <= 0.1 + 1e-12
+    assert new_densities[mask].sum() == pytest.approx(0.45 * mask.sum(), rel=1e-5)
+
+def test_oc_update_warm_starts_multiplier(design):
+    """A second update with similar sensitivities starts from the previous multiplier."""
+    densities, dc = design
+    updater = OCUpdater(densities.shape, 0.4)
+    updater.update(dc, densities)
+    first = updater.lmid
+    updater.update(dc * 1.01, densities)
+    assert updater.lmid == pytest.approx(first * 1.01, rel=1e-3)
+    assert updater.evaluations <= 6
@@ -0,0 +1,80 @@
+import numpy as np
+import pytest
+import trimesh
+from backend.mesh_utils import MeshHandler
+from backend.stl import STL_TRIANGLE, binary_stl_count, measure_binary_stl, read_binary_stl
+from backend.voxelize import voxelize_stl
+
+MESHES = {
+    "box": lambda: trimesh.creation.box(extents=(6, 4, 3)),
+    "sphere": lambda: trimesh.creation.icosphere(radius=5, subdivisions=3).apply_translation((0.3, -0.2, 0.1)),
+    "torus": lambda: trimesh.creation.torus(major_radius=6, minor_radius=1.5),
+}
+
+
+def export(mesh, path, **kwargs):
+    mesh.export(str(path), **kwargs)
+    return str(path)
+
+
+def test_read_binary_stl(tmp_path):
+    mesh = MESHES["box"]()
+    path = export(mesh, tmp_path / "box.stl")
+    triangles = read_binary_stl(path)
+    assert binary_stl_count(path) == len(mesh.faces)
+    assert np.allclose(triangles["vertices"], mesh.triangles)
+
+
+@pytest.mark.parametrize("name", sorted(MESHES))
+def test_measure_binary_stl(tmp_path, name):
+    path = export(MESHES[name](), tmp_path / f"{name}.stl")
+    mesh = trimesh.load(path)
+    bounds, area = measure_binary_stl(path)
+    assert np.allclose(bounds, mesh.bounds) and area == pytest.approx(mesh.area, rel=1e-6)
+    assert measure_binary_stl(export(MESHES[name](), tmp_path / f"{name}-ascii.stl", file_type="stl_ascii")) is None
+
+
+@pytest.mark.parametrize("name", sorted(MESHES))
+@pytest.mark.parametrize("pitch", [0.5, 1.0, 1.7])
+def test_matches_trimesh(tmp_path, name, pitch):
+    path = export(MESHES[name](), tmp_path / f"{name}.stl")
+    expected = trimesh.load(path).voxelized(pitch).matrix
+    assert np.array_equal(voxelize_stl(path, pitch, workers=1), expected)
+
+
+def test_merged_vertices_match_trimesh(tmp_path):
+    """trimesh merges vertices equal to 8 decimals on load, which can move one into the next voxel."""
+    pitch = 0.02
+    # Neighbouring float32 values around the voxel boundary at 0.01 that share a merge key
+    values = [np.float32(0.01)]
+    for _ in range(8):
+        values = [np.nextafter(values[0], np.float32(0))] + values + [np.nextafter(values[-1], np.float32(1))]
+    lo, hi = next((u, w) for u in values for w in values
+                  if u < w and round(float(u) * 1e8) == round(float(w) * 1e8)
+                  and round(float(u) / pitch) != round(float(w) / pitch))
+
+    for first, second in ((hi, lo), (lo, hi)):
+        triangles = np.zeros(2, dtype=STL_TRIANGLE)
+        triangles["vertices"][0] = [[first, 0.3, 0.3], [0.05, 0.3, 0.3], [0.05, 0.32, 0.3]]
+        triangles["vertices"][1] = [[second, 0.3, 0.3], [0.011, 0.33, 0.3], [0.05, 0.33, 0.31]]
+        path = tmp_path / "pair.stl"
+        path.write_bytes(bytes(80) + np.uint32(2).tobytes() + triangles.tobytes())
+        expected = trimesh.load(str(path)).voxelized(pitch).matrix
+        assert np.array_equal(voxelize_stl(str(path), pitch, workers=1), expected)
+
+
+def test_parallel_slabs_match_serial(tmp_path):
+    path = export(MESHES["torus"](), tmp_path / "torus.stl")
+    serial = voxelize_stl(path, 0.5, workers=1)
+    parallel = voxelize_stl(path, 0.5, workers=2, parallel_min_triangles=0)
+    assert np.array_equal(parallel, serial)
+
+
+def test_ascii_stl_falls_back_to_trimesh(tmp_path, mocker):
+    path = export(MESHES["box"](), tmp_path / "box.stl", file_type="stl_ascii")
+    assert voxelize_stl(path, 1.0) is None
+
+    voxelized = mocker.spy(trimesh.Trimesh, "voxelized")
+    voxels, nodes, elements = MeshHandler.load_and_voxelize(path, 1.0)
+    assert voxelized.call_count == 1
+    assert np.array_equal(voxels, trimesh.load(path).voxelized(1.0).matrix)
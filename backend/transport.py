@@ -0,0 +1,177 @@
+"""
+Result transport formats for density grids.
+Encodes optimization results as JSON, raw or compressed .npy buffers, bit-packed occupancy
+masks, or a binary STL iso-surface, selected by query parameter or Accept header.
+"""
+
+import io
+import zlib
+
+import numpy as np
+
+try:
+    import lz4.frame as lz4_frame
+except ImportError:  # lz4 is optional
+    lz4_frame = None
+
+from .stl import STL_TRIANGLE
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Result format name -> MIME type used for content negotiation
+FORMATS = {
+    "json": "application/json",
+    "npy": "application/x-npy",
+    "zlib": "application/x-npy+zlib",
+    "lz4": "application/x-npy+lz4",
+    "mask": "application/x-occupancy-mask",
+    "stl": "model/stl",
+}
+DTYPES = {"float32": np.float32, "float16": np.float16}
+
+
+
+class UnsupportedFormatError(ValueError):
+    pass
+
+
+def npy_chunks(grid, dtype=np.float32):
+    """Yield a .npy file for the grid: the header, then one x-slab at a time."""
+    grid = np.asarray(grid)
+    header = io.BytesIO()
+    np.lib.format.write_array_header_1_0(header, {
+        "descr": np.lib.format.dtype_to_descr(np.dtype(dtype)),
+        "fortran_order": False,
+        "shape": grid.shape,
+    })
+    yield header.getvalue()
+    for slab in grid.reshape(grid.shape[0], -1) if grid.ndim > 1 else [grid]:
+        yield np.ascontiguousarray(slab, dtype=dtype).tobytes()
+
+
+def compress_chunks(chunks, codec):
+    """Compress a stream of chunks with zlib or LZ4 frames."""
+    if codec == "zlib":
+        compressor = zlib.compressobj(6)
+        for chunk in chunks:
+            data = compressor.compress(chunk)
+            if data:
+                yield data
+        yield compressor.flush()
+    elif codec == "lz4":
+        if lz4_frame is None:
+            raise UnsupportedFormatError("LZ4 compression requires the 'lz4' package")
+        compressor = lz4_frame.LZ4FrameCompressor()
+        yield compressor.begin()
+        for chunk in chunks:
+            yield compressor.compress(chunk)
+        yield compressor.flush()
+    else:
+        raise UnsupportedFormatError(f"Unknown codec: {codec}")
+
+
+def pack_mask(grid, threshold=0.5):
+    """Bit-packed occupancy mask (C order, 1 bit per voxel) of grid >= threshold."""
+    return np.packbits(np.asarray(grid) >= threshold, axis=None).tobytes()
+
+
+def unpack_mask(data, shape):
+    """Inverse of pack_mask."""
+    bits = np.unpackbits(np.frombuffer(data, dtype=np.uint8), count=int(np.prod(shape)))
+    return bits.reshape(shape).astype(bool)
+
+
+def iso_surface_stl(grid, threshold=0.5, voxel_size=1.0, origin=None):
+    """
+    Binary STL of the grid's iso-surface at the threshold density, with voxel (i, j, k)
+    centred at origin + voxel_size * (i, j, k) (origin defaults to zero).
+    """
+    from skimage.measure import marching_cubes
+
+    grid = np.asarray(grid, dtype=np.float32)
+    if not np.any(grid >= threshold):
+        triangles = np.zeros(0, dtype=STL_TRIANGLE)
+    else:
+        # Pad with void so the surface is closed at the grid boundary
+        vertices, faces, _, _ = marching_cubes(np.pad(grid, 1), level=threshold, spacing=(voxel_size,) * 3)
+        vertices -= voxel_size
+        if origin is not None:
+            vertices += np.asarray(origin, dtype=vertices.dtype)
+        corners = vertices[faces]
+        normals = np.cross(corners[:, 1] - corners[:, 0], corners[:, 2] - corners[:, 0])
+        lengths = np.linalg.norm(normals, axis=1, keepdims=True)
+        triangles = np.zeros(len(faces), dtype=STL_TRIANGLE)
+        triangles["normal"] = np.divide(normals, lengths, out=np.zeros_like(normals), where=lengths > 0)
+        triangles["vertices"] = corners
+
+    header = b"3D Printer Optimizer iso-surface".ljust(80, b"\0")
+    return header + np.uint32(len(triangles)).tobytes() + triangles.tobytes()
+
+
+def negotiate_format(req):
+    """Result format from the 'format' query parameter, else from the Accept header."""
+    name = req.args.get("format")
+    if name is None:
+        mimetype = req.accept_mimetypes.best_match(list(FORMATS.values()), default=FORMATS["json"])
+        name = next(key for key, value in FORMATS.items() if value == mimetype)
+    if name not in FORMATS:
+        raise UnsupportedFormatError(f"Unknown result format: {name}")
+    return name
+
+
+def parse_threshold(req, default=0.5):
+    """The ?threshold= density of mask and STL results; ValueError unless a finite number."""
+    value = req.args.get("threshold", default)
+    try:
+        threshold = float(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"Invalid threshold: {value!r}")
+    if not np.isfinite(threshold):
+        raise ValueError(f"Invalid threshold: {value!r}")
+    return threshold
+
+
+def result_response(result, req, voxel_size=1.0, origin=None):
+    """
+    Flask response for a density grid in the negotiated format; STL results are placed with
+    the grid's voxel size and origin.
+    Query parameters: format, dtype (float32/float16), threshold (mask/stl) and
+    stream (send binary formats as a chunked response).
+    """
+    # Flask is only needed by the servers; the CLI writes results without it
+    from flask import Response, jsonify
+
+    try:
+        name = negotiate_format(req)
+        if name == "json":
+            return jsonify({"success": True, "result": np.asarray(result).tolist()}), 200
+
+        if name == "lz4" and lz4_frame is None:
+            raise UnsupportedFormatError("LZ4 compression requires the 'lz4' package")
+        grid = np.asarray(result)
+        dtype_name = req.args.get("dtype", "float32")
+        if dtype_name not in DTYPES:
+            raise UnsupportedFormatError(f"Unsupported dtype: {dtype_name}")
+        threshold = parse_threshold(req)
+        stream = req.args.get("stream", "false").lower() in ("1", "true", "yes")
+        headers = {"X-Grid-Shape": ",".join(map(str, grid.shape)), "X-Grid-Dtype": dtype_name}
+
+        if name == "mask":
+            chunks = [pack_mask(grid, threshold)]
+            headers["X-Grid-Dtype"] = "bool"
+        elif name == "stl":
+            chunks = [iso_surface_stl(grid, threshold, voxel_size, origin)]
+            headers["Content-Disposition"] = "attachment; filename=result.stl"
+        else:
+            chunks = npy_chunks(grid, DTYPES[dtype_name])
+            if name in ("zlib", "lz4"):
+                chunks = compress_chunks(chunks, name)
+
+        if stream:
+            return Response(chunks, mimetype=FORMATS[name], headers=headers), 200
+        return Response(b"".join(chunks), mimetype=FORMATS[name], headers=headers), 200
+    except UnsupportedFormatError as e:
+        return jsonify({"error": str(e)}), 406
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
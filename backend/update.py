@@ -0,0 +1,151 @@
+"""
+Optimality-criteria (OC) density update for topology optimization.
+Works on preallocated buffers with in-place ufuncs and finds the Lagrange multiplier
+with a bracketed Illinois (regula falsi) search started from the previous multiplier.
+"""
+
+import numpy as np
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class OCUpdater:
+    """
+    OC update x_new = clip(x * sqrt(-dc / lambda), max(min_density, x - move), min(1, x + move))
+    with lambda chosen so that the design volume equals volfrac times the number of design voxels.
+    Voxels outside design_mask are passive and keep their value. With volume_weights (a grid)
+    each voxel counts with its weight in the volume. Buffers and the returned grid are of dtype.
+    With volume_sensitivities dv (a grid), the candidate is x * sqrt(-dc / (dv * lambda)) as in
+    top88: with a density filter, the volume of the filtered field is the volume weighted by
+    its chain rule H^T (1 / Hs), passed as both volume_weights and dv.
+    """
+
+    def __init__(self, shape, volfrac, move=0.2, min_density=0.001, design_mask=None,
+                 vol_tol=1e-6, max_evaluations=100, dtype=np.float64, volume_weights=None,
+                 volume_sensitivities=None):
+        self.shape = tuple(shape)
+        self.dtype = np.dtype(dtype)
+        # Multiplier range whose OC scale 1 / sqrt(lambda) stays finite in dtype
+        self._lam_range = (float(np.finfo(self.dtype).tiny), float(np.finfo(self.dtype).max))
+        self.move = move
+        self.min_density = min_density
+        self.vol_tol = vol_tol
+        self.max_evaluations = max_evaluations
+        self.index = None if design_mask is None else np.flatnonzero(design_mask)
+        n = int(np.prod(self.shape)) if self.index is None else len(self.index)
+        self._weights = None
+        if volume_weights is not None:
+            weights = np.asarray(volume_weights, dtype=np.float64).reshape(-1)
+            self._weights = weights if self.index is None else weights[self.index]
+        self.target = volfrac * (n if self._weights is None else float(self._weights.sum()))
+        self._dv = None
+        if volume_sensitivities is not None:
+            dv = np.asarray(volume_sensitivities, dtype=self.dtype).reshape(-1)
+            self._dv = dv if self.index is None else dv[self.index]
+        self.lmid = None
+        self.evaluations = 0
+        self._evaluated = None
+
+        self._x = np.empty(n, dtype=self.dtype)
+        self._b = np.empty(n, dtype=self.dtype)
+        self._lower = np.empty(n, dtype=self.dtype)
+        self._upper = np.empty(n, dtype=self.dtype)
+        self._trial = np.empty(n, dtype=self.dtype)
+
+    def update(self, dc, densities):
+        """Return the updated density grid for the sensitivities dc."""
+        x, b, lower, upper = self._x, self._b, self._lower, self._upper
+        if self.index is None:
+            np.copyto(x, densities.reshape(-1))
+            np.copyto(b, dc.reshape(-1))
+        else:
+            np.take(densities.reshape(-1), self.index, out=x)
+            np.take(dc.reshape(-1), self.index, out=b)
+
+        # b = x * sqrt(max(0, -dc) / dv), so that the OC candidate is b / sqrt(lambda)
+        np.negative(b, out=b)
+        np.maximum(b, 0.0, out=b)
+        if self._dv is not None:
+            np.divide(b, self._dv, out=b)
+        np.sqrt(b, out=b)
+        np.multiply(b, x, out=b)
+        np.subtract(x, self.move, out=lower)
+        np.maximum(lower, self.min_density, out=lower)
+        np.add(x, self.move, out=upper)
+        np.minimum(upper, 1.0, out=upper)
+
+        self.evaluations = 0
+        if self._volume(lower) >= self.target:
+            np.copyto(self._trial, lower)
+        elif self._volume(upper) <= self.target:
+            np.copyto(self._trial, upper)
+        else:
+            self.lmid = self._search()
+            if self._evaluated != self.lmid:
+                self._volume_excess(self.lmid)
+        logger.debug(f"OC update: lambda = {self.lmid}, {self.evaluations} volume evaluations")
+
+        new_densities = np.array(densities, dtype=self.dtype)
+        if self.index is None:
+            new_densities.reshape(-1)[:] = self._trial
+        else:
+            new_densities.reshape(-1)[self.index] = self._trial
+        return new_densities
+
+    def _volume(self, x):
+        return float(x.sum(dtype=np.float64)) if self._weights is None else float(x @ self._weights)
+
+    def _volume_excess(self, lam):
+        """Volume of the OC candidate for multiplier lam, minus the target volume."""
+        self.evaluations += 1
+        self._evaluated = lam
+        np.multiply(self._b, 1.0 / np.sqrt(min(max(lam, self._lam_range[0]), self._lam_range[1])), out=self._trial)
+        np.maximum(self._trial, self._lower, out=self._trial)
+        np.minimum(self._trial, self._upper, out=self._trial)
+        return self._volume(self._trial) - self.target
+
+    def _search(self):
+        """Find lambda with zero volume excess; the excess decreases monotonically in lambda."""
+        lam = self.lmid
+        if lam is None:
+            lam = max((self._volume(self._b) / self.target) ** 2, 1e-30)
+        g = self._volume_excess(lam)
+        if abs(g) <= self.vol_tol * self.target:
+            return lam
+
+        # Bracket the root in log(lambda), expanding geometrically from the previous lambda
+        step = np.log(2.0)
+        a, fa, c, fc = np.log(lam), g, np.log(lam), g
+        while (fa > 0) == (fc > 0) and self.evaluations < self.max_evaluations:
+            c += step if fa > 0 else -step
+            fc = self._volume_excess(float(np.exp(c)))
+            step *= 2.0
+            if (fa > 0) == (fc > 0):
+                a, fa = c, fc
+        if fa > 0:
+            lo, flo, hi, fhi = a, fa, c, fc
+        else:
+            lo, flo, hi, fhi = c, fc, a, fa
+
+        # Illinois regula falsi between lo (excess > 0) and hi (excess <= 0)
+        side = 0
+        mid = hi
+        while self.evaluations < self.max_evaluations:
+            mid = hi - fhi * (hi - lo) / (fhi - flo)
+            fmid = self._volume_excess(float(np.exp(mid)))
+            if abs(fmid) <= self.vol_tol * self.target or hi - lo <= 1e-12:
+                break
+            if fmid > 0:
+                lo, flo = mid, fmid
+                if side == 1:
+                    fhi /= 2.0
+                side = 1
+            else:
+                hi, fhi = mid, fmid
+                if side == -1:
+                    flo /= 2.0
+                side = -1
+        else:
+            logger.warning(f"OC multiplier search stopped after {self.evaluations} evaluations")
+        return float(np.exp(mid))
@@ -0,0 +1,230 @@
+"""
+Surface voxelization of binary STL files.
+Reproduces trimesh's subdivision voxelization (Trimesh.voxelized) exactly without loading the
+mesh: triangles are streamed from the memory-mapped file, subdivided until every edge is
+shorter than half the voxel size, and the voxels nearest to their vertices are marked.
+Independent Z-slabs of the output grid are filled in parallel by a process pool.
+"""
+
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from .stl import binary_stl_count, read_binary_stl
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Triangles read from the file per chunk, and the most triangles subdivided at once
+CHUNK_TRIANGLES = 1 << 16
+MAX_ACTIVE_TRIANGLES = 1 << 18
+# Coordinates below this magnitude can be merged with a different float32 value by trimesh's
+# vertex merging (10^-8 resolution); all others only merge with identical values
+MERGE_BAND = 0.5
+MERGE_SCALE = 10 ** 8
+
+
+def _chunk_vertices(triangles, start, stop, replacements):
+    """Float64 (n, 3, 3) vertices of triangles [start, stop) with merged positions applied."""
+    tri = np.asarray(triangles["vertices"][start:stop], dtype=np.float64)
+    index, positions = replacements
+    if len(index):
+        lo, hi = np.searchsorted(index, [3 * start, 3 * stop])
+        if hi > lo:
+            tri.reshape(-1, 3)[index[lo:hi] - 3 * start] = positions[lo:hi]
+    return tri
+
+
+def _edge_lengths(tri):
+    """Lengths of edges (v0, v1), (v1, v2), (v2, v0), summed in the same order as trimesh."""
+    sq = (tri - np.roll(tri, -1, axis=1)) ** 2
+    return (sq[..., 0] + sq[..., 1] + sq[..., 2]) ** 0.5
+
+
+def _squared_distance(a, b):
+    sq = (a - b) ** 2
+    return sq[:, 0] + sq[:, 1] + sq[:, 2]
+
+
+def _split(tri, long_edge):
+    """
+    One round of trimesh.remesh.subdivide_to_size: every long edge is bisected and each
+    triangle is re-triangulated with the same template trimesh uses for its split count.
+    """
+    mid = (tri + np.roll(tri, -1, axis=1)) / 2
+    count = long_edge.sum(axis=1)
+    pieces = []
+
+    one = count == 1
+    if one.any():
+        t, m = tri[one], mid[one]
+        j = np.argmax(long_edge[one], axis=1)
+        r = np.arange(len(j))
+        a, b, c, p = t[r, j], t[r, (j + 1) % 3], t[r, (j + 2) % 3], m[r, j]
+        pieces += [np.stack((a, p, c), axis=1), np.stack((p, b, c), axis=1)]
+
+    two = count == 2
+    if two.any():
+        t, m = tri[two], mid[two]
+        j = (np.argmin(long_edge[two], axis=1) + 1) % 3
+        r = np.arange(len(j))
+        a, b, c = t[r, j], t[r, (j + 1) % 3], t[r, (j + 2) % 3]
+        p, q = m[r, j], m[r, (j + 1) % 3]
+        # The quad (a, p, q, c) is cut along its shorter diagonal
+        use_aq = (_squared_distance(a, q) <= _squared_distance(p, c))[:, None]
+        pieces += [
+            np.stack((p, b, q), axis=1),
+            np.where(use_aq[:, None], np.stack((a, p, q), axis=1), np.stack((a, p, c), axis=1)),
+            np.where(use_aq[:, None], np.stack((a, q, c), axis=1), np.stack((p, q, c), axis=1)),
+        ]
+
+    three = count == 3
+    if three.any():
+        t, m = tri[three], mid[three]
+        pieces += [
+            np.stack((t[:, 0], m[:, 0], m[:, 2]), axis=1),
+            np.stack((m[:, 0], t[:, 1], m[:, 1]), axis=1),
+            np.stack((m[:, 2], m[:, 1], t[:, 2]), axis=1),
+            np.stack((m[:, 0], m[:, 1], m[:, 2]), axis=1),
+        ]
+    return np.concatenate(pieces)
+
+
+def _mark_hits(grid, vertices, pitch, origin, z0):
+    """Mark the voxels nearest to the vertices in a grid slab starting at z index z0."""
+    hits = np.round(vertices.reshape(-1, 3) / pitch).astype(np.int64) - origin
+    hits[:, 2] -= z0
+    inside = (hits[:, 2] >= 0) & (hits[:, 2] < grid.shape[2])
+    hits = hits[inside]
+    grid[hits[:, 0], hits[:, 1], hits[:, 2]] = True
+
+
+def _voxelize_triangles(grid, tri, pitch, origin, z0, max_edge, max_iter):
+    """Subdivide triangles and mark the voxels of all resulting vertices."""
+    stack = [(tri, 0)]
+    while stack:
+        tri, round_ = stack.pop()
+        if len(tri) > MAX_ACTIVE_TRIANGLES:
+            stack += [(part, round_) for part in np.array_split(tri, -(-len(tri) // MAX_ACTIVE_TRIANGLES))]
+            continue
+        long_edge = _edge_lengths(tri) > max_edge
+        done = ~long_edge.any(axis=1)
+        # Vertices of finished triangles are vertices of the fully subdivided mesh
+        _mark_hits(grid, tri[done], pitch, origin, z0)
+        if done.all():
+            continue
+        if round_ >= max_iter:
+            raise ValueError("max_iter exceeded!")
+        stack.append((_split(tri[~done], long_edge[~done]), round_ + 1))
+
+
+def _fill_slab(grid, path, pitch, origin, z0, z1, replacements, max_edge, max_iter):
+    """Voxelize the triangles reaching z indices [z0, z1) into grid[:, :, z0:z1]."""
+    triangles = read_binary_stl(path)
+    for start in range(0, len(triangles), CHUNK_TRIANGLES):
+        tri = _chunk_vertices(triangles, start, start + CHUNK_TRIANGLES, replacements)
+        tri = tri[np.isfinite(tri).all(axis=(1, 2))]
+        z = np.round(tri[:, :, 2] / pitch).astype(np.int64) - origin[2]
+        tri = tri[(z.max(axis=1) >= z0) & (z.min(axis=1) < z1)]
+        if len(tri):
+            _voxelize_triangles(grid, tri, pitch, origin, z0, max_edge, max_iter)
+
+
+def _slab_worker(name, shape, path, pitch, origin, z0, z1, replacements, max_edge, max_iter):
+    """Process pool entry point: fill one Z-slab of the shared output grid."""
+    shm = shared_memory.SharedMemory(name=name)
+    try:
+        grid = np.ndarray(shape, dtype=bool, buffer=shm.buf)
+        _fill_slab(grid[:, :, z0:z1], path, pitch, origin, z0, z1, replacements, max_edge, max_iter)
+        del grid
+    finally:
+        shm.close()
+
+
+def _scan(triangles, pitch):
+    """
+    First pass over the file: the merged positions of vertices that trimesh's vertex merging
+    moves, the bounds of the voxel indices and the number of triangles starting at each z index.
+    """
+    band_index, band_positions = [], []
+    lower = np.full(3, np.iinfo(np.int64).max)
+    upper = np.full(3, np.iinfo(np.int64).min)
+    z_starts = []
+    for start in range(0, len(triangles), CHUNK_TRIANGLES):
+        tri = np.asarray(triangles["vertices"][start:start + CHUNK_TRIANGLES], dtype=np.float64)
+        finite = np.isfinite(tri).all(axis=(1, 2))
+        vertices = tri[finite].reshape(-1, 3)
+        index = (3 * (start + np.flatnonzero(finite))[:, None] + np.arange(3)).ravel()
+        band = (np.abs(vertices) < MERGE_BAND).any(axis=1)
+        band_index.append(index[band])
+        band_positions.append(vertices[band])
+        hits = np.round(vertices[~band] / pitch).astype(np.int64)
+        if len(hits):
+            lower = np.minimum(lower, hits.min(axis=0))
+            upper = np.maximum(upper, hits.max(axis=0))
+        z_starts.append(np.round(tri[finite, :, 2] / pitch).astype(np.int64).min(axis=1))
+
+    # trimesh merges vertices whose coordinates agree to 8 decimals into their first occurrence
+    index = np.concatenate(band_index)
+    positions = np.concatenate(band_positions)
+    if len(index):
+        keys = np.round(positions * MERGE_SCALE).astype(np.int64)
+        _, first, inverse = np.unique(keys, axis=0, return_index=True, return_inverse=True)
+        merged = positions[first[inverse.ravel()]]
+        hits = np.round(merged / pitch).astype(np.int64)
+        lower = np.minimum(lower, hits.min(axis=0))
+        upper = np.maximum(upper, hits.max(axis=0))
+        moved = (merged != positions).any(axis=1)
+        index, positions = index[moved], merged[moved]
+    return (index, positions), lower, upper, np.concatenate(z_starts)
+
+
+def _slab_bounds(z_starts, depth, slabs):
+    """Split [0, depth) into z ranges holding similar numbers of triangles."""
+    counts = np.cumsum(np.bincount(z_starts, minlength=depth)[:depth])
+    cuts = np.searchsorted(counts, counts[-1] * np.arange(1, slabs) / slabs)
+    bounds = np.unique(np.concatenate(([0], cuts, [depth])))
+    return list(zip(bounds[:-1], bounds[1:]))
+
+
+def voxelize_stl(path, pitch, workers=None, edge_factor=2.0, max_iter=10, parallel_min_triangles=200_000):
+    """
+    Surface voxel matrix of a binary STL, identical to trimesh.load(path).voxelized(pitch).matrix.
+    Returns None when the file is not a non-empty binary STL. Meshes with at least
+    parallel_min_triangles triangles are voxelized in Z-slabs by `workers` processes
+    (default: all CPUs).
+    """
+    if not binary_stl_count(path):
+        return None
+    triangles = read_binary_stl(path)
+    replacements, lower, upper, z_starts = _scan(triangles, pitch)
+    if not len(z_starts):
+        return None
+    shape = tuple(int(n) for n in upper - lower + 1)
+    max_edge = pitch / edge_factor
+
+    workers = workers or os.cpu_count() or 1
+    if workers <= 1 or len(triangles) < parallel_min_triangles:
+        grid = np.zeros(shape, dtype=bool)
+        _fill_slab(grid, path, pitch, lower, 0, shape[2], replacements, max_edge, max_iter)
+        return grid
+
+    slabs = _slab_bounds(z_starts - lower[2], shape[2], 2 * workers)
+    logger.info(f"Voxelizing {len(triangles)} triangles into {shape} in {len(slabs)} slabs on {workers} processes")
+    shm = shared_memory.SharedMemory(create=True, size=max(1, int(np.prod(shape))))
+    try:
+        np.ndarray(shape, dtype=bool, buffer=shm.buf)[...] = False
+        context = multiprocessing.get_context("spawn")
+        with ProcessPoolExecutor(max_workers=workers, mp_context=context) as pool:
+            futures = [pool.submit(_slab_worker, shm.name, shape, path, pitch, lower, int(z0), int(z1),
+                                   replacements, max_edge, max_iter) for z0, z1 in slabs]
+            for future in futures:
+                future.result()
+        grid = np.ndarray(shape, dtype=bool, buffer=shm.buf).copy()
+    finally:
+        shm.close()
+        shm.unlink()
+    return grid
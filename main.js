@@ -105,41 +105,156 @@ function setupIPC() {
   });
 
   // Optimization API
-  ipcMain.handle('run-optimization', async (event, { inputPath, outputPath }) => {
+  ipcMain.handle('run-optimization', async (event, { inputPath, outputPath, config }) => {
     if (!inputPath || !outputPath) {
       throw new Error('Invalid input or output path');
     }
 
-    return new Promise((resolve, reject) => {
-      const pythonScript = path.join(__dirname, 'src', 'backend', 'main.py');
-      const python = spawn(process.platform === 'win32' ? 'python' : 'python3', [pythonScript, inputPath, outputPath]);
+    const onProgress = (message) => {
+      if (!event.sender.isDestroyed()) {
+        event.sender.send('optimization-progress', message);
+      }
+    };
+    if (useWarmWorker) {
+      return runInWorker({ input: inputPath, output: outputPath, config }, onProgress);
+    }
+    return runInProcess(inputPath, outputPath, config, onProgress);
+  });
+}
 
-      let stdoutData = '';
-      let stderrData = '';
+// Python backend: the headless CLI (backend/main.py inputPath outputPath) prints one JSON event
+// per line on stdout. By default a warm worker (python -m backend.cli --serve) is kept running
+// and reused, so only the first optimization pays for interpreter and import startup.
+// Set OPTIMIZER_WARM_WORKER=0 to spawn one process per optimization instead.
+const pythonCommand = process.platform === 'win32' ? 'python' : 'python3';
+const useWarmWorker = process.env.OPTIMIZER_WARM_WORKER !== '0';
+let backendWorker = null;
 
-      python.stdout.on('data', (data) => {
-        stdoutData += data;
-        console.log(`Python output: ${data}`);
-      });
+function onLines(stream, handleLine) {
+  let buffer = '';
+  stream.on('data', (data) => {
+    buffer += data;
+    let newline;
+    while ((newline = buffer.indexOf('\n')) >= 0) {
+      const line = buffer.slice(0, newline).trim();
+      buffer = buffer.slice(newline + 1);
+      if (line) {
+        handleLine(line);
+      }
+    }
+  });
+}
 
-      python.stderr.on('data', (data) => {
-        stderrData += data;
-        console.error(`Python error: ${data}`);
-      });
+function parseEvent(line) {
+  try {
+    return JSON.parse(line);
+  } catch (error) {
+    console.log(`Python output: ${line}`);
+    return null;
+  }
+}
 
-      python.on('close', (code) => {
-        if (code === 0) {
-          resolve({ stdout: stdoutData });
-        } else {
-          reject(new Error(`Python script failed: ${stderrData}`));
-        }
-      });
+function runInProcess(inputPath, outputPath, config, onProgress) {
+  return new Promise((resolve, reject) => {
+    const pythonScript = path.join(__dirname, 'backend', 'main.py');
+    const args = [pythonScript, inputPath, outputPath];
+    if (config) {
+      args.push('--config', JSON.stringify(config));
+    }
+    const python = spawn(pythonCommand, args);
 
-      python.on('error', (error) => {
-        reject(new Error(`Failed to start Python process: ${error.message}`));
-      });
+    let stdoutData = '';
+    let stderrData = '';
+    let completed = null;
+
+    onLines(python.stdout, (line) => {
+      stdoutData += `${line}\n`;
+      const message = parseEvent(line);
+      if (message && message.event === 'completed') {
+        completed = message;
+      } else if (message) {
+        onProgress(message);
+      }
+    });
+
+    python.stderr.on('data', (data) => {
+      stderrData += data;
+      console.error(`Python error: ${data}`);
     });
+
+    python.on('close', (code) => {
+      if (code === 0) {
+        resolve({ stdout: stdoutData, result: completed });
+      } else {
+        reject(new Error(`Python script failed: ${stderrData}`));
+      }
+    });
+
+    python.on('error', (error) => {
+      reject(new Error(`Failed to start Python process: ${error.message}`));
+    });
+  });
+}
+
+function getBackendWorker() {
+  if (backendWorker) {
+    return backendWorker;
+  }
+  const child = spawn(pythonCommand, ['-m', 'backend.cli', '--serve'], { cwd: __dirname });
+  const worker = { child, pending: new Map(), nextId: 1 };
+
+  onLines(child.stdout, (line) => {
+    const message = parseEvent(line);
+    const request = message && worker.pending.get(message.id);
+    if (!request) {
+      return;
+    }
+    request.stdout += `${line}\n`;
+    if (message.event === 'completed') {
+      worker.pending.delete(message.id);
+      request.resolve({ stdout: request.stdout, result: message });
+    } else if (message.event === 'error') {
+      worker.pending.delete(message.id);
+      request.reject(new Error(`Optimization failed: ${message.error}`));
+    } else {
+      request.onProgress(message);
+    }
   });
+
+  child.stderr.on('data', (data) => {
+    console.error(`Python worker: ${data}`);
+  });
+
+  const fail = (error) => {
+    if (backendWorker === worker) {
+      backendWorker = null;
+    }
+    for (const request of worker.pending.values()) {
+      request.reject(error);
+    }
+    worker.pending.clear();
+  };
+  child.on('exit', (code) => fail(new Error(`Python worker exited with code ${code}`)));
+  child.on('error', (error) => fail(new Error(`Failed to start Python worker: ${error.message}`)));
+
+  backendWorker = worker;
+  return worker;
+}
+
+function runInWorker(request, onProgress) {
+  const worker = getBackendWorker();
+  const id = String(worker.nextId++);
+  return new Promise((resolve, reject) => {
+    worker.pending.set(id, { resolve, reject, onProgress, stdout: '' });
+    worker.child.stdin.write(`${JSON.stringify({ id, ...request })}\n`);
+  });
+}
+
+function stopBackendWorker() {
+  if (backendWorker) {
+    backendWorker.child.stdin.end(`${JSON.stringify({ command: 'shutdown' })}\n`);
+    backendWorker = null;
+  }
 }
 
 // App lifecycle
@@ -167,6 +282,7 @@ app.on('window-all-closed', () => {
 });
 
 app.on('before-quit', async () => {
+  stopBackendWorker();
   if (db) {
     await new Promise((resolve) => {
       db.close((err) => {
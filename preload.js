@@ -9,6 +9,11 @@ contextBridge.exposeInMainWorld('electron', {
       throw error;
     }
   },
+  onOptimizationProgress: (callback) => {
+    const listener = (event, message) => callback(message);
+    ipcRenderer.on('optimization-progress', listener);
+    return () => ipcRenderer.removeListener('optimization-progress', listener);
+  },
   runOptimization: async (params) => {
     try {
       return await ipcRenderer.invoke('run-optimization', params);